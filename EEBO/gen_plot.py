@@ -36,14 +36,20 @@ Generate raw elements of a building analysis.
 #
 import datetime as dto
 #
+import numpy as np
+#
+import read_data
+#
 from util import make_ticklabels as mtl
 #
 from util import calc_statistics as a_stat
 from util import calc_energy_from_power as cep
+from util import calc_streaming_stats as a_stream
 #
 #from ..energy_star.target_finder import gen_xml_tgtfndr as gxml
 #from ..energy_star.target_finder import retrieveEnergyStarScore_tgtfndr as rtgf
 #
+from plot import plot_figure as plt_fig
 from plot import plot_energy_sig as plt_es
 from plot import plot_heatmap as plt_heat
 from plot import plot_load_duration as plt_ldc
@@ -65,7 +71,8 @@ def genDailySummary(loadsByDay, bldgMetaData,
 
     **Args:**
 
-    - *loadsByDay*, a ``numpy`` array, each row of which corresponds to a unique day.
+    - *loadsByDay*, a ``numpy`` array, each row of which corresponds to a unique day
+      (e.g., from :func:`util.fold_series.foldSeries`).
     - *bldgMetaData*, dictionary of measurement units and other metadata.
     - *replacements*, dictionary to be filled in.
     """
@@ -86,26 +93,82 @@ def genDailySummary(loadsByDay, bldgMetaData,
     summaryStats = a_stat.gridStats(loadsByDay, 'r')
     loadVariability = a_stat.variability(loadsByDay)
     #
-    # Load intensities (load normalized by floor area).
-    replacements['{:summary-load-intensity-units:}'] = 'W/sf'
-    maxLoadIntensity = summaryStats['max'] * 1e3 / floorAreaSf
-    replacements['{:summary-overall-max-load-intensity:}'] = "{0:.2f}".format(maxLoadIntensity)
-    minLoadIntensity = summaryStats['min'] * 1e3 / floorAreaSf
-    replacements['{:summary-overall-min-load-intensity:}'] = "{0:.2f}".format(summaryStats['min'])
+    __fillDailySummary(replacements, loadUnitsStr, floorAreaSf,
+        summaryStats['max'], summaryStats['min'],
+        summaryStats['peak95'].mean(), summaryStats['base5'].mean(),
+        summaryStats['range95_5'].mean(), summaryStats['bpratio'].mean(),
+        loadVariability)
     #
-    # Loads.
-    replacements['{:summary-load-units:}'] = loadUnitsStr
-    replacements['{:summary-ave-daily-peak-load:}'] = "{0:.2f}".format(summaryStats['peak95'].mean())
-    replacements['{:summary-ave-daily-base-load:}'] = "{0:.2f}".format(summaryStats['base5'].mean())
-    replacements['{:summary-ave-daily-load-range:}'] = "{0:.2f}".format(summaryStats['range95_5'].mean())
+    return( True )
     #
-    # Dimensionless values.
-    replacements['{:summary-ave-daily-bp-load-ratio:}'] = "{0:.2f}".format(summaryStats['bpratio'].mean())
-    replacements['{:summary-load-variability:}'] = "{0:.2f}".format(loadVariability)
+    # End :func:`genDailySummary`.
+
+
+def genDailySummaryStreaming(dataPath, bldgMetaData, replacements,
+    loadColumn=None, chunkRowCt=100000):
+    #
+    """
+    Find the same daily summary statistics as :func:`genDailySummary`, storing
+    them in *replacements*, but reading the loads from *dataPath* a chunk at a
+    time, rather than from a grid held in memory.
+
+    **Returns:**
+
+    - *success*, ``True`` if successfully wrote the results.
+
+    **Args:**
+
+    - *dataPath*, path to a meter data file (see :func:`read_data.readDataChunks`).
+    - *bldgMetaData*, dictionary of measurement units and other metadata.
+    - *replacements*, dictionary to be filled in.
+    - *loadColumn*, name of the column holding the loads.  If ``None``, use
+      the first column whose name gives the load units, e.g.,
+      ``'Main Meter [kW]'``.
+    - *chunkRowCt*, number of rows to read at a time.
+
+    **Notes:**
+
+    - Raises ``ValueError`` if *loadColumn* is ``None``, and no column name
+      gives the load units.
+    - Memory use depends on *chunkRowCt*, not on the size of the file.
+    - To split a very large file among worker processes, have each feed its
+      rows to a :class:`util.calc_streaming_stats.DailySummaryAccumulator`,
+      then merge the accumulators.
+    """
+    #
+    # Check inputs.
+    loadUnitsStr = bldgMetaData['load-units']
+    assert( loadUnitsStr == 'kW' )
+    #
+    floorAreaSf = float(bldgMetaData['floor-area'])
+    assert( floorAreaSf > 0 )
+    assert( bldgMetaData['floor-area-units'] == 'sf' )
+    #
+    # Find statistics.
+    accumulator = a_stream.DailySummaryAccumulator()
+    for chunk in read_data.readDataChunks(dataPath, chunk_rows=chunkRowCt):
+        if( loadColumn is None ):
+            # Note the other columns may hold, e.g., temperatures or gas.
+            unitsTag = '[{0}]'.format(loadUnitsStr)
+            loadColumns = [column for column in chunk.columns if unitsTag in column]
+            if( len(loadColumns) == 0 ):
+                raise ValueError('No column in {0!r} has load units {1}; pass loadColumn'.format(
+                    dataPath, unitsTag))
+            loadColumn = loadColumns[0]
+        accumulator.update(chunk.index.values, chunk[loadColumn].values)
+    if( accumulator.loadStats.count == 0 ):
+        return( False )
+    summaryStats = accumulator.summary()
+    #
+    __fillDailySummary(replacements, loadUnitsStr, floorAreaSf,
+        summaryStats['max'], summaryStats['min'],
+        summaryStats['peak95'], summaryStats['base5'],
+        summaryStats['range95_5'], summaryStats['bpratio'],
+        summaryStats['variability'])
     #
     return( True )
     #
-    # End :func:`genDailySummary`.
+    # End :func:`genDailySummaryStreaming`.
 
 
 def genLoadProfilePlot(datetimes, loads, loadUnitsStr,
@@ -132,7 +195,7 @@ def genLoadProfilePlot(datetimes, loads, loadUnitsStr,
     if( mainfig is None ):
         return( False )
     #
-    mainfig.savefig(figWritePath)
+    plt_fig.saveFigure(mainfig, figWritePath)
     #
     return( True )
     #
@@ -150,6 +213,8 @@ def genHeatMap(timesByDay, loadsByDay, loadUnitsStr,
 
     **Args:**
 
+    - *timesByDay*, *loadsByDay*, grids of times and loads, with one row per
+      day, e.g., from :func:`util.fold_series.foldSeries`.
     - *figWritePath*, path to save figure.
     """
     #
@@ -169,7 +234,7 @@ def genHeatMap(timesByDay, loadsByDay, loadUnitsStr,
     # make explicit that caller has to do this.  But right now there's no
     # control or documentation of this fact.
     #
-    mainfig.savefig(figWritePath)
+    plt_fig.saveFigure(mainfig, figWritePath)
     #
     return( True )
     #
@@ -177,7 +242,7 @@ def genHeatMap(timesByDay, loadsByDay, loadUnitsStr,
 
 
 def genEnergySignaturePlot(oats, loads, oatUnitsStr, loadUnitsStr,
-    figWritePath):
+    figWritePath, weatherSensitivity=None):
     #
     """
     Generate the energy signature plot, of *loads* versus *oats*.
@@ -189,13 +254,16 @@ def genEnergySignaturePlot(oats, loads, oatUnitsStr, loadUnitsStr,
     **Args:**
 
     - *figWritePath*, path to save figure.
+    - *weatherSensitivity*, the Spearman rank correlation of *loads* with
+      *oats*, if already found.  If ``None``, find it here.
     """
     #
     # TODO: Clip to one year.  For efficiency, may want to clip outside this fcn,
     # since so many fcns want one year.  This fcn can still test for more than a
     # year, and only clip if necessary.
     #
-    weatherSensitivity = a_stat.findSpearmanRank(loads, oats)
+    if( weatherSensitivity is None ):
+        weatherSensitivity = a_stat.findSpearmanRank(loads, oats)
     mainfig = plt_es.energy_sig(oats, loads,
         temperatureAxisLabel='outside air temperature [' +oatUnitsStr +']',
         valueAxisLabel='power [' +loadUnitsStr +']',
@@ -204,7 +272,7 @@ def genEnergySignaturePlot(oats, loads, oatUnitsStr, loadUnitsStr,
     if( mainfig is None ):
         return( False )
     #
-    mainfig.savefig(figWritePath)
+    plt_fig.saveFigure(mainfig, figWritePath)
     #
     return( True )
     #
@@ -212,7 +280,7 @@ def genEnergySignaturePlot(oats, loads, oatUnitsStr, loadUnitsStr,
 
 
 def genLoadDurationCurve(loads, loadUnitsStr,
-    figWritePath):
+    figWritePath, sortedLoads=None):
     #
     """
     Generate the load duration curve for *loads*.
@@ -224,27 +292,65 @@ def genLoadDurationCurve(loads, loadUnitsStr,
     **Args:**
 
     - *figWritePath*, path to save figure.
+    - *sortedLoads*, *loads* sorted by :func:`numpy.sort`, if already found.
+      If ``None``, sort here.
     """
     #
     # TODO: Consider an overlay, when have more than a year's worth of data, of
     # the load duration for just the past year, along with load duration for
     # the entire data set.
     #
-    mainfig = plt_ldc.load_duration(loads, 'power', loadUnitsStr,
-        asPercent=True,
-        loadRange=[0,None])
+    if( sortedLoads is None ):
+        mainfig = plt_ldc.load_duration(loads, 'power', loadUnitsStr,
+            asPercent=True,
+            loadRange=[0,None])
+    else:
+        mainfig = plt_ldc.load_duration(sortedLoads, 'power', loadUnitsStr,
+            asPercent=True,
+            loadRange=[0,None],
+            isSorted=True)
     if( mainfig is None ):
         return( False )
     #
-    mainfig.savefig(figWritePath)
+    plt_fig.saveFigure(mainfig, figWritePath)
     #
     return( True )
     #
     # End :func:`genLoadDurationCurve`.
 
 
+def findAnnualEnergy(datetimes, loads, gasLoads=None):
+    """
+    Find the annual energy use, for the benchmarking plots.
+
+    **Returns:**
+
+    - *yearlyEnergy*, as returned by :func:`util.calc_energy_from_power.calc_annual_energy`.
+      If have *gasLoads*, the first entry of each tuple is an array of the
+      electricity and gas energy, in that order.
+
+    **Args:**
+
+    - *gasLoads*, array-like sequence of gas loads, one per entry of *loads*,
+      or ``None``.
+
+    **Notes:**
+
+    - Pass the result to :func:`genLongitudBenchmark` and
+      :func:`genCrossSectionBenchmark`, in order to integrate only once.
+    """
+    #
+    # Integrate electricity and gas together, sharing the search for year boundaries.
+    if ( gasLoads is not None):
+        return( cep.calc_annual_energy(np.column_stack((loads, gasLoads)), datetimes) )
+    #
+    return( cep.calc_annual_energy(loads,datetimes) )
+    #
+    # End :func:`findAnnualEnergy`.
+
+
 def genLongitudBenchmark(datetimes, loads, loadUnitsStr, gasLoads, gasUnitsStr,
-    figWritePath):
+    figWritePath, yearlyEnergy=None):
     #
     """
     Generate the longitudinal benchmarking plot.
@@ -256,6 +362,8 @@ def genLongitudBenchmark(datetimes, loads, loadUnitsStr, gasLoads, gasUnitsStr,
     **Args:**
 
     - *figWritePath*, path to save figure.
+    - *yearlyEnergy*, as returned by :func:`findAnnualEnergy`, if already
+      found.  If ``None``, find it here.
 
     **Notes:**
 
@@ -265,7 +373,9 @@ def genLongitudBenchmark(datetimes, loads, loadUnitsStr, gasLoads, gasUnitsStr,
     #
     yearlyElectricityLabel = "Annual Electricity [kWh]"
     #
-    yearlyElectricity = cep.calc_annual_energy(loads,datetimes)
+    if( yearlyEnergy is None ):
+        yearlyEnergy = findAnnualEnergy(datetimes, loads, gasLoads)
+    yearlyElectricity = __electricityOnly(yearlyEnergy, gasLoads)
     #
     if( len(yearlyElectricity) <= 1 ):
         return( False )
@@ -278,8 +388,7 @@ def genLongitudBenchmark(datetimes, loads, loadUnitsStr, gasLoads, gasUnitsStr,
     #
     #
     if ( gasLoads is not None):
-        yearlyGas = cep.calc_annual_energy(gasLoads,datetimes)
-        yearlyGasTotal = [column[0] for column in yearlyGas]
+        yearlyGasTotal = [column[0][1] for column in yearlyEnergy]
         yearlyGasAxisLabel="Annual Natural Gas [kBtu]"
     else:
         yearlyGasTotal = None
@@ -295,14 +404,55 @@ def genLongitudBenchmark(datetimes, loads, loadUnitsStr, gasLoads, gasUnitsStr,
     if( mainfig is None ):
         return( False )
     #
-    mainfig.savefig(figWritePath)
+    plt_fig.saveFigure(mainfig, figWritePath)
     #
     return( True )
     #
     # End :func:`genLongitudBenchmark`.
+
+
+def genLongitudRollingBenchmark(datetimes, loads, loadUnitsStr,
+    figWritePath, monthCt=12):
+    #
+    """
+    Generate the rolling longitudinal benchmarking plot, of the trailing
+    *monthCt*-month energy for every day in the data.
+
+    **Returns:**
+
+    - *success*, ``True`` if successfully generated the figure.
+
+    **Args:**
+
+    - *figWritePath*, path to save figure.
+    - *monthCt*, length of the trailing window, in months.
+
+    **Notes:**
+
+    - Require at least two days with a full trailing window in order to make
+      the plot.
+    """
+    #
+    endDays, rollingElectricity = cep.calc_rolling_energy(loads, datetimes, monthCt=monthCt)
+    #
+    if( len(rollingElectricity) <= 1 ):
+        return( False )
+    #
+    mainfig = plt_ts.time_series(endDays, rollingElectricity,
+        timeAxisLabel='Window ending',
+        valueAxisLabel='Trailing ' +str(monthCt) +'-month Electricity [kWh]',
+        plotTitle='Rolling Longitudinal Benchmarking')
+    if( mainfig is None ):
+        return( False )
+    #
+    plt_fig.saveFigure(mainfig, figWritePath)
+    #
+    return( True )
+    #
+    # End :func:`genLongitudRollingBenchmark`.
     
 def genCrossSectionBenchmark(datetimes, loads, bldgMetaData, replacements, 
-    gasLoads, xmlWritePath, figWritePath):
+    gasLoads, xmlWritePath, figWritePath, yearlyEnergy=None):
     #
     """
     Generate the cross sectional benchmarking plot.
@@ -315,6 +465,8 @@ def genCrossSectionBenchmark(datetimes, loads, bldgMetaData, replacements,
 
     - *figWritePath*, path to save figure.
     - *xmlWritePath*, path to save xml file. 
+    - *yearlyEnergy*, as returned by :func:`findAnnualEnergy`, if already
+      found.  If ``None``, find it here.
 
     **Notes:**
 
@@ -322,7 +474,9 @@ def genCrossSectionBenchmark(datetimes, loads, bldgMetaData, replacements,
     """
     #       
     # Fill replacement keys 
-    yearlyElectricity = cep.calc_annual_energy(loads,datetimes)
+    if( yearlyEnergy is None ):
+        yearlyEnergy = findAnnualEnergy(datetimes, loads, gasLoads)
+    yearlyElectricity = __electricityOnly(yearlyEnergy, gasLoads)
     #
     if( len(yearlyElectricity) <= 1 ):
         return( False )
@@ -332,8 +486,7 @@ def genCrossSectionBenchmark(datetimes, loads, bldgMetaData, replacements,
     energyUse_list.append( ('Electric','kWh (thousand Watt-hours)',int(yearlyElectricity[0][0])) )
     #
     if ( gasLoads is not None):
-        yearlyGas = cep.calc_annual_energy(gasLoads,datetimes)
-        energyUse_list.append( ('Natural Gas','kBtu (thousand Btu)',int(yearlyGas[0][0])) )
+        energyUse_list.append( ('Natural Gas','kBtu (thousand Btu)',int(yearlyEnergy[0][0][1])) )
     #
     '''
     # Generate XML files and strings
@@ -350,9 +503,48 @@ def genCrossSectionBenchmark(datetimes, loads, bldgMetaData, replacements,
     if( mainfig is None ):
         return( False )
     #                                    
-    mainfig.savefig(figWritePath)
+    plt_fig.saveFigure(mainfig, figWritePath)
     #
     return( True )
     #
     # End :func:`genCrossSectionBenchmark`.
     '''
+
+
+def __fillDailySummary(replacements, loadUnitsStr, floorAreaSf,
+    maxLoad, minLoad, avePeak, aveBase, aveRange, aveBpRatio, loadVariability):
+    """
+    Format the daily summary statistics into *replacements*.
+    """
+    #
+    # Load intensities (load normalized by floor area).
+    replacements['{:summary-load-intensity-units:}'] = 'W/sf'
+    maxLoadIntensity = maxLoad * 1e3 / floorAreaSf
+    replacements['{:summary-overall-max-load-intensity:}'] = "{0:.2f}".format(maxLoadIntensity)
+    minLoadIntensity = minLoad * 1e3 / floorAreaSf
+    replacements['{:summary-overall-min-load-intensity:}'] = "{0:.2f}".format(minLoad)
+    #
+    # Loads.
+    replacements['{:summary-load-units:}'] = loadUnitsStr
+    replacements['{:summary-ave-daily-peak-load:}'] = "{0:.2f}".format(avePeak)
+    replacements['{:summary-ave-daily-base-load:}'] = "{0:.2f}".format(aveBase)
+    replacements['{:summary-ave-daily-load-range:}'] = "{0:.2f}".format(aveRange)
+    #
+    # Dimensionless values.
+    replacements['{:summary-ave-daily-bp-load-ratio:}'] = "{0:.2f}".format(aveBpRatio)
+    replacements['{:summary-load-variability:}'] = "{0:.2f}".format(loadVariability)
+    #
+    # End :func:`__fillDailySummary`.
+
+
+def __electricityOnly(yearlyEnergy, gasLoads):
+    """
+    Pick the electricity out of *yearlyEnergy*, as found by :func:`findAnnualEnergy`.
+    """
+    #
+    if ( gasLoads is not None):
+        return( [(column[0][0], column[1], column[2]) for column in yearlyEnergy] )
+    #
+    return( yearlyEnergy )
+    #
+    # End :func:`__electricityOnly`.
@@ -9,10 +9,23 @@ import pandas as pd
 
 from PyQt5 import QtCore, QtWidgets
 
+# How often to check whether the background aggregation is done.
+ROLLUP_POLL_MSEC = 100
+
 class Ui_Main (QtWidgets.QMainWindow):
     
     def __init__(self, parent=None):
         QtWidgets.QMainWindow.__init__(self)
+        # Read the data file once, and aggregate it to every granularity in
+        # the background, so the Timestamp buttons only have to look it up.
+        self.dataset = read_data.loadDataset()
+        self.dataset.prepareRollups()
+        self.df_day = None
+        # Until the aggregation is done, one timer at a time checks again.
+        self.rollupPollTimer = QtCore.QTimer(self)
+        self.rollupPollTimer.setSingleShot(True)
+        self.rollupPollTimer.setInterval(ROLLUP_POLL_MSEC)
+        self.rollupPollTimer.timeout.connect(self.radioButtonClicked)
         self.setupUi()
         self.menuBarUi()
         self.retranslateUi()
@@ -128,7 +141,7 @@ class Ui_Main (QtWidgets.QMainWindow):
 
     def retranslateUi(self):
         
-        df_day=set_date.df_to_day()
+        df_day=self.dataset.df
 
         _translate = QtCore.QCoreApplication.translate
         self.setWindowTitle(_translate("Form", "EEBO"))
@@ -159,25 +172,33 @@ class Ui_Main (QtWidgets.QMainWindow):
     def radioButtonClicked(self):
         #enum
         if self.radioButton_5.isChecked():
-            self.df_day=self.df_to_min10()
+            self.df_day = set_date.df_to_min10(self.dataset)
         elif self.radioButton_6.isChecked():
-            self.df_day = self.df_to_min15()
+            self.df_day = set_date.df_to_min15(self.dataset)
         elif self.radioButton_7.isChecked():
-            self.df_day = self.df_to_min30()
+            self.df_day = set_date.df_to_min30(self.dataset)
         elif self.radioButton_8.isChecked():
-            self.df_day = self.df_to_min60()
+            self.df_day = set_date.df_to_min60(self.dataset)
         elif self.radioButton_9.isChecked():
-            self.df_day = self.df_to_day()
+            self.df_day = set_date.df_to_day(self.dataset)
         elif self.radioButton_10.isChecked():
-            self.df_day = self.df_to_week()
+            self.df_day = set_date.df_to_week(self.dataset)
         elif self.radioButton_11.isChecked():
-            self.df_day = self.df_to_month()
+            self.df_day = set_date.df_to_month(self.dataset)
+        
+        # Still aggregating in the background, so check again shortly,
+        # rather than hold up the window.  The check looks up whichever
+        # button is checked by then, so clicks while waiting need no timer
+        # of their own.
+        if self.df_day is None and not self.rollupPollTimer.isActive():
+            self.rollupPollTimer.start()
     
     def importFile(self):
         
         #import UI execute
         #data_path = ui
-        df = read_data.readData()
+        self.dataset = read_data.loadDataset()
+        self.dataset.prepareRollups()
         #read_data.importData(data_path)
     
     #def plot(self):
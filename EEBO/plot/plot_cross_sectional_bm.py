@@ -6,7 +6,7 @@
 import numpy as np
 import datetime as dto
 #
-import matplotlib.pyplot as plt
+from plot import plot_figure
 
 def crossSection_bm(value,
                  dateAxisLabel,
@@ -43,7 +43,7 @@ def crossSection_bm(value,
     green_hex = '#006600' 
     red_hex = '#CC3300'
     #
-    mainfig = plt.figure()
+    mainfig = plot_figure.newFigure()
     plot = mainfig.add_subplot(111)
     #
     plot.axhspan (ymin=50, ymax=75, color=green_hex, alpha=0.25)
@@ -3,7 +3,7 @@
 
 #--- Provide access.
 #
-import matplotlib.pyplot as plt
+from plot import plot_figure
 import matplotlib.dates as mpld
 
 
@@ -30,7 +30,7 @@ def energy_sig(temperature, values,
     # FIXME: Find a way to fill in the gaps for missing values
     #
     # Plot.
-    mainfig = plt.figure()
+    mainfig = plot_figure.newFigure()
     plot1 = mainfig.add_subplot(111)
     plot1.plot(temperature, values, linestyle='None', marker='o')
     #
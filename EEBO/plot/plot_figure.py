@@ -0,0 +1,55 @@
+"""Make and release figures without :mod:`matplotlib.pyplot`."""
+
+
+#--- Provide access.
+#
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+
+def newFigure(**figArgs):
+    """
+    Make a new figure, drawn by the Agg backend.
+
+    **Args:**
+
+    - *figArgs*, keyword arguments for :class:`matplotlib.figure.Figure`,
+      e.g., *figsize* and *dpi*.
+
+    **Returns:**
+
+    - *mainfig*, a :class:`matplotlib.figure.Figure`.
+
+    **Notes:**
+
+    - Unlike :func:`matplotlib.pyplot.figure`, the figure does not get added
+      to pyplot's list of open figures.  So it gets freed like any other
+      object once nothing refers to it, and need not be closed.  This keeps
+      memory flat in a long-running process that makes many figures.
+    - The figure can still be saved with ``savefig``, or shown in a GUI by
+      giving it to that GUI's canvas (e.g., ``FigureCanvasQTAgg``).
+    """
+    #
+    mainfig = Figure(**figArgs)
+    FigureCanvasAgg(mainfig)
+    #
+    return( mainfig )
+    #
+    # End :func:`newFigure`.
+
+
+def saveFigure(mainfig, figWritePath):
+    """
+    Save *mainfig* to *figWritePath*, then release its contents.
+
+    **Notes:**
+
+    - Clearing the figure frees its axes and artists right away, rather than
+      waiting for the garbage collector to find the reference cycles among
+      them.  Do not use *mainfig* after this.
+    """
+    #
+    mainfig.savefig(figWritePath)
+    mainfig.clf()
+    #
+    # End :func:`saveFigure`.
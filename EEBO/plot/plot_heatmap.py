@@ -6,29 +6,52 @@
 import numpy as np
 import scipy.stats
 #
-import matplotlib.pyplot as plt
+from plot import plot_figure
 # import matplotlib.dates as mpld
 #
 from matplotlib import cm
 #
 import datetime as dto
+import warnings
+
+
+#--- Constants.
+#
+# Draw grids with more cells than this as an image.
+IMAGE_CELL_MIN = 100000
+#
+# Most date labels to put on the row axis.
+__ROW_TICK_CT_MAX = 20
 
 
 # TODO: Should have a value for square feet or should we pass a grid of EUIs?
 
 
-def heatmap(x_val, values, x_label, y_label, units_label):
+def heatmap(x_val, values, x_label, y_label, units_label,
+    imageCellMin=IMAGE_CELL_MIN, blockAverage=True):
     """
     Plots *values* as a heatmap.
 
     **Args:**
 
+    - *x_val*, 2D array of the times of *values*, as ``datetime`` objects
+      or ``datetime64`` values.  Only the first column is used, to label rows.
     - *values*, 2D array sequence of values
     - *x_label*, string for x-axis labels, default to 'kW/sf' (?)
     - *y_label*, string for y-axis labels, default to 'dates'
+    - *imageCellMin*, draw *values* as an image if it has more than this
+      many cells.  Otherwise, draw one quadrilateral per cell.
+    - *blockAverage*, if ``True``, and drawing an image, first average
+      *values* over blocks of cells, to no more rows and columns than the
+      axes have pixels.
     """
     #
-    # Implementation note: this function uses :func:`matplotlib.pyplot.pcolormesh` to make vectors.
+    # Implementation note: small grids use :func:`matplotlib.axes.Axes.pcolormesh`,
+    # which makes vectors, one quadrilateral per cell.  That gets slow, and
+    # takes a lot of memory, for large grids (e.g., years of 1-minute data).
+    # So large grids use :func:`matplotlib.axes.Axes.imshow`, which draws a
+    # raster, and whose cost depends on the number of output pixels.  Both
+    # put the center of cell (row, col) at (col, row), so the same ticks work.
     #
     # Check input.
     assert (x_val.shape == values.shape)
@@ -42,32 +65,52 @@ def heatmap(x_val, values, x_label, y_label, units_label):
     rowCt, colCt = values.shape
     # print rowCt, colCt, lower5, upper5
 
-    x_coor,y_coor = np.meshgrid(np.arange(0,colCt),np.arange(0,rowCt))
-    # TODO: y_coor should be a string or a float not a datetime object
-
-    mainfig = plt.figure()
+    mainfig = plot_figure.newFigure()
     plot1 = mainfig.add_subplot(111)
 
+    if( values.size > imageCellMin ):
+        rowStep, colStep = 1, 1
+        if( blockAverage ):
+            # Note the colorbar, added below, takes some of this space, so the
+            # image gets a few more cells than it has pixels.
+            axesBox = plot1.get_window_extent()
+            values, rowStep, colStep = __blockAverage(values, int(axesBox.height), int(axesBox.width))
+        # Note each block covers *rowStep* by *colStep* cells, and the last
+        # blocks include ``NAN`` padding past the grid.  The padding falls
+        # outside the axis limits set below.
+        htmap = plot1.imshow(values, origin='lower', aspect='auto',
+            interpolation='nearest',
+            extent=(-0.5, values.shape[1]*colStep-0.5, -0.5, values.shape[0]*rowStep-0.5),
+            norm=None, vmin=lower5, vmax=upper5,
+            cmap=cm.coolwarm,)
+    else:
+        x_coor,y_coor = np.meshgrid(np.arange(0,colCt),np.arange(0,rowCt))
+        # TODO: y_coor should be a string or a float not a datetime object
 
-    htmap = plot1.pcolormesh(x_coor,y_coor,values,
-        norm=None, vmin=lower5, vmax=upper5,
-        cmap=cm.coolwarm,)
+        htmap = plot1.pcolormesh(x_coor,y_coor,values,
+            norm=None, vmin=lower5, vmax=upper5,
+            cmap=cm.coolwarm,)
     # TODO: Change ``cmap`` to be more general
 
-    cbar = plt.colorbar(htmap, shrink=0.9)
+    cbar = mainfig.colorbar(htmap, ax=plot1, shrink=0.9)
     cbar.set_label(units_label)
 
     # TODO: Figure out how to set the tickmarks with the correct dates.
     # This is a boiler plate fix to have the tickmarks be on every Monday.
     # Need to investigate matplotlib.dates
     # Nonetype breaks strftime.
+    # For long records, label every few weeks, rather than every week.
     if rowCt < 7:
         tickSpacing = 1
     else:
-        tickSpacing = 7
+        tickSpacing = 7 * int(np.ceil(rowCt / (7.0 * __ROW_TICK_CT_MAX)))
     plot1.set_yticks(range(0,rowCt,tickSpacing))
     makeLabel = lambda datetime: datetime.strftime('%m/%d/%y') if( datetime is not None ) else None
-    plot1.set_yticklabels([makeLabel(dt[0]) for dt in x_val[0:rowCt:tickSpacing]])
+    rowTimes = x_val[0:rowCt:tickSpacing, 0]
+    if( rowTimes.dtype.kind == 'M' ):
+        # Here, have ``datetime64`` values.  Convert to ``datetime``; ``NaT`` becomes ``None``.
+        rowTimes = rowTimes.astype('datetime64[us]').astype(object)
+    plot1.set_yticklabels([makeLabel(dt) for dt in rowTimes])
 
     # Format.
     plot1.set_xlim(0,colCt-1)
@@ -79,3 +122,38 @@ def heatmap(x_val, values, x_label, y_label, units_label):
     # plot1.grid(True)
 
     return mainfig
+
+
+def __blockAverage(values, rowCtMax, colCtMax):
+    """
+    Average *values* over blocks of cells, to get at most *rowCtMax* rows and
+    *colCtMax* columns.  Ignore ``NAN`` cells, unless a whole block is ``NAN``.
+
+    **Returns:**
+
+    - (*blockValues*, *rowStep*, *colStep*), the block averages, and the
+      number of rows and columns of *values* in each block.  If the last
+      blocks do not fill up with rows or columns of *values*, they average
+      over the ones they do have.
+    """
+    #
+    rowCt, colCt = values.shape
+    rowStep = max(1, int(np.ceil(rowCt / float(max(1, rowCtMax)))))
+    colStep = max(1, int(np.ceil(colCt / float(max(1, colCtMax)))))
+    if( rowStep == 1 and colStep == 1 ):
+        return( (values, rowStep, colStep) )
+    #
+    # Pad with ``NAN`` to whole blocks.
+    blockRowCt = -(-rowCt // rowStep)
+    blockColCt = -(-colCt // colStep)
+    padded = np.full((blockRowCt*rowStep, blockColCt*colStep), np.nan)
+    padded[:rowCt, :colCt] = values
+    #
+    with warnings.catch_warnings():
+        # All-``NAN`` blocks are expected.
+        warnings.simplefilter('ignore', RuntimeWarning)
+        blockValues = np.nanmean(padded.reshape(blockRowCt, rowStep, blockColCt, colStep), axis=(1, 3))
+    #
+    return( (blockValues, rowStep, colStep) )
+    #
+    # End :func:`__blockAverage`.
@@ -5,13 +5,14 @@
 #
 import numpy as np
 #
-import matplotlib.pyplot as plt
+from plot import plot_figure
 import matplotlib.dates as mpld
 
 
 def load_duration(loads, y_label='power', y_units='kW',
     asPercent=False,
-    loadRange=[None, None]):
+    loadRange=[None, None],
+    isSorted=False):
     """
     Plot *loads*, sorted in descending order.
 
@@ -24,6 +25,8 @@ def load_duration(loads, y_label='power', y_units='kW',
     - *loadRange*, a two-element list giving the extents of the y (load) axis.
       Set either or both elements of the list to ``None``, in order to accept
       the default extent based on the data.
+    - *isSorted*, ``True`` if *loads* already are sorted by :func:`numpy.sort`
+      (i.e., ascending, with any NANs at the end).
     """
     #
     # Check inputs.
@@ -36,7 +39,10 @@ def load_duration(loads, y_label='power', y_units='kW',
     #
     # Sort in reverse order.
     #   Note native Python :func:`sorted` is broken with respect to NANs.
-    sortedLoads = np.sort(loads)
+    if( isSorted ):
+        sortedLoads = np.asarray(loads)
+    else:
+        sortedLoads = np.sort(loads)
     #
     # Expect a one-dimensional array.
     lastGoodIdx = sortedLoads.shape
@@ -52,7 +58,7 @@ def load_duration(loads, y_label='power', y_units='kW',
     sortedLoads = sortedLoads[lastGoodIdx::-1]
     #
     # Plot.
-    mainfig = plt.figure()
+    mainfig = plot_figure.newFigure()
     plot1 = mainfig.add_subplot(111)
     if( asPercent ):
         percentList = np.linspace(start=0, stop=100, num=len(sortedLoads))
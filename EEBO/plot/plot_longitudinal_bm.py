@@ -5,7 +5,7 @@
 #
 import numpy as np
 #
-import matplotlib.pyplot as plt
+from plot import plot_figure
 
 
 def longtitud_bm(values1, xTickLabels,
@@ -62,7 +62,7 @@ def longtitud_bm(values1, xTickLabels,
     tickPositions = np.arange(valCt)
     barWidth = 0.40
     #
-    mainfig = plt.figure()
+    mainfig = plot_figure.newFigure()
     plot1 = mainfig.add_subplot(111)
     plot1.bar(tickPositions,values1,barWidth,color=blue_hex,align='center',label='electricity')
     #
@@ -3,7 +3,7 @@
 
 #--- Provide access.
 #
-import matplotlib.pyplot as plt
+from plot import plot_figure
 import matplotlib.dates as mpld
 
 
@@ -46,7 +46,7 @@ def time_series(times, values,
     assert( (gridArgs is None) or (type(gridArgs)==dict) )
     #
     # Create figure.
-    mainfig = plt.figure()
+    mainfig = plot_figure.newFigure()
     plot1 = mainfig.add_subplot(111)
     #
     # Plot.
@@ -1,15 +1,203 @@
+"""Read meter data files, parsing each file only once."""
+
+
+#--- Provide access.
+#
+import threading
+#
 import pandas as pd
+#
+from util import calc_rollups
+from util import data_cache
+from util import datetime_utils as dtutil
+
+
+#--- Constants.
+#
+DEFAULT_DATA_PATH = 'samples/Bldg90_load_6month.csv'
+
+
+def readData(data_path=DEFAULT_DATA_PATH, datetime_format=None, use_cache=True):
+    """
+    Read a meter data file into a ``DataFrame`` indexed by time.
+
+    **Args:**
+
+    - *data_path*, path to a CSV file.  The first column holds the timestamps,
+      and every other column holds one meter's readings.
+    - *datetime_format*, format of the timestamps.  If ``None``, detect it
+      from the file (see :func:`util.datetime_utils.detectDatetimeFormat`).
+    - *use_cache*, ``True`` to load the already-parsed data from the on-disk
+      cache if the file has not changed since it was last read with the same
+      *datetime_format*, and to save the parsed data there otherwise (see
+      :mod:`util.data_cache`).
+
+    **Returns:**
+
+    - *data_df*, ``DataFrame`` with a :class:`pandas.DatetimeIndex` built from
+      the first column, and one ``float`` column per meter.
+    """
+    #
+    if( use_cache ):
+        cached = data_cache.loadCached(data_path, datetimeFormat=datetime_format)
+        if( cached is not None ):
+            datetimes, columns, values = cached
+            dateIndex = pd.DatetimeIndex(datetimes, name=columns[0])
+            return( pd.DataFrame(values, index=dateIndex, columns=columns[1:]) )
+    #
+    df = pd.read_csv(data_path)
+    #
+    # Parse the timestamps in bulk, rather than one call per row.
+    dateCol = df.columns[0]
+    dateIndex = pd.DatetimeIndex(dtutil.parseDatetimes(df[dateCol], datetime_format), name=dateCol)
+    #
+    data_df = df.drop(dateCol, axis=1).astype(float)
+    data_df.index = dateIndex
+    #
+    if( use_cache ):
+        data_cache.storeCached(data_path, dateIndex.values, [dateCol]+list(data_df.columns), data_df.values,
+            datetimeFormat=datetime_format)
+    #
+    return( data_df )
+    #
+    # End :func:`readData`.
+
+
+def readDataChunks(data_path=DEFAULT_DATA_PATH, datetime_format=None, chunk_rows=100000):
+    """
+    Read a meter data file a chunk of rows at a time, for files too large to
+    hold in memory.
+
+    **Args:**
+
+    - *data_path*, path to a CSV file, laid out as for :func:`readData`.
+    - *datetime_format*, format of the timestamps.  If ``None``, detect it
+      from the first chunk.
+    - *chunk_rows*, number of rows to read at a time.
+
+    **Returns:**
+
+    - A generator of ``DataFrame``, each like the one returned by
+      :func:`readData`, for the next *chunk_rows* rows of the file.
+
+    **Notes:**
+
+    - Does not use the on-disk cache.
+    """
+    #
+    for df in pd.read_csv(data_path, chunksize=chunk_rows):
+        dateCol = df.columns[0]
+        if( datetime_format is None ):
+            datetime_format = dtutil.detectDatetimeFormat(df[dateCol])
+        dateIndex = pd.DatetimeIndex(dtutil.parseDatetimes(df[dateCol], datetime_format), name=dateCol)
+        #
+        data_df = df.drop(dateCol, axis=1).astype(float)
+        data_df.index = dateIndex
+        yield( data_df )
+    #
+    # End :func:`readDataChunks`.
+
+
+class MeterDataset(object):
+    """
+    A meter data file, read once and held in memory.
+
+    **Notes:**
+
+    - The data are aggregated to every level in :data:`util.calc_rollups.LEVELS`
+      in one pass, and the results kept.  Switching between granularities
+      after that is just a lookup, and never goes back to the file.
+    - Call :meth:`prepareRollups` right after loading to do the aggregation in
+      a background thread, without holding up the caller (e.g., a GUI).
+      Otherwise it happens on the first call to :meth:`rollup`.
+    """
+
+    def __init__(self, data_path=DEFAULT_DATA_PATH):
+        self.data_path = data_path
+        self.df = readData(data_path)
+        self.__rollups = dict()
+        self.__workers = dict()
+        self.__lock = threading.Lock()
+
+    @property
+    def columns(self):
+        return( self.df.columns )
+
+    def prepareRollups(self, how='sum'):
+        """
+        Start aggregating the data to every level, with *how*, in a background
+        thread.  Do nothing if already done or under way.
+        """
+        #
+        with self.__lock:
+            if( how in self.__rollups or how in self.__workers ):
+                return
+            worker = threading.Thread(target=self.__computeRollups, args=(how,))
+            worker.daemon = True
+            self.__workers[how] = worker
+            worker.start()
+        #
+        # End :meth:`prepareRollups`.
+
+    def rollup(self, level, how='sum'):
+        """
+        Return the data aggregated to bins of *level* (e.g., ``'15min'``, ``'day'``).
+
+        **Args:**
+
+        - *level*, a name from :data:`util.calc_rollups.LEVELS`.
+        - *how*, a name from :data:`util.calc_rollups.AGGREGATIONS`, to apply
+          within each bin.
+
+        **Returns:**
+
+        - *rollup_df*, ``DataFrame`` with one row per bin, or ``None`` if the
+          aggregation is still under way in the background.
+
+        **Notes:**
+
+        - Never waits on the background thread.  If this returns ``None``,
+          call again later, e.g., from a timer, until the data are ready.
+        - If the aggregation was never started, or failed in the background,
+          do it here, so the caller sees any exception.
+        """
+        #
+        with self.__lock:
+            rollups = self.__rollups.get(how)
+            running = ( how in self.__workers )
+        if( rollups is None ):
+            if( running ):
+                return( None )
+            rollups = self.__computeRollups(how)
+        #
+        return( rollups[level] )
+        #
+        # End :meth:`rollup`.
+
+    def __computeRollups(self, how):
+        try:
+            rollups = calc_rollups.rollupLevels(self.df, calc_rollups.LEVELS, how)
+            with self.__lock:
+                self.__rollups[how] = rollups
+        finally:
+            with self.__lock:
+                self.__workers.pop(how, None)
+        return( rollups )
+
+
+# Datasets already read, by path.
+__datasets = dict()
+
 
-def readData(self, data_path):
-    df=pd.read_csv('samples/Bldg90_load_6month.csv');
-    
-    #select datetime column by user
-    
-    #csv file preview 5lines with head(5)
-    #and select column for plot
-    
-    data_df=df
-    #data_df=df.column_name(A, B, C)
-    #datetime_column.append(saved_column)
-    
-    return data_df 
\ No newline at end of file
+def loadDataset(data_path=DEFAULT_DATA_PATH):
+    """
+    Return the :class:`MeterDataset` for *data_path*, reading the file only
+    if it has not been read already.
+    """
+    #
+    if( data_path not in __datasets ):
+        __datasets[data_path] = MeterDataset(data_path)
+    #
+    return( __datasets[data_path] )
+    #
+    # End :func:`loadDataset`.
@@ -0,0 +1,188 @@
+"""
+Render many figures at once, in a pool of worker processes.
+
+**Notes:**
+
+- Rendering with :mod:`matplotlib` is CPU-bound, and holds the GIL, so
+  threads do not help.  :func:`renderFigures` hands each figure to a separate
+  process instead, for a speedup close to the number of cores when there are
+  many figures, e.g., for a portfolio of buildings.
+- The workers use the non-interactive Agg backend, whatever backend the
+  calling process uses.
+- Each ``numpy`` array passed to the jobs is written once to a temporary
+  file, and the workers map that file into memory, rather than receiving a
+  pickled copy of the array per job.  Arrays of ``datetime64`` values can be
+  shared this way, but lists of ``datetime`` objects get pickled.  So for long
+  series, pass times as a ``datetime64`` array, or as a
+  :class:`util.time_axis.TimeAxis`, which is small.
+- The functions in :data:`DATETIME_FUNCTIONS` need times that give
+  ``datetime`` objects, i.e., a list or a :class:`util.time_axis.TimeAxis`.
+  A worker converts a ``datetime64`` array of times to a
+  :class:`util.time_axis.TimeAxis` before calling them.
+- If a worker process dies, e.g., killed for using too much memory, the
+  whole pool stops working.  Then every job not yet finished gets ``False``,
+  not just the job that worker was running.
+"""
+
+
+#--- Provide access.
+#
+import concurrent.futures
+import os
+import shutil
+import tempfile
+#
+import numpy as np
+
+
+#--- Constants.
+#
+# Functions of :mod:`gen_plot` that :func:`renderFigures` can run.
+RENDER_FUNCTIONS = ('genLoadProfilePlot', 'genHeatMap', 'genEnergySignaturePlot',
+    'genLoadDurationCurve', 'genLongitudBenchmark', 'genLongitudRollingBenchmark',
+    'genCrossSectionBenchmark')
+#
+# Functions of :mod:`gen_plot` whose first argument, *datetimes*, must give
+# ``datetime`` objects.
+DATETIME_FUNCTIONS = ('genLongitudBenchmark', 'genCrossSectionBenchmark')
+
+
+class SharedArray(object):
+    """
+    Stand-in, passed to a worker process, for an array saved to the ``.npy``
+    file at *path*.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        return( np.load(self.path, mmap_mode='r') )
+
+
+def renderFigures(jobs, maxWorkers=None):
+    """
+    Run figure-generating functions of :mod:`gen_plot` in a pool of processes.
+
+    **Args:**
+
+    - *jobs*, sequence of (*fcnName*, *args*) or (*fcnName*, *args*, *kwargs*)
+      tuples, where *fcnName* is a name from :data:`RENDER_FUNCTIONS`, and
+      *args* and *kwargs* are its positional and keyword arguments.
+    - *maxWorkers*, number of worker processes.  If ``None``, one per CPU.
+
+    **Returns:**
+
+    - *successes*, list with one flag per entry of *jobs*, ``True`` if the
+      function reported it successfully generated the figure.
+
+    **Notes:**
+
+    - A job that raises an ``Exception`` gets ``False``.  If a worker process
+      dies, the job it was running, and every job after it, gets ``False``.
+    - The workers see arrays read-only.  The ``gen_plot`` functions do not
+      change their inputs.
+    """
+    #
+    # Check inputs.
+    jobs = [(job[0], tuple(job[1]), dict(job[2]) if len(job) > 2 else dict()) for job in jobs]
+    for fcnName, _, _ in jobs:
+        assert( fcnName in RENDER_FUNCTIONS )
+    #
+    shareDir = tempfile.mkdtemp(prefix='eebo_render_')
+    try:
+        #
+        # Write each distinct array to a file, just once.
+        sharedByIds = dict()
+        sharedJobs = list()
+        for fcnName, args, kwargs in jobs:
+            args = tuple(__shareArray(arg, shareDir, sharedByIds) for arg in args)
+            kwargs = dict((key, __shareArray(val, shareDir, sharedByIds)) for key, val in kwargs.items())
+            sharedJobs.append((fcnName, args, kwargs))
+        #
+        with concurrent.futures.ProcessPoolExecutor(max_workers=maxWorkers,
+            initializer=__initWorker) as executor:
+            futures = [executor.submit(__renderJob, *job) for job in sharedJobs]
+            successes = list()
+            for future in futures:
+                try:
+                    successes.append(future.result())
+                except Exception:
+                    # Here, the worker process died, or the job could not be pickled.
+                    successes.append(False)
+    finally:
+        shutil.rmtree(shareDir, ignore_errors=True)
+    #
+    return( successes )
+    #
+    # End :func:`renderFigures`.
+
+
+def __initWorker():
+    """
+    Prepare a worker process to render figures without a display.
+    """
+    #
+    # Note a forked worker may already have imported :mod:`matplotlib.pyplot`
+    # with another backend, so switch rather than just set it.
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+    #
+    # End :func:`__initWorker`.
+
+
+def __renderJob(fcnName, args, kwargs):
+    """
+    Run one job in a worker process, and return its success flag.
+    """
+    #
+    # Import here, after :func:`__initWorker` has set the backend.
+    import matplotlib.pyplot as plt
+    import gen_plot
+    from util import time_axis
+    #
+    args = [arg.load() if isinstance(arg, SharedArray) else arg for arg in args]
+    kwargs = dict((key, val.load() if isinstance(val, SharedArray) else val) for key, val in kwargs.items())
+    #
+    # Give the functions that need ``datetime`` objects a :class:`util.time_axis.TimeAxis`.
+    if( fcnName in DATETIME_FUNCTIONS ):
+        if( len(args) > 0 and __isDatetime64(args[0]) ):
+            args[0] = time_axis.TimeAxis.fromDatetimes(args[0])
+        elif( __isDatetime64(kwargs.get('datetimes')) ):
+            kwargs['datetimes'] = time_axis.TimeAxis.fromDatetimes(kwargs['datetimes'])
+    try:
+        return( getattr(gen_plot, fcnName)(*args, **kwargs) is True )
+    except Exception:
+        return( False )
+    finally:
+        # Free the figures, since the worker goes on to other jobs.
+        plt.close('all')
+    #
+    # End :func:`__renderJob`.
+
+
+def __isDatetime64(value):
+    return( isinstance(value, np.ndarray) and value.dtype.kind == 'M' )
+
+
+def __shareArray(value, shareDir, sharedByIds):
+    """
+    If *value* is a numeric or ``datetime64`` array, save it to a file in
+    *shareDir*, unless already saved, and return its :class:`SharedArray`.
+    Otherwise, return *value*.
+    """
+    #
+    if( not isinstance(value, np.ndarray) or value.dtype.kind not in 'biufcmM' ):
+        return( value )
+    #
+    # Note keep *value* with its stand-in, so its ``id`` can't be reused.
+    if( id(value) not in sharedByIds ):
+        path = os.path.join(shareDir, '{0}.npy'.format(len(sharedByIds)))
+        np.save(path, value)
+        sharedByIds[id(value)] = (SharedArray(path), value)
+    #
+    return( sharedByIds[id(value)][0] )
+    #
+    # End :func:`__shareArray`.
@@ -0,0 +1,273 @@
+"""
+Assemble a building report, computing each shared intermediate only once.
+
+**Notes:**
+
+- Many of the functions in :mod:`gen_plot` need the same intermediate
+  results: the last year of data, the loads folded into a grid by day, the
+  annual energy, and so on.  Called one at a time, each finds those for
+  itself.  A :class:`ReportPipeline` instead declares each intermediate, and
+  each figure or summary, as a named step that depends on other named steps.
+  Each step runs only once, and steps that do not depend on each other run
+  at the same time, in a pool of threads.
+- :mod:`matplotlib` is not thread-safe, so steps that draw figures run one
+  at a time, holding :data:`PYPLOT_LOCK`.  The numerical steps run alongside
+  them.
+- :func:`makeBuildingPipeline` declares the steps for a standard building
+  report.
+"""
+
+
+#--- Provide access.
+#
+import concurrent.futures
+import datetime as dto
+import threading
+#
+import numpy as np
+#
+import gen_plot
+#
+from util import calc_statistics as a_stat
+from util import datetime_utils as dtutil
+from util import fold_series
+
+
+#--- Constants.
+#
+# Hold while drawing figures with :mod:`matplotlib`.
+PYPLOT_LOCK = threading.Lock()
+#
+# Names of the figure steps :func:`makeBuildingPipeline` can add.
+FIGURE_STEPS = ('loadProfile', 'heatMap', 'energySignature', 'loadDuration',
+    'longitudBenchmark', 'longitudRollingBenchmark', 'crossSectionBenchmark')
+
+
+class ReportPipeline(object):
+    """
+    A set of named steps, each a function of the results of other steps.
+
+    **Notes:**
+
+    - Results are kept, so running the pipeline again, e.g., for more
+      targets, runs only the steps not yet run.
+    - A step that raises an ``Exception``, or that depends on a step that
+      failed, gets result ``False``, following the convention of
+      :mod:`gen_plot`.  The ``Exception`` is kept in :attr:`errors`.
+    """
+
+    def __init__(self):
+        self.__steps = dict()
+        self.__results = dict()
+        self.errors = dict()
+
+    def addInput(self, name, value):
+        """
+        Add a step named *name*, whose result is just *value*.
+        """
+        #
+        assert( name not in self.__steps )
+        self.__steps[name] = (None, (), False)
+        self.__results[name] = value
+        #
+        # End :meth:`addInput`.
+
+    def addStep(self, name, fcn, depNames=(), usesPyplot=False):
+        """
+        Add a step.
+
+        **Args:**
+
+        - *name*, name of the step.
+        - *fcn*, function to call, with the results of the steps named in
+          *depNames*, in that order, as its arguments.
+        - *depNames*, sequence of names of the steps this step depends on.  They
+          need not be added yet, but must be by the time the pipeline runs.
+        - *usesPyplot*, ``True`` if *fcn* draws figures with :mod:`matplotlib`.
+        """
+        #
+        assert( name not in self.__steps )
+        self.__steps[name] = (fcn, tuple(depNames), usesPyplot)
+        #
+        # End :meth:`addStep`.
+
+    def __contains__(self, name):
+        return( name in self.__steps )
+
+    def run(self, targets=None, maxWorkers=None):
+        """
+        Run the steps needed for *targets*.
+
+        **Args:**
+
+        - *targets*, sequence of names of steps.  If ``None``, run every step.
+        - *maxWorkers*, largest number of steps to run at once.  If ``None``,
+          use the default of :class:`concurrent.futures.ThreadPoolExecutor`.
+
+        **Returns:**
+
+        - *results*, dictionary mapping each name in *targets* to its result.
+        """
+        #
+        if( targets is None ):
+            targets = list(self.__steps)
+        #
+        # Find the steps to run, i.e., every step needed and not yet run.
+        toRun = set()
+        toVisit = list(targets)
+        while( len(toVisit) > 0 ):
+            name = toVisit.pop()
+            if( name in self.__results or name in toRun ):
+                continue
+            if( name not in self.__steps ):
+                raise KeyError('No step named {0!r}'.format(name))
+            toRun.add(name)
+            toVisit.extend(self.__steps[name][1])
+        #
+        # Run each step once all the steps it depends on have finished.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+            running = dict()
+            while( len(toRun) > 0 or len(running) > 0 ):
+                ready = [name for name in toRun
+                    if all(dep in self.__results for dep in self.__steps[name][1])]
+                for name in ready:
+                    toRun.remove(name)
+                    running[executor.submit(self.__runStep, name)] = name
+                if( len(running) == 0 ):
+                    raise ValueError('Steps depend on each other in a cycle: {0}'.format(sorted(toRun)))
+                doneFutures, _ = concurrent.futures.wait(running,
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in doneFutures:
+                    self.__results[running.pop(future)] = future.result()
+        #
+        return( dict((name, self.__results[name]) for name in targets) )
+        #
+        # End :meth:`run`.
+
+    def __runStep(self, name):
+        fcn, depNames, usesPyplot = self.__steps[name]
+        for dep in depNames:
+            if( dep in self.errors ):
+                self.errors[name] = self.errors[dep]
+                return( False )
+        args = [self.__results[dep] for dep in depNames]
+        try:
+            if( usesPyplot ):
+                with PYPLOT_LOCK:
+                    return( fcn(*args) )
+            return( fcn(*args) )
+        except Exception as err:
+            self.errors[name] = err
+            return( False )
+
+
+def makeBuildingPipeline(datetimes, loads, bldgMetaData, replacements, figPaths,
+    oats=None, oatUnitsStr='F', gasLoads=None, gasUnitsStr='kBtu/hr', xmlWritePath=None):
+    """
+    Declare the steps of a building report.
+
+    **Args:**
+
+    - *datetimes*, array-like sequence of reading times.
+    - *loads*, array-like sequence of electric loads, one per entry of *datetimes*.
+    - *bldgMetaData*, dictionary of measurement units and other metadata.
+    - *replacements*, dictionary to be filled in by the summary steps.
+    - *figPaths*, dictionary mapping the name of each figure step to include,
+      from :data:`FIGURE_STEPS`, to the path to save the figure.
+    - *oats*, array-like sequence of outside air temperatures, one per entry
+      of *datetimes*, or ``None``.  Needed for step ``'energySignature'``.
+    - *gasLoads*, array-like sequence of gas loads, or ``None``.
+    - *xmlWritePath*, path to save xml file for step ``'crossSectionBenchmark'``.
+
+    **Returns:**
+
+    - *pipeline*, a :class:`ReportPipeline`.  Running it gives the success flag
+      of step ``'dailySummary'`` and of each figure step in *figPaths*.
+
+    **Notes:**
+
+    - The intermediate steps are ``'lastYear'`` (the data from the last year,
+      as a tuple of times, loads, and temperatures), ``'dayGrid'`` (the last
+      year's loads folded by day, see :func:`util.fold_series.foldSeries`),
+      ``'sortedLoads'``, ``'weatherSensitivity'`` (only with *oats*), and
+      ``'annualEnergy'`` (see :func:`gen_plot.findAnnualEnergy`).
+    - The heat map, energy signature, load duration curve, and daily summary
+      cover the last year.  The load profile and benchmarks cover all the data.
+    """
+    #
+    # Check inputs.
+    for name in figPaths:
+        assert( name in FIGURE_STEPS )
+    assert( oats is not None or 'energySignature' not in figPaths )
+    loadUnitsStr = bldgMetaData['load-units']
+    #
+    pipeline = ReportPipeline()
+    pipeline.addInput('datetimes', datetimes)
+    pipeline.addInput('loads', np.asarray(loads, dtype=float))
+    pipeline.addInput('oats', None if oats is None else np.asarray(oats, dtype=float))
+    pipeline.addInput('gasLoads', gasLoads)
+    #
+    # Intermediates.
+    pipeline.addStep('lastYear', __clipLastYear, ('datetimes', 'loads', 'oats'))
+    pipeline.addStep('dayGrid', lambda lastYear: fold_series.foldSeries(lastYear[0], lastYear[1]),
+        ('lastYear',))
+    pipeline.addStep('sortedLoads', lambda lastYear: np.sort(lastYear[1]), ('lastYear',))
+    if( oats is not None ):
+        pipeline.addStep('weatherSensitivity', lambda lastYear: a_stat.findSpearmanRank(lastYear[1], lastYear[2]),
+            ('lastYear',))
+    pipeline.addStep('annualEnergy', gen_plot.findAnnualEnergy, ('datetimes', 'loads', 'gasLoads'))
+    #
+    # Summaries and figures.
+    pipeline.addStep('dailySummary',
+        lambda dayGrid: gen_plot.genDailySummary(dayGrid[1], bldgMetaData, replacements),
+        ('dayGrid',))
+    figSteps = {
+        'loadProfile': (lambda times, loads, figPath:
+            gen_plot.genLoadProfilePlot(times, loads, loadUnitsStr, figPath),
+            ('datetimes', 'loads')),
+        'heatMap': (lambda dayGrid, figPath:
+            gen_plot.genHeatMap(dayGrid[0], dayGrid[1], loadUnitsStr, figPath),
+            ('dayGrid',)),
+        'energySignature': (lambda lastYear, weatherSensitivity, figPath:
+            gen_plot.genEnergySignaturePlot(lastYear[2], lastYear[1], oatUnitsStr, loadUnitsStr,
+                figPath, weatherSensitivity=weatherSensitivity),
+            ('lastYear', 'weatherSensitivity')),
+        'loadDuration': (lambda lastYear, sortedLoads, figPath:
+            gen_plot.genLoadDurationCurve(lastYear[1], loadUnitsStr, figPath, sortedLoads=sortedLoads),
+            ('lastYear', 'sortedLoads')),
+        'longitudBenchmark': (lambda times, loads, gasLoads, annualEnergy, figPath:
+            gen_plot.genLongitudBenchmark(times, loads, loadUnitsStr, gasLoads, gasUnitsStr,
+                figPath, yearlyEnergy=annualEnergy),
+            ('datetimes', 'loads', 'gasLoads', 'annualEnergy')),
+        'longitudRollingBenchmark': (lambda times, loads, figPath:
+            gen_plot.genLongitudRollingBenchmark(times, loads, loadUnitsStr, figPath),
+            ('datetimes', 'loads')),
+        'crossSectionBenchmark': (lambda times, loads, gasLoads, annualEnergy, figPath:
+            gen_plot.genCrossSectionBenchmark(times, loads, bldgMetaData, replacements,
+                gasLoads, xmlWritePath, figPath, yearlyEnergy=annualEnergy),
+            ('datetimes', 'loads', 'gasLoads', 'annualEnergy')),
+        }
+    for name, figPath in figPaths.items():
+        fcn, depNames = figSteps[name]
+        pipeline.addInput(name+'Path', figPath)
+        pipeline.addStep(name, fcn, depNames+(name+'Path',), usesPyplot=True)
+    #
+    return( pipeline )
+    #
+    # End :func:`makeBuildingPipeline`.
+
+
+def __clipLastYear(datetimes, loads, oats):
+    """
+    Return the times, loads, and temperatures for the last year of whole days
+    in *datetimes*.
+    """
+    #
+    times = dtutil.toDatetime64(datetimes)
+    lastTime = times[-1].astype('datetime64[us]').item()
+    startTime = dtutil.goBackOneYear(lastTime) + dto.timedelta(days=1)
+    startIdx = int(np.searchsorted(times, np.datetime64(startTime), side='left'))
+    #
+    return( (times[startIdx:], loads[startIdx:], None if oats is None else oats[startIdx:]) )
+    #
+    # End :func:`__clipLastYear`.
@@ -0,0 +1,68 @@
+"""
+Check that memory stays flat while generating many figures in one process.
+
+Run from the ``EEBO`` directory, e.g.::
+
+    python samples/bench_figure_memory.py 10000
+
+Prints the peak resident memory every tenth of the way through.  Once warmed
+up, over the first tenth of the figures, the peak should stop growing, and
+the run fails if it grows by more than :data:`GROWTH_MAX_MB` after that, or
+if :mod:`matplotlib.pyplot` has any figures open at the end.  Before figures
+were made outside of :mod:`matplotlib.pyplot`, every figure stayed open, and
+the peak grew with the number of figures.
+"""
+
+
+#--- Provide access.
+#
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+#
+import matplotlib.pyplot as plt
+import numpy as np
+#
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gen_plot
+
+
+#--- Constants.
+#
+# Most the peak memory may grow after warming up [MB].
+GROWTH_MAX_MB = 20.0
+
+
+def main(figCt):
+    rng = np.random.RandomState(0)
+    loads = 100 + 20*rng.rand(96*30)
+    figDir = tempfile.mkdtemp()
+    figWritePath = os.path.join(figDir, 'load_duration.png')
+    #
+    startTime = time.time()
+    warmPeakMb = None
+    try:
+        for figIdx in range(figCt):
+            assert( gen_plot.genLoadDurationCurve(loads, 'kW', figWritePath) )
+            if( (figIdx+1) % max(1, figCt//10) == 0 ):
+                # Note Linux reports ``ru_maxrss`` in kilobytes.
+                peakMb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+                print('{0:6d} figures, {1:7.1f} s, peak memory {2:8.1f} MB'.format(figIdx+1,
+                    time.time()-startTime, peakMb))
+                if( warmPeakMb is None ):
+                    warmPeakMb = peakMb
+    finally:
+        shutil.rmtree(figDir, ignore_errors=True)
+    #
+    if( warmPeakMb is not None ):
+        assert peakMb - warmPeakMb < GROWTH_MAX_MB, \
+            'Peak memory grew by {0:.1f} MB after warming up'.format(peakMb - warmPeakMb)
+    assert plt.get_fignums() == [], \
+        '{0} figures left open in pyplot'.format(len(plt.get_fignums()))
+
+
+if( __name__ == '__main__' ):
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
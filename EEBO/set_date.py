@@ -2,6 +2,8 @@ import datetime
 import numpy as np
 import pandas as pd
 
+import read_data
+
 # http://jsideas.net/python/2015/08/30/daily_to_weekly.html
 #class Set_Date:
     #def __init__(self, parent=None):
@@ -105,101 +107,37 @@ def df_to_day(self):
         return pd.concat(daily_df, axis=1)
 '''
 
-def df_to_day():
-    df = pd.read_csv('samples/Bldg90_load_6month.csv')
-    df[df.columns[0]] = df[df.columns[0]].apply(lambda x: pd.to_datetime(str(x), format='%m/%d/%Y %H:%M'))   
-    df.set_index(df[df.columns[0]], inplace=True)
-    
-    df = df.drop(df.columns[0], 1)
-    
-    daily_df = []
-        
-    for i in range(len(df.columns)):
-        daily_df.append(df.resample('D', how={df.columns[i]:np.sum}))
+def df_to_day(dataset=None):
+    return( __rollup(dataset, 'day') )
     
-    return pd.concat(daily_df, axis=1)
-    
-def df_to_week(self):
-    df = pd.read_csv('samples/Bldg90_load_6month.csv')
-    
-    df[df.columns[0]] = df[df.columns[0]].apply(lambda x: pd.to_datetime(str(x), format='%m/%d/%Y %H:%M'))
-    df.set_index(df[df.columns[0]], inplace=True)
-    
-    df = df.drop(df.columns[0], 1)
-    
-    daily_df = []
-    for i in range(len(df.columns)):
-        daily_df.append(df.resample('W', how={df.columns[i]:np.sum}))
+def df_to_week(dataset=None):
+    return( __rollup(dataset, 'week') )
     
-    return pd.concat(daily_df, axis=1)
+def df_to_month(dataset=None):
+    return( __rollup(dataset, 'month') )
     
-def df_to_month(self):
-    df = pd.read_csv('samples/Bldg90_load_6month.csv')
-    
-    df[df.columns[0]] = df[df.columns[0]].apply(lambda x: pd.to_datetime(str(x), format='%m/%d/%Y %H:%M'))   
-    df.set_index(df[df.columns[0]], inplace=True)
-
-    df = df.drop(df.columns[0], 1)
-    
-    daily_df = []
-    for i in range(len(df.columns)):
-        daily_df.append(df.resample('M', how={df.columns[i]:np.sum}))
-
-    return pd.concat(daily_df, axis=1)
-    
-def df_to_min10(self):
-    df = pd.read_csv('samples/Bldg90_load_6month.csv')
-    
-    df[df.columns[0]] = df[df.columns[0]].apply(lambda x: pd.to_datetime(str(x), format='%m/%d/%Y %H:%M'))   
-    df.set_index(df[df.columns[0]], inplace=True)
-    
-    df = df.drop(df.columns[0], 1)
-    
-    daily_df = []
-    for i in range(len(df.columns)):
-        daily_df.append(df.resample('10T', how={df.columns[i]:np.sum}))
-        
-    return pd.concat(daily_df, axis=1)
+def df_to_min10(dataset=None):
+    return( __rollup(dataset, '10min') )
      
-def df_to_min15(self):
-    df = pd.read_csv('samples/Bldg90_load_6month.csv')
-    
-    df[df.columns[0]] = df[df.columns[0]].apply(lambda x: pd.to_datetime(str(x), format='%m/%d/%Y %H:%M'))   
-    df.set_index(df[df.columns[0]], inplace=True)
-    
-    df = df.drop(df.columns[0], 1)
-    
-    daily_df = []
-    for i in range(len(df.columns)):
-        daily_df.append(df.resample('15T', how={df.columns[i]:np.sum}))
-    
-    return pd.concat(daily_df, axis=1)
+def df_to_min15(dataset=None):
+    return( __rollup(dataset, '15min') )
      
-def df_to_min30(self):
-    df = pd.read_csv('samples/Bldg90_load_6month.csv')
-    
-    df[df.columns[0]] = df[df.columns[0]].apply(lambda x: pd.to_datetime(str(x), format='%m/%d/%Y %H:%M'))   
-    df.set_index(df[df.columns[0]], inplace=True)
-    
-    df = df.drop(df.columns[0], 1)
-    
-    daily_df = []
-    for i in range(len(df.columns)):
-        daily_df.append(df.resample('30T', how={df.columns[i]:np.sum}))
-    
-    return pd.concat(daily_df, axis=1)
+def df_to_min30(dataset=None):
+    return( __rollup(dataset, '30min') )
      
-def df_to_min60(self):
-    df = pd.read_csv('samples/Bldg90_load_6month.csv')
-    
-    df[df.columns[0]] = df[df.columns[0]].apply(lambda x: pd.to_datetime(str(x), format='%m/%d/%Y %H:%M'))   
-    df.set_index(df[df.columns[0]], inplace=True)
-    
-    df = df.drop(df.columns[0], 1)
-    
-    daily_df = []
-    for i in range(len(df.columns)):
-        daily_df.append(df.resample('60T', how={df.columns[i]:np.sum}))
-    
-    return pd.concat(daily_df, axis=1)
-        
\ No newline at end of file
+def df_to_min60(dataset=None):
+    return( __rollup(dataset, '60min') )
+
+def __rollup(dataset, level):
+    """
+    Sum every column of *dataset* over bins of *level*.
+
+    *dataset* is a :class:`read_data.MeterDataset`.  If ``None``, use the
+    shared dataset for the default file, which is read only the first time
+    it is needed.  All levels are computed together on first use (see
+    :mod:`util.calc_rollups`).  Returns ``None`` while they are still being
+    computed in the background (see :meth:`read_data.MeterDataset.rollup`).
+    """
+    if( dataset is None ):
+        dataset = read_data.loadDataset()
+    return( dataset.rollup(level, 'sum') )
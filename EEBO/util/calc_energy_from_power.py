@@ -5,7 +5,6 @@
 #
 import datetime as dto
 import numpy as np
-import math
 #
 from . import calc_simpsons_rule as simp
 #
@@ -18,20 +17,24 @@ from . import datetime_utils as dtutil
 __DAY_PER_SEC = 1.0 / (60*60*24)
 
 
-def calc_annual_energy(loads, datetimes):
+def calc_annual_energy(loads, datetimes, rule='simpsons'):
     """
     Find annual energy for as many full years as have data.
 
     **Args:**
 
-    - *loads*, array-like sequence of power data [kW] (float).
-    - *datetimes*, array-like sequence of ``datetime`` objects.
+    - *loads*, array-like sequence of power data [kW] (float).  Or, a 2-D
+      array with one row per entry of *datetimes*, and one column per meter.
+    - *datetimes*, array-like sequence of ``datetime`` objects, or a
+      :class:`util.time_axis.TimeAxis`.
+    - *rule*, integration rule, ``'simpsons'`` or ``'trapezoid'``.
 
     **Returns:**
 
     - *yearlyEnergies*, [0] list of total energy [kW.h] (integral of *loads* over
       time), [1] list of starting dates, [2] list of ending dates, 
-      for as many whole years as have data.
+      for as many whole years as have data.  If *loads* is 2-D, each total
+      energy is a ``numpy`` array, with one entry per meter.
 
     **Notes:**
 
@@ -44,6 +47,14 @@ def calc_annual_energy(loads, datetimes):
       sequence of ``NAN`` values will get integrated as if some weighted average
       of the good loads on either side of the missing sequence, held over the
       entire gap.
+    - If *loads* is 2-D, each meter's energies are the same as if its column
+      were passed alone, with its own ``NAN`` values discarded.  All meters
+      share one search for the year boundaries, except a meter whose last
+      good reading falls on an earlier day than the last reading.  Meters
+      with ``NAN`` values in the same places (e.g., none) share each year's
+      integration.  The years, and their dates, are those found for the
+      first meter.  A meter without a year starting on the same date gets
+      ``NAN`` for that year.
 
     **Enhancements:**
 
@@ -51,177 +62,29 @@ def calc_annual_energy(loads, datetimes):
       list, or via tuples).
     """
     #
-    # Check inputs.
-    assert( len(loads) == len(datetimes) )
-    assert( isinstance(datetimes[0],dto.date) )
-    #
-    # Remove ``NAN`` values if necessary.
-    if( np.any(np.isnan(loads)) ):
-        goodLoads = clean.makeSelector_finite(loads)
-        loadsClean = clean.applySelector(goodLoads, loads)
-        datesClean = clean.applySelector(goodLoads, datetimes)
-    else:
-        # Note the assignments here just create references to the existing data,
-        # rather than copying data.  So no big storage or speed implication.
-        loadsClean = loads
-        datesClean = datetimes
-    #
-    # Notes - identifying which data to pass to the integrator:
-    #
-    #   In general, the integration routine needs to have one value from some
-    # date that is not in the range of dates it's supposed to integrate.  To
-    # see why, consider integrating power over a single day, where data are
-    # reported every six hours:
-    # power ->  1   1   1   1   1
-    # time  -> 00  06  12  18  24
-    # day   ->  M   M   M   M   M
-    #   Since power is constant at 1 kW, the energy over the day is 24 kW.h.
-    #   Note that, for the integrator to consider the whole day, it needs to
-    # start on Monday 0h, and run through Monday 24h.
-    #   However, one of those bounding values won't be labeled as shown in the
-    # diagram above.  Either:
-    # - Monday 0h is labeled as Sunday 24h, or
-    # - Monday 24h is labeled as Tuesday 0h.
-    #   In fact, the Python ``datetime`` class takes the second option.
-    # Therefore, in order to find the energy use on Monday, the first reading
-    # from Tuesday has to be included in the integration.
-    #
-    # Notes - interpolating at date transitions:
-    #
-    #   If data do not fall exactly on the day transition, some interpolation
-    # is needed.  Suppose data are reported every six hours as shown:
-    # power ->  1   1  ----  1   1
-    # time  -> 14  20  24/0  2   8
-    # day   ->  M   M   M/T  T   T
-    #   Let XX represent the cumulative energy consumption up to Monday 20h.
-    # Then the cumulative consumption up to Tuesday 2h is XX + 6 kW.h.
-    # Interpolating 4/6 of the way through the interval, the cumulative
-    # consumption up to Monday 24h is XX + 4 kW.h.
-    #
-    # Notes - handling last date available:
-    #
-    #   Because ``datetime`` objects label midnight as time 0 of the day
-    # just starting, treat the date of the last entry in *datesClean* as the
-    # the date that starts a year.
-    #   Consider the case that the last entry in *datesClean* is at exactly
-    # midnight (say, on 9-September).  Then the data support treating a year as
-    # starting on 9-September and running through 8-September.
-    #   If, on the other hand, the last entry in *datesClean* is sometime
-    # in the middle of the day (say, at 2pm on 9-September), then there are not
-    # enough data to say a year runs from 9-September through 10-September.
-    # Again, the first day of each year is 9-September.
-    #
-    # Notes - variable names.
-    #
-    #   Variable names for dates use the following conventions:
-    # - Actual dates, which correspond to ``datetime`` or ``date`` entries
-    #   in *datesClean*, have names like *currYearStartDate* and *currYearEndDate*.
-    #   These may also have an associated index into *datesClean*, named like
-    #   *currYearStartIdx* and *currYearEndIdx*.
-    # - Theoretical dates, which define when a year begins and ends, have names
-    #   like *currYearStartsOn*.
-    #
-    # Initialize.
-    yearlyEnergies = list()    
-    #
-    # Last date in *datesClean* starts a year (because either it marks midnight
-    # of the day before, or it has incomplete data).
-    nextYearStartIdx = len(loadsClean) - 1
-    if( nextYearStartIdx <= 0 ):
-        return( yearlyEnergies )
-    nextYearStartsOn = datesClean[nextYearStartIdx]
-    #
-    # Find the exact date transition if necessary.
-    if( type(datesClean[0]) == dto.datetime ):
-        #
-        # Here, *nextYearStartsOn* has time information.
-        #   Coerce it to be a pure ``date``, and adjust *nextYearStartIdx* to
-        # mark the earliest ``datetime`` in *datesClean* with this date.
-        nextYearStartsOn = dto.datetime(nextYearStartsOn.year, nextYearStartsOn.month, nextYearStartsOn.day, 0)
-        nextYearStartIdx = dtutil.findLatestEntryBefore(datesClean, nextYearStartsOn, startIdx=0, blockIdx=nextYearStartIdx+1) + 1
-    #
-    # Step backward through *loadsClean*, summarizing years.
-    while( True ):
-        #
-        # Here, assume:
-        # - *nextYearStartsOn* gives the first date of the year after the year
-        #   of interest.  Note that, due to missing data, *datesClean* might
-        #   not have a matching date.
-        # - *nextYearStartsOn* has the same type as entries in *datesClean*.
-        # - *nextYearStartIdx* marks the first entry in *datesClean* that can
-        #   belong to the year after the year of interest.
-        #
-        # Figure out range of data to integrate.
-        currYearStartsOn = dtutil.goBackOneYear(nextYearStartsOn)
-        prevYearEndIdx = dtutil.findLatestEntryBefore(datesClean, currYearStartsOn, startIdx=0, blockIdx=nextYearStartIdx)
-        #
-        # Check that data spans a full year, or close to it.
-        if( prevYearEndIdx == 0 ):
-            earliestDateAvailable = datesClean[0]
-            missingDayCt = (earliestDateAvailable - currYearStartsOn).total_seconds() * __DAY_PER_SEC
-            if( missingDayCt > 3 ):
-                break
-        #
-        # Here:
-        # - *prevYearEndIdx* marks the entry that spans the transition from the
-        #   previous year, if one exists, to the current year.
-        # - *nextYearStartIdx* marks the entry that spans the transition to the
-        #   next year.
-        #
-        # Find energy use for the current year.
-        #   Note have to "block" on ``nextYearStartIdx + 1`` because have to
-        # integrate up to the point at *nextYearStartIdx*.
-        yearlyEnergy = __integratePtsInTime(loadsClean, datesClean, startIdx=prevYearEndIdx, blockIdx=nextYearStartIdx+1)
-        #
-        # Adjust *yearlyEnergy* for the transition from previous year to current year.
-        sec_excess = (currYearStartsOn - datesClean[prevYearEndIdx]).total_seconds()
-        if( sec_excess > 0 ):
-            # Excess energy is a fraction (sec_excess/sec_total) of the total
-            # energy in the first bin.  Total energy in the first bin is
-            # proportional to sec_total, so sec_total cancels out.
-            removeEnergy = 0.5*(loadsClean[prevYearEndIdx] + loadsClean[prevYearEndIdx+1]) * sec_excess / 3600.
-            yearlyEnergy -= removeEnergy
-        #
-        # Adjust *yearlyEnergy* for the transition from current year to next year.
-        sec_excess = (datesClean[nextYearStartIdx] - nextYearStartsOn).total_seconds()
-        if( sec_excess > 0 ):
-            removeEnergy = 0.5*(loadsClean[nextYearStartIdx-1] + loadsClean[nextYearStartIdx]) * sec_excess / 3600.
-            yearlyEnergy -= removeEnergy
-        #
-        # Save result.
-        yearlyEnergies.append(( yearlyEnergy, 
-                                currYearStartsOn, 
-                                datesClean[nextYearStartIdx-1] ))
-        #
-        # Prepare for next iteration.
-        if( prevYearEndIdx == 0 ):
-            break
-        nextYearStartsOn = currYearStartsOn
-        nextYearStartIdx = prevYearEndIdx + 1
-    #
-    # Here, *yearlyEnergies* has desired values, but in the wrong order (since
-    # worked backward through years, but want most recent year at end of list).
-    yearlyEnergies.reverse()
-    #
-    return( yearlyEnergies)
+    return( __calcPeriodEnergies(loads, datetimes, dtutil.goBackOneYear, rule) )
     #
     # End :func:`calc_annual_energy`.
 
 
-def calc_monthly_energy(loads, datetimes, monthCt):
+def calc_monthly_energy(loads, datetimes, monthCt, rule='simpsons'):
     """
     Find monthly energy for as many full months as have data.
 
     **Args:**
 
-    - *loads*, array-like sequence of power data [kW] (float).
-    - *datetimes*, array-like sequence of ``datetime`` objects.
+    - *loads*, array-like sequence of power data [kW] (float).  Or, a 2-D
+      array with one row per entry of *datetimes*, and one column per meter.
+    - *datetimes*, array-like sequence of ``datetime`` objects, or a
+      :class:`util.time_axis.TimeAxis`.
     - *monthCt*, number of months to go back
+    - *rule*, integration rule, ``'simpsons'`` or ``'trapezoid'``.
 
     **Returns:**
 
     - *monthlyEnergies*, list of total energy [kW.h] (integral of *loads* over
-      time) for as many whole months as have data.
+      time) for as many whole months as have data.  Each element is a tuple,
+      as for :func:`calc_annual_energy`, and 2-D *loads* are handled the same way.
 
     **Notes:**
 
@@ -243,19 +106,352 @@ def calc_monthly_energy(loads, datetimes, monthCt):
     """
     #
     # Check inputs.
+    assert( monthCt > 0 )
+    #
+    goBack = lambda currDate: dtutil.goBackMonths(currDate, monthCt)
+    #
+    return( __calcPeriodEnergies(loads, datetimes, goBack, rule) )
+    #
+    # End :func:`calc_monthly_energy`.
+
+
+def calc_rolling_energy(loads, datetimes, monthCt=12, dayCt=None):
+    """
+    Find the energy over a trailing window ending on every day of the data.
+
+    **Args:**
+
+    - *loads*, array-like sequence of power data [kW] (float).
+    - *datetimes*, array-like sequence of ``datetime`` objects, or of
+      ``datetime64`` values, or a :class:`util.time_axis.TimeAxis`.
+    - *monthCt*, length of the window, in months.
+    - *dayCt*, length of the window, in days.  If given, overrides *monthCt*.
+
+    **Returns:**
+
+    - (*endDays*, *energies*), a ``numpy`` array of ``datetime64[D]`` giving
+      the last day of each window, and the total energy [kW.h] over that
+      window.  Only windows that the data span (to within three days at the
+      start, as for :func:`calc_annual_energy`) are returned.
+
+    **Notes:**
+
+    - Each window runs from midnight at its start through midnight ending its
+      last day.  Months are "numerical" months, as in :func:`calc_monthly_energy`.
+      For example, the 12-month window ending on "7/13/2013" runs from
+      "7/14/2012" through "7/13/2013".
+    - Finds every window with one pass over the data (to build a
+      :class:`CumulativeEnergy`), and one vectorized lookup for all the window
+      boundaries.  This is linear in the size of the data, rather than
+      quadratic as when integrating each window separately.
+    - Integration is trapezoidal, so results differ slightly from the
+      Simpson's-rule results of :func:`calc_annual_energy`.
+    - Any ``NAN`` values in *loads* are discarded.
+    """
+    #
+    # Check inputs.
     assert( len(loads) == len(datetimes) )
-    assert( isinstance(datetimes[0],dto.date) )
+    if( dayCt is None ):
+        assert( monthCt > 0 )
+    else:
+        assert( dayCt > 0 )
+    #
+    energyIndex = CumulativeEnergy(loads, datetimes)
+    times = energyIndex.times
+    #
+    # Candidate window ends are the midnights after the first reading, through
+    # the last reading.
+    firstEnd = times[0].astype('datetime64[D]') + 1
+    lastEnd = times[-1].astype('datetime64[D]')
+    if( lastEnd < firstEnd ):
+        return( (np.array([], dtype='datetime64[D]'), np.array([])) )
+    windowEnds = np.arange(firstEnd, lastEnd+1)
+    #
+    # Find the start of each window.
+    if( dayCt is not None ):
+        windowStarts = windowEnds - dayCt
+    else:
+        # Go back *monthCt* months, keeping the day of the month where
+        # possible, and otherwise using the last day of the earlier month.
+        endMonths = windowEnds.astype('datetime64[M]')
+        dayOfMonth = windowEnds - endMonths.astype('datetime64[D]')
+        startMonths = endMonths - monthCt
+        startMonthDayCt = (startMonths+1).astype('datetime64[D]') - startMonths.astype('datetime64[D]')
+        windowStarts = startMonths.astype('datetime64[D]') + np.minimum(dayOfMonth, startMonthDayCt-1)
+    #
+    # Keep windows the data span.
+    missingDayCt = (times[0] - windowStarts.astype(times.dtype)) / np.timedelta64(1, 'D')
+    keepLocs = ( missingDayCt <= 3 )
+    windowStarts = windowStarts[keepLocs]
+    windowEnds = windowEnds[keepLocs]
+    #
+    energies = energyIndex.energyBetween(windowStarts, windowEnds)
     #
-    # Remove ``NAN`` values if necessary.
-    if( np.any(np.isnan(loads)) ):
-        goodLoads = clean.makeSelector_finite(loads)
-        loadsClean = clean.applySelector(goodLoads, loads)
-        datesClean = clean.applySelector(goodLoads, datetimes)
+    return( (windowEnds-1, energies) )
+    #
+    # End :func:`calc_rolling_energy`.
+
+
+class CumulativeEnergy(object):
+    """
+    Running total of the energy [kW.h] in a series of power data [kW], for
+    finding the energy between any two instants with two lookups.
+
+    **Args:**
+
+    - *loads*, array-like sequence of power data [kW] (float).
+    - *datetimes*, array-like sequence of ``datetime`` objects, or of
+      ``datetime64`` values, or a :class:`util.time_axis.TimeAxis`.
+
+    **Notes:**
+
+    - Building the index is one vectorized pass over the data.  After that,
+      each energy lookup costs a binary search, so energies for any number of
+      periods (years, months, billing cycles, days, rolling windows) come from
+      a single array operation.
+    - Energy accumulates by trapezoidal integration between readings.  Between
+      readings, the cumulative energy is interpolated linearly in time, as
+      described in the notes of :func:`calc_annual_energy`.
+    - Any ``NAN`` values in *loads* are discarded, as in :func:`calc_annual_energy`.
+    - Instants before the first reading, or after the last, are treated as
+      the first or last reading, i.e., no energy is counted outside the record.
+    - *datetimes* must be monotone increasing.
+    """
+
+    def __init__(self, loads, datetimes):
+        #
+        # Check inputs.
+        loads = np.asarray(loads, dtype=float)
+        times = dtutil.toDatetime64(datetimes)
+        assert( loads.ndim == 1 )
+        assert( len(loads) == len(times) )
+        #
+        # Remove ``NAN`` values if necessary.
+        goodLocs = np.logical_and(np.isfinite(loads), ~np.isnat(times))
+        if( not np.all(goodLocs) ):
+            loads = loads[goodLocs]
+            times = times[goodLocs]
+        assert( len(loads) >= 1 )
+        #
+        self.times = times
+        self.__seconds = self.__toSeconds(times)
+        #
+        # Find cumulative energy at each reading.
+        binEnergies = 0.5 * (loads[1:] + loads[:-1]) * np.diff(self.__seconds) / 3600.
+        self.cumulativeEnergy = np.concatenate(([0.], np.cumsum(binEnergies)))
+
+    def __toSeconds(self, times):
+        # Seconds from the first reading.
+        return( (dtutil.toDatetime64(times) - self.times[0]) / np.timedelta64(1, 's') )
+
+    def energyAt(self, times):
+        """
+        Return the cumulative energy [kW.h] from the first reading up to each of
+        *times* (a single time, or an array-like sequence of times).
+        """
+        #
+        scalarIn = ( np.ndim(times) == 0 )
+        seconds = self.__toSeconds(np.atleast_1d(times))
+        energies = np.interp(seconds, self.__seconds, self.cumulativeEnergy)
+        #
+        return( energies[0] if scalarIn else energies )
+        #
+        # End :meth:`energyAt`.
+
+    def energyBetween(self, startTimes, endTimes):
+        """
+        Return the energy [kW.h] used from each of *startTimes* to the
+        corresponding entry of *endTimes*.
+        """
+        #
+        return( self.energyAt(endTimes) - self.energyAt(startTimes) )
+        #
+        # End :meth:`energyBetween`.
+
+    def energyOverPeriods(self, boundaries):
+        """
+        Return the energy [kW.h] used in each period between consecutive
+        entries of *boundaries* (monotone increasing).  Gives one fewer
+        entry than *boundaries*.
+        """
+        #
+        return( np.diff(self.energyAt(boundaries)) )
+        #
+        # End :meth:`energyOverPeriods`.
+
+    def dailyEnergy(self):
+        """
+        Return the energy used on every whole day covered by the readings.
+
+        **Returns:**
+
+        - (*days*, *energies*), a ``numpy`` array of ``datetime64[D]`` giving
+          each day, and the energy [kW.h] used on that day.
+        """
+        #
+        firstDay = self.times[0].astype('datetime64[D]')
+        if( firstDay < self.times[0] ):
+            firstDay += 1
+        lastDay = self.times[-1].astype('datetime64[D]')  # Day after the last whole day.
+        if( lastDay <= firstDay ):
+            return( (np.array([], dtype='datetime64[D]'), np.array([])) )
+        #
+        boundaries = np.arange(firstDay, lastDay+1)
+        return( (boundaries[:-1], self.energyOverPeriods(boundaries)) )
+        #
+        # End :meth:`dailyEnergy`.
+
+
+def __calcPeriodEnergies(loads, datetimes, goBack, rule):
+    """
+    Find the energy for as many full periods as have data, stepping back from
+    the end of the data.
+
+    **Args:**
+
+    - *loads*, *datetimes*, *rule*, as for :func:`calc_annual_energy`.
+    - *goBack*, function that takes the ``datetime`` starting one period, and
+      returns the ``datetime`` starting the period before.
+
+    **Returns:**
+
+    - *periodEnergies*, as *yearlyEnergies* in :func:`calc_annual_energy`.
+    """
+    #
+    # Check inputs.
+    assert( len(loads) == len(datetimes) )
+    assert( isinstance(datetimes[0],dto.date) )
+    loads = np.asarray(loads, dtype=float)
+    assert( loads.ndim in (1, 2) )
+    #
+    # Work with one row per meter, treating 1-D *loads* as a single meter.
+    #   That way, a meter gets the same result whether integrated alone or
+    # together with others.
+    meterLoads = np.atleast_2d(loads) if loads.ndim == 1 else loads.T
+    #
+    # Find the start of every period the data might span, and the entry just
+    # before each, in one search shared by every meter.
+    #   Last date in *datetimes* starts a period (because either it marks midnight
+    # of the day before, or it has incomplete data).  Step back until a period
+    # starts on or before the first datum.
+    if( len(datetimes) <= 1 ):
+        return( list() )
+    lastDate = datetimes[len(datetimes)-1]
+    haveTimes = ( type(datetimes[0]) == dto.datetime )
+    if( haveTimes ):
+        lastDate = dto.datetime(lastDate.year, lastDate.month, lastDate.day, 0)
+    periodStarts = [lastDate]
+    while( periodStarts[-1] > datetimes[0] ):
+        periodStarts.append(goBack(periodStarts[-1]))
+    times = dtutil.toDatetime64(datetimes)
+    prevPeriodEndIdxs = dtutil.findLatestEntriesBefore(times, periodStarts)
+    hours = __hoursSinceFirst(times)
+    #
+    # Group meters by where they have ``NAN`` values (usually, nowhere).
+    #   Meters in a group share their good readings, so each period's
+    # integration covers all of them at once.
+    #   Compare each meter's locations packed into bytes, which is much
+    # faster than :func:`numpy.unique` on the rows.
+    goodLocs = np.isfinite(meterLoads)
+    if( np.all(goodLocs) ):
+        groupMasks = goodLocs[:1]
+        groupIdxs = np.zeros(len(meterLoads), dtype=int)
     else:
-        # Note the assignments here just create references to the existing data,
-        # rather than copying data.  So no big storage or speed implication.
-        loadsClean = loads
-        datesClean = datetimes
+        groupIdxsByKey = dict()
+        groupIdxs = np.array([groupIdxsByKey.setdefault(packedLocs.tobytes(), len(groupIdxsByKey))
+            for packedLocs in np.packbits(goodLocs, axis=1)])
+        groupMasks = goodLocs[[list(groupIdxs).index(groupIdx) for groupIdx in range(len(groupIdxsByKey))]]
+    #
+    # Find the periods for each group, putting the group of the first meter first.
+    groupOrder = [groupIdxs[0]] + [groupIdx for groupIdx in range(len(groupMasks)) if groupIdx != groupIdxs[0]]
+    groupEnergies = dict()
+    for groupIdx in groupOrder:
+        goodIdxs = np.flatnonzero(groupMasks[groupIdx])
+        loadsClean = meterLoads[groupIdxs == groupIdx]
+        if( len(goodIdxs) < len(datetimes) ):
+            loadsClean = loadsClean[:, goodIdxs]
+        if( len(goodIdxs) <= 1 ):
+            groupEnergies[groupIdx] = list()
+            continue
+        #
+        # A group whose last good reading is on another day than the last
+        # reading (e.g., a meter that stopped reporting) starts its periods
+        # elsewhere, so needs its own search.
+        groupLastDate = datetimes[goodIdxs[-1]]
+        if( haveTimes ):
+            sameLastDate = ( groupLastDate.date() == lastDate.date() )
+        else:
+            sameLastDate = ( groupLastDate == lastDate )
+        if( sameLastDate ):
+            groupEnergies[groupIdx] = __calcGroupEnergies(loadsClean, goodIdxs, datetimes, hours,
+                periodStarts, prevPeriodEndIdxs, haveTimes, rule)
+        else:
+            groupEnergies[groupIdx] = __calcPeriodEnergies(loadsClean.T,
+                clean.applySelector(groupMasks[groupIdx], datetimes), goBack, rule)
+    #
+    if( loads.ndim == 1 ):
+        return( [(energies[0], startsOn, endDate)
+            for energies, startsOn, endDate in groupEnergies[0]] )
+    #
+    # Collect the energies of every meter for the periods of the first meter.
+    periodEnergies = [(np.full(len(meterLoads), np.nan), startsOn, endDate)
+        for _, startsOn, endDate in groupEnergies[groupIdxs[0]]]
+    periodIdxsByStart = dict((period[1], periodIdx) for periodIdx, period in enumerate(periodEnergies))
+    for groupIdx in groupOrder:
+        groupMeters = groupIdxs == groupIdx
+        for energies, startsOn, _ in groupEnergies[groupIdx]:
+            periodIdx = periodIdxsByStart.get(startsOn)
+            if( periodIdx is not None ):
+                periodEnergies[periodIdx][0][groupMeters] = energies
+    #
+    return( periodEnergies )
+    #
+    # End :func:`__calcPeriodEnergies`.
+
+
+def __calcGroupEnergies(loadsClean, goodIdxs, datetimes, hours, periodStarts, prevPeriodEndIdxs, haveTimes, rule):
+    """
+    Find the energy for a group of meters, for as many full periods as have
+    data, stepping back from the end of the data.
+
+    **Args:**
+
+    - *loadsClean*, 2-D ``numpy`` array of power data, with one row per meter,
+      and one column per entry of *goodIdxs*.  No entry may be ``NAN``.
+    - *goodIdxs*, ``numpy`` array of the indices into *datetimes* of the
+      readings in *loadsClean*.  Call the readings at these indices *datesClean*.
+      The last one must fall on the same day as the last entry of *datetimes*.
+    - *datetimes*, array-like sequence of ``datetime`` objects, or a
+      :class:`util.time_axis.TimeAxis`.
+    - *hours*, ``numpy`` array of the hours from the first entry of
+      *datetimes* to each entry.
+    - *periodStarts*, the start of every period, latest first, as found for
+      all of *datetimes*.
+    - *prevPeriodEndIdxs*, for each of *periodStarts*, the index of the latest
+      entry in *datetimes* before it.
+    - *haveTimes*, ``True`` if *datetimes* gives ``datetime`` objects, rather
+      than ``date`` objects.
+    - *rule*, as for :func:`calc_annual_energy`.
+
+    **Returns:**
+
+    - *periodEnergies*, as *yearlyEnergies* in :func:`calc_annual_energy`,
+      with each total energy a ``numpy`` array, with one entry per meter.
+
+    **Notes:**
+
+    - Gives the same result as searching *datesClean* for the periods.  The
+      periods are the same, since *datesClean* ends on the same day as
+      *datetimes*.  The latest entry in *datesClean* before a time is the
+      latest good reading at or before the latest entry in *datetimes*
+      before that time.
+    """
+    #
+    hoursClean = hours[goodIdxs]
+    #
+    # Map each entry just before a period start to the latest good reading
+    # at or before it, in the same way as searching *datesClean*.
+    prevPeriodEndIdxs = np.maximum(np.searchsorted(goodIdxs, prevPeriodEndIdxs, side='right') - 1, 0)
     #
     # Notes - identifying which data to pass to the integrator:
     #
@@ -293,160 +489,157 @@ def calc_monthly_energy(loads, datetimes, monthCt):
     #
     #   Because ``datetime`` objects label midnight as time 0 of the day
     # just starting, treat the date of the last entry in *datesClean* as the
-    # the date that starts a month.
+    # the date that starts a period.
     #   Consider the case that the last entry in *datesClean* is at exactly
-    # midnight (say, on 9-September).  Then the data support treating a month as
-    # starting on 9-September and running through 8-August.
+    # midnight (say, on 9-September).  Then the data support treating a period
+    # as starting on 9-September, e.g., running through 8-September for a year.
     #   If, on the other hand, the last entry in *datesClean* is sometime
     # in the middle of the day (say, at 2pm on 9-September), then there are not
-    # enough data to say a month runs from 9-September through 10-August.
-    # Again, the first day of each month is 9-September.
+    # enough data to include 9-September in the last period.  Again, the first
+    # day of each period is 9-September.
     #
     # Notes - variable names.
     #
     #   Variable names for dates use the following conventions:
     # - Actual dates, which correspond to ``datetime`` or ``date`` entries
-    #   in *datesClean*, have names like *currMonthStartDate* and *currMonthEndDate*.
+    #   in *datesClean*, have names like *currPeriodStartDate* and *currPeriodEndDate*.
     #   These may also have an associated index into *datesClean*, named like
-    #   *currMonthStartIdx* and *currMonthEndIdx*.
-    # - Theoretical dates, which define when a month begins and ends, have names
-    #   like *currMonthStartsOn*.
+    #   *currPeriodStartIdx* and *currPeriodEndIdx*.
+    # - Theoretical dates, which define when a period begins and ends, have names
+    #   like *currPeriodStartsOn*.
     #
     # Initialize.
-    monthlyEnergies = list()
-    #
-    # Last date in *datesClean* starts a month (because either it marks midnight
-    # of the day before, or it has incomplete data).
-    nextMonthStartIdx = len(loadsClean) - 1
-    if( nextMonthStartIdx <= 0 ):
-        return( monthlyEnergies )
-    nextMonthStartsOn = datesClean[nextMonthStartIdx]
+    periodEnergies = list()
+    #
+    # Mark the first entry in *datesClean* that can belong to the period after
+    # the first period of interest.
+    #   If *datesClean* has time information, that is the earliest ``datetime``
+    # on the date of the last entry.  Otherwise, it is the last entry.
+    if( haveTimes ):
+        nextPeriodStartIdx = int(prevPeriodEndIdxs[0]) + 1
+    else:
+        nextPeriodStartIdx = len(goodIdxs) - 1
+    nextPeriodStartsOn = periodStarts[0]
     #
-    # Find the exact date transition if necessary.
-    if( type(datesClean[0]) == dto.datetime ):
-        #
-        # Here, *nextMonthStartsOn* has time information.
-        #   Coerce it to be a pure ``date``, and adjust *nextMonthStartIdx* to
-        # mark the earliest ``datetime`` in *datesClean* with this date.
-        nextMonthStartsOn = dto.datetime(nextMonthStartsOn.year, nextMonthStartsOn.month, nextMonthStartsOn.day, 0)
-        nextMonthStartIdx = dtutil.findLatestEntryBefore(datesClean, nextMonthStartsOn, startIdx=0, blockIdx=nextMonthStartIdx+1) + 1
-    #
-    # Step backward through *loadsClean*, summarizing months.
-    while( True ):
+    # Step backward through *loadsClean*, summarizing periods.
+    for periodIdx in range(1, len(periodStarts)):
         #
         # Here, assume:
-        # - *nextMonthStartsOn* gives the first date of the month after the month
-        #   of interest.  Note that, due to missing data, *datesClean* might
-        #   not have a matching date.
-        # - *nextMonthStartsOn* has the same type as entries in *datesClean*.
-        # - *nextMonthStartIdx* marks the first entry in *datesClean* that can
-        #   belong to the year after the year of interest.
+        # - *nextPeriodStartsOn* gives the first date of the period after the
+        #   period of interest.  Note that, due to missing data, *datesClean*
+        #   might not have a matching date.
+        # - *nextPeriodStartsOn* has the same type as entries in *datesClean*.
+        # - *nextPeriodStartIdx* marks the first entry in *datesClean* that can
+        #   belong to the period after the period of interest.
         #
         # Figure out range of data to integrate.
-        currMonthStartsOn = dtutil.goBackMonths(nextMonthStartsOn,monthCt)
-        prevMonthEndIdx = dtutil.findLatestEntryBefore(datesClean, currMonthStartsOn, startIdx=0, blockIdx=nextMonthStartIdx)
+        currPeriodStartsOn = periodStarts[periodIdx]
+        prevPeriodEndIdx = int(prevPeriodEndIdxs[periodIdx])
         #
-        # Check that data spans a full year, or close to it.
-        if( prevMonthEndIdx == 0 ):
-            earliestDateAvailable = datesClean[0]
-            missingDayCt = (earliestDateAvailable - currMonthStartsOn).total_seconds() * __DAY_PER_SEC
+        # Check that data spans a full period, or close to it.
+        if( prevPeriodEndIdx == 0 ):
+            earliestDateAvailable = datetimes[goodIdxs[0]]
+            missingDayCt = (earliestDateAvailable - currPeriodStartsOn).total_seconds() * __DAY_PER_SEC
             if( missingDayCt > 3 ):
                 break
         #
         # Here:
-        # - *prevMonthEndIdx* marks the entry that spans the transition from the
-        #   previous year, if one exists, to the current year.
-        # - *nextMonthStartIdx* marks the entry that spans the transition to the
-        #   next year.
+        # - *prevPeriodEndIdx* marks the entry that spans the transition from the
+        #   previous period, if one exists, to the current period.
+        # - *nextPeriodStartIdx* marks the entry that spans the transition to the
+        #   next period.
         #
-        # Find energy use for the current year.
-        #   Note have to "block" on ``nextMonthStartIdx + 1`` because have to
-        # integrate up to the point at *nextMonthStartIdx*.
-        monthlyEnergy = __integratePtsInTime(loadsClean, datesClean, startIdx=prevMonthEndIdx, blockIdx=nextMonthStartIdx+1)
+        # Find energy use for the current period.
+        #   Note have to "block" on ``nextPeriodStartIdx + 1`` because have to
+        # integrate up to the point at *nextPeriodStartIdx*.
+        periodEnergy = __integratePtsInTime(loadsClean, hoursClean, startIdx=prevPeriodEndIdx, blockIdx=nextPeriodStartIdx+1, rule=rule)
         #
-        # Adjust *monthlyEnergy* for the transition from previous year to current year.
-        sec_excess = (currMonthStartsOn - datesClean[prevMonthEndIdx]).total_seconds()
+        # Adjust *periodEnergy* for the transition from previous period to current period.
+        sec_excess = (currPeriodStartsOn - datetimes[goodIdxs[prevPeriodEndIdx]]).total_seconds()
         if( sec_excess > 0 ):
             # Excess energy is a fraction (sec_excess/sec_total) of the total
             # energy in the first bin.  Total energy in the first bin is
             # proportional to sec_total, so sec_total cancels out.
-            removeEnergy = 0.5*(loadsClean[prevMonthEndIdx] + loadsClean[prevMonthEndIdx+1]) * sec_excess / 3600.
-            monthlyEnergy -= removeEnergy
+            removeEnergy = 0.5*(loadsClean[...,prevPeriodEndIdx] + loadsClean[...,prevPeriodEndIdx+1]) * sec_excess / 3600.
+            periodEnergy -= removeEnergy
         #
-        # Adjust *monthlyEnergy* for the transition from current year to next year.
-        sec_excess = (datesClean[nextMonthStartIdx] - nextMonthStartsOn).total_seconds()
+        # Adjust *periodEnergy* for the transition from current period to next period.
+        sec_excess = (datetimes[goodIdxs[nextPeriodStartIdx]] - nextPeriodStartsOn).total_seconds()
         if( sec_excess > 0 ):
-            removeEnergy = 0.5*(loadsClean[nextMonthStartIdx-1] + loadsClean[nextMonthStartIdx]) * sec_excess / 3600.
-            monthlyEnergy -= removeEnergy
+            removeEnergy = 0.5*(loadsClean[...,nextPeriodStartIdx-1] + loadsClean[...,nextPeriodStartIdx]) * sec_excess / 3600.
+            periodEnergy -= removeEnergy
         #
         # Save result.
-        monthlyEnergies.append(( monthlyEnergy, 
-                               currMonthStartsOn, 
-                               datesClean[nextMonthStartIdx-1] ))
+        periodEnergies.append(( periodEnergy, 
+                                currPeriodStartsOn, 
+                                datetimes[goodIdxs[nextPeriodStartIdx-1]] ))
         #
         # Prepare for next iteration.
-        if( prevMonthEndIdx == 0 ):
+        if( prevPeriodEndIdx == 0 ):
             break
-        nextMonthStartsOn = currMonthStartsOn
-        nextMonthStartIdx = prevMonthEndIdx + 1
+        nextPeriodStartsOn = currPeriodStartsOn
+        nextPeriodStartIdx = prevPeriodEndIdx + 1
     #
-    # Here, *monthlyEnergies* has desired values, but in the wrong order (since
-    # worked backward through months, but want most recent year at end of list).
-    monthlyEnergies.reverse()
+    # Here, *periodEnergies* has desired values, but in the wrong order (since
+    # worked backward through periods, but want most recent period at end of list).
+    periodEnergies.reverse()
     #
-    return( monthlyEnergies )
+    return( periodEnergies )
     #
-    # End :func:`calc_monthly_energy`.
-    
-    
-def __integratePtsInTime(loads, datetimes, startIdx=0, blockIdx=None):
+    # End :func:`__calcGroupEnergies`.
+
+
+def __hoursSinceFirst(datetimes):
+    """
+    Return a ``numpy`` array of the hours from ``datetimes[0]`` to each entry
+    of *datetimes*.
+    """
+    #
+    times = dtutil.toDatetime64(datetimes)
+    #
+    return( (times - times[0]) / np.timedelta64(3600, 's') )
+    #
+    # End :func:`__hoursSinceFirst`.
+
+
+def __integratePtsInTime(loads, hours, startIdx=0, blockIdx=None, rule='simpsons'):
     """
     Uses numerical integration to determine the total energy use in the given interval.
 
     **Args:**
 
-    - *loads*, array-like sequence of power data (float).
-    - *datetimes*, array-like sequence of ``datetime`` objects.
+    - *loads*, ``numpy`` array of power data (float).  If 2-D, one row per
+      meter, with the samples along the last axis.
+    - *hours*, ``numpy`` array of the times of *loads*, in hours from any
+      fixed origin (float).
+    - *startIdx*, first index (inclusive) to integrate over.
+    - *blockIdx*, last index (exclusive) to integrate over.  Defaults to
+      ``len(hours)``.
+    - *rule*, integration rule, ``'simpsons'`` or ``'trapezoid'``.
 
     **Notes:**
+
     - When used to calculate energy use, the interval is calculated in hours.
+    - Integrates over views into *loads* and *hours*, so no data are copied,
+      and there is no per-point work in Python.
+    - No entry of *loads* in the interval may be ``NAN``.
     """
-
-    assert (len(loads) == len(datetimes))
-    #
-    # TODO: Consider rewriting this fcn to handle integration directly, via a
-    # trapezoidal integration, rather than passing off to Simpson's rule.
-    #   A few reasons to do so:
-    # - Already stepping through the indices in order to assemble the vectors
-    #   that Simpson's rule expects.  So may as well just calculate the results,
-    #   and hence save forming the new vectors.
-    # - Doing so will remove need to "clean" the data before passing them in
-    #   here.  Can just skip ``NAN`` and ``Inf`` values as process.  This saves
-    #   yet another round of copying vectors into new memory.
-    # - No particular reason to believe, given the coarseness of building energy
-    #   data and the swiftness of mode transitions in buildings, that Simpson's
-    #   rule gives a better estimate of energy than trapezoidal integration.
-    #   And the nice thing about trap integration is that it uses the same rule
-    #   by which interpolate the returned results.  That means, can just do the
-    #   interpolation in the re-written routine, and hence make the major loop
-    #   in fcn calc_annual_energy() a lot cleaner.
-    # - The rewritten routine can move into a more general "integrate-data"
-    #   module, along with Simpson's, to be available for other uses.
     #
-    # Initialize.
-    if (blockIdx == None):
-        blockIdx = len(loads)
-    timesInHours = list()
-    valueInHours = list()
-    # Convert the datetimes to corresponding hours
-
-    for items in range(startIdx, blockIdx):
-        assert( not math.isnan(loads[items]) )
-        #
-        timesInHours.append( (datetimes[items] - datetimes[0]).total_seconds() / 3600.)
-        valueInHours.append(loads[items])
-
-    valuesInt = simp.simpsons(valueInHours, timesInHours)
-    return ( valuesInt )
+    # Check inputs.
+    assert( np.shape(loads)[-1] == len(hours) )
+    if( blockIdx is None ):
+        blockIdx = len(hours)
+    #
+    loadsInt = loads[...,startIdx:blockIdx]
+    hoursInt = hours[startIdx:blockIdx]
+    #
+    if( rule == 'simpsons' ):
+        valuesInt = simp.simpsons(loadsInt, hoursInt)
+    elif( rule == 'trapezoid' ):
+        valuesInt = simp.trapezoid(loadsInt, hoursInt)
+    else:
+        raise ValueError('Unknown integration rule {0!r}'.format(rule))
+    #
+    return( valuesInt )
     #
     # End :func:`__integratePtsInTime`.
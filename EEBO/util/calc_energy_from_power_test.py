@@ -0,0 +1,105 @@
+"""
+Test integrating several meters at once in :mod:`util.calc_energy_from_power`.
+
+Run from the ``EEBO`` directory, e.g.::
+
+    python -m pytest util/calc_energy_from_power_test.py
+
+Each column of a 2-D call must get the same energies as a 1-D call on that
+column alone, however its ``NAN`` values fall.
+"""
+
+
+#--- Provide access.
+#
+import datetime as dto
+import os
+import sys
+#
+import numpy as np
+#
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from util import calc_energy_from_power as cep
+from util import datetime_utils as dtutil
+
+
+def makeMeters(meterCt=8):
+    """
+    Return about 26 months of 15-minute readings, with a gap, from *meterCt*
+    meters, each with its own ``NAN`` values.
+    """
+    #
+    rng = np.random.RandomState(0)
+    datetimes = [dto.datetime(2011, 3, 1, 0, 7) + dto.timedelta(minutes=15*idx) for idx in range(96*800)]
+    del datetimes[40000:40500]
+    valCt = len(datetimes)
+    hours = np.arange(valCt) / 4.0
+    loads = np.column_stack([50 + 10*meterIdx + 20*np.sin(2*np.pi*hours/24 + meterIdx) + rng.rand(valCt)
+        for meterIdx in range(meterCt)])
+    #
+    # One dropout per meter.
+    loads[rng.randint(valCt, size=meterCt), np.arange(meterCt)] = np.nan
+    # Scattered dropouts.
+    loads[rng.rand(valCt) < 0.02, 1] = np.nan
+    # Stops a few hours before the end, on the same day.
+    loads[-20:, 2] = np.nan
+    # Stops the day before the end, so its periods start on another day.
+    loads[-200:, 3] = np.nan
+    # Starts late.
+    loads[:30000, 4] = np.nan
+    # Never reports.
+    loads[:, 5] = np.nan
+    #
+    return( datetimes, loads )
+
+
+def checkSameAsColumns(periodEnergies, loads, datetimes, calcEnergy):
+    for meterIdx in range(loads.shape[1]):
+        energiesByStart = dict((startsOn, energy)
+            for energy, startsOn, _ in calcEnergy(loads[:, meterIdx], datetimes))
+        for energies, startsOn, _ in periodEnergies:
+            expected = energiesByStart.get(startsOn, np.nan)
+            assert( np.allclose(energies[meterIdx], expected, rtol=1e-12, equal_nan=True) )
+
+
+def test_annualEnergy_sameAsColumns():
+    datetimes, loads = makeMeters()
+    for rule in ('simpsons', 'trapezoid'):
+        calcEnergy = lambda meterLoads, times: cep.calc_annual_energy(meterLoads, times, rule)
+        periodEnergies = calcEnergy(loads, datetimes)
+        assert( len(periodEnergies) == 2 )
+        checkSameAsColumns(periodEnergies, loads, datetimes, calcEnergy)
+        # Here, the first meter has data for both years, the one that never
+        # reports has none.
+        assert( np.all(np.isfinite([energies[0] for energies, _, _ in periodEnergies])) )
+        assert( np.all(np.isnan([energies[5] for energies, _, _ in periodEnergies])) )
+
+
+def test_monthlyEnergy_sameAsColumns():
+    datetimes, loads = makeMeters()
+    calcEnergy = lambda meterLoads, times: cep.calc_monthly_energy(meterLoads, times, 1)
+    checkSameAsColumns(calcEnergy(loads, datetimes), loads, datetimes, calcEnergy)
+
+
+def test_annualEnergy_sameAnyGrouping():
+    datetimes, loads = makeMeters()
+    allMeters = cep.calc_annual_energy(loads, datetimes)
+    someMeters = cep.calc_annual_energy(loads[:, [0, 4, 1]], datetimes)
+    for allPeriod, somePeriod in zip(allMeters, someMeters):
+        assert( np.allclose(allPeriod[0][[0, 4, 1]], somePeriod[0], rtol=1e-12, equal_nan=True) )
+
+
+def test_annualEnergy_searchesOnce(monkeypatch):
+    datetimes, loads = makeMeters()
+    # Leave out the meter whose periods start on another day.
+    loads = loads[:, [0, 1, 2, 4, 5, 6, 7]]
+    #
+    searchCts = [0]
+    findLatestEntriesBefore = dtutil.findLatestEntriesBefore
+    def countSearches(*args, **kwargs):
+        searchCts[0] += 1
+        return( findLatestEntriesBefore(*args, **kwargs) )
+    monkeypatch.setattr(dtutil, 'findLatestEntriesBefore', countSearches)
+    #
+    cep.calc_annual_energy(loads, datetimes)
+    assert( searchCts[0] == 1 )
@@ -0,0 +1,238 @@
+"""
+Aggregate time series to several resolutions at once.
+
+**Notes:**
+
+- The raw data are binned only once, to the finest bin width needed (the
+  greatest common divisor of the requested widths).  Every coarser level is
+  then built from the nearest finer level that nests inside it, e.g., 30-minute
+  bins from 15-minute bins, days from hours, and weeks and months from days.
+  Each step works on all columns at once.
+- Internally each level keeps, per bin, just the statistics that the requested
+  aggregations need (sum, count, min, max).  These combine exactly from finer
+  bins to coarser bins, so the results match binning the raw data directly.
+- Bins follow the :mod:`pandas` resampling conventions used elsewhere in this
+  project: fixed-width bins are labeled by their start and aligned to midnight,
+  weeks end on Sunday and are labeled by that Sunday, and months are labeled by
+  their last day.
+"""
+
+
+#--- Provide access.
+#
+import numpy as np
+import pandas as pd
+
+
+#--- Constants.
+#
+# Levels, finest to coarsest.  Fixed-width levels give their width in minutes.
+LEVELS = ('10min', '15min', '30min', '60min', 'day', 'week', 'month')
+__LEVEL_MINUTES = {
+    '10min': 10,
+    '15min': 15,
+    '30min': 30,
+    '60min': 60,
+    'day': 1440,
+    }
+#
+AGGREGATIONS = ('sum', 'mean', 'min', 'max', 'count')
+# Per-bin statistics needed by each aggregation.
+__AGG_STATS = {
+    'sum': ('sum',),
+    'mean': ('sum', 'count'),
+    'min': ('min',),
+    'max': ('max',),
+    'count': ('count',),
+    }
+#
+__NS_PER_MIN = 60 * 10**9
+
+
+def rollupLevels(df, levels=LEVELS, aggs='sum'):
+    """
+    Aggregate *df* to each of *levels*.
+
+    **Args:**
+
+    - *df*, ``DataFrame`` indexed by a :class:`pandas.DatetimeIndex`, with one
+      numeric column per meter.
+    - *levels*, sequence of names from :data:`LEVELS`.
+    - *aggs*, name from :data:`AGGREGATIONS` to apply to every column, or a
+      dictionary mapping column names to such names.  Columns missing from the
+      dictionary are summed.
+
+    **Returns:**
+
+    - *rollups*, dictionary mapping each name in *levels* to a ``DataFrame``
+      with the same columns as *df*, and one row per bin, from the bin holding
+      the first datum through the bin holding the last.
+
+    **Notes:**
+
+    - ``NAN`` readings are ignored.  A bin with no readings has a sum and count
+      of 0, and a mean, min, and max of ``NAN``.
+    - Rows of *df* need not be in time order.
+    """
+    #
+    # Check inputs.
+    for level in levels:
+        assert( level in LEVELS )
+    if( isinstance(aggs, str) ):
+        aggs = dict((col, aggs) for col in df.columns)
+    colAggs = [aggs.get(col, 'sum') for col in df.columns]
+    for agg in colAggs:
+        assert( agg in AGGREGATIONS )
+    #
+    # Find the statistics to carry through the levels.
+    statNames = set()
+    for agg in colAggs:
+        statNames.update(__AGG_STATS[agg])
+    #
+    # Prepare the raw data.
+    times = df.index.values.astype('datetime64[ns]').view(np.int64)
+    values = df.values.astype(float)
+    goodRows = ( times != np.iinfo(np.int64).min )  # Drop ``NaT``.
+    if( not np.all(goodRows) ):
+        times = times[goodRows]
+        values = values[goodRows]
+    order = np.argsort(times, kind='mergesort')
+    if( np.any(order != np.arange(len(order))) ):
+        times = times[order]
+        values = values[order]
+    #
+    rollups = dict()
+    if( len(times) == 0 ):
+        for level in levels:
+            rollups[level] = df.iloc[0:0]
+        return( rollups )
+    #
+    # Bin the raw data once, at the finest width needed.
+    #   Every fixed-width level, and every calendar level (which builds on
+    # days), must be a whole number of base bins.
+    neededMinutes = set(__LEVEL_MINUTES.get(level, 1440) for level in levels)
+    baseMinutes = int(np.gcd.reduce(np.array(sorted(neededMinutes))))
+    origin = times[0] - times[0] % (1440*__NS_PER_MIN)  # Midnight before first datum.
+    baseIds = (times - origin) // (baseMinutes*__NS_PER_MIN)
+    baseStats = __reduceStats(baseIds, __rawStats(values, statNames))
+    builtLevels = {baseMinutes: baseStats}
+    #
+    # Build the fixed-width levels, finest first, each from the coarsest
+    # already-built level that nests inside it.
+    for minutes in sorted(neededMinutes):
+        if( minutes not in builtLevels ):
+            fromMinutes = max(mm for mm in builtLevels if minutes % mm == 0)
+            fromIds, fromStats = builtLevels[fromMinutes]
+            builtLevels[minutes] = __reduceStats(fromIds // (minutes//fromMinutes), fromStats)
+    #
+    # Build the calendar levels from days.
+    #   Note day ids count from *origin*, which is a midnight.
+    dayIds, dayStats = builtLevels[1440]
+    originDay = origin // (1440*__NS_PER_MIN)  # Days since 1970-01-01.
+    days = (dayIds + originDay).astype('datetime64[D]')
+    #
+    for level in levels:
+        if( level in __LEVEL_MINUTES ):
+            minutes = __LEVEL_MINUTES[level]
+            ids, stats = builtLevels[minutes]
+            labels = origin + np.arange(ids[0], ids[-1]+1) * (minutes*__NS_PER_MIN)
+            labels = labels.view('datetime64[ns]')
+            ids = ids - ids[0]
+        elif( level == 'week' ):
+            # Week ids count Monday-to-Sunday weeks; 1970-01-01 was a Thursday.
+            weekIds = (days.astype(np.int64) + 3) // 7
+            ids, stats = __reduceStats(weekIds, dayStats)
+            labels = ((np.arange(ids[0], ids[-1]+1) * 7 - 3 + 6).astype('datetime64[D]')).astype('datetime64[ns]')
+            ids = ids - ids[0]
+        else:
+            monthIds = days.astype('datetime64[M]').astype(np.int64)
+            ids, stats = __reduceStats(monthIds, dayStats)
+            monthStarts = np.arange(ids[0], ids[-1]+2).astype('datetime64[M]').astype('datetime64[D]')
+            labels = (monthStarts[1:] - np.timedelta64(1, 'D')).astype('datetime64[ns]')
+            ids = ids - ids[0]
+        #
+        rollups[level] = __finishLevel(df, labels, ids, stats, colAggs)
+    #
+    return( rollups )
+    #
+    # End :func:`rollupLevels`.
+
+
+def __rawStats(values, statNames):
+    """
+    Return per-row statistics of the raw 2-D array *values*, ready to reduce.
+    """
+    #
+    isGood = ~np.isnan(values)
+    stats = dict()
+    if( 'sum' in statNames ):
+        stats['sum'] = np.where(isGood, values, 0.0)
+    if( 'count' in statNames ):
+        stats['count'] = isGood.astype(np.int64)
+    if( 'min' in statNames ):
+        stats['min'] = values
+    if( 'max' in statNames ):
+        stats['max'] = values
+    #
+    return( stats )
+    #
+    # End :func:`__rawStats`.
+
+
+def __reduceStats(ids, stats):
+    """
+    Combine the rows of each array in *stats* that share a bin id.
+
+    **Args:**
+
+    - *ids*, ``numpy`` array of bin ids, one per row, in non-decreasing order.
+    - *stats*, dictionary of 2-D ``numpy`` arrays of per-row statistics.
+
+    **Returns:**
+
+    - (*binIds*, *binStats*), the distinct ids, and the combined statistics
+      with one row per distinct id.
+    """
+    #
+    starts = np.concatenate(([0], np.flatnonzero(ids[1:] != ids[:-1]) + 1))
+    binStats = dict()
+    for name, vals in stats.items():
+        if( name == 'min' ):
+            binStats[name] = np.fmin.reduceat(vals, starts, axis=0)
+        elif( name == 'max' ):
+            binStats[name] = np.fmax.reduceat(vals, starts, axis=0)
+        else:
+            binStats[name] = np.add.reduceat(vals, starts, axis=0)
+    #
+    return( (ids[starts], binStats) )
+    #
+    # End :func:`__reduceStats`.
+
+
+def __finishLevel(df, labels, ids, stats, colAggs):
+    """
+    Spread the statistics of the occupied bins over every bin, and apply
+    the aggregation of each column.
+    """
+    #
+    binCt = len(labels)
+    colCt = len(colAggs)
+    result = np.empty((binCt, colCt))
+    for agg in set(colAggs):
+        cols = [idx for idx in range(colCt) if colAggs[idx] == agg]
+        if( agg == 'sum' or agg == 'count' ):
+            full = np.zeros((binCt, colCt))
+        else:
+            full = np.full((binCt, colCt), np.nan)
+        #
+        if( agg == 'mean' ):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                full[ids] = stats['sum'] / np.where(stats['count'] > 0, stats['count'], np.nan)
+        else:
+            full[ids] = stats[agg]
+        result[:, cols] = full[:, cols]
+    #
+    return( pd.DataFrame(result, columns=df.columns,
+        index=pd.DatetimeIndex(labels, name=df.index.name)) )
+    #
+    # End :func:`__finishLevel`.
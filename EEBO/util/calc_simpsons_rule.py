@@ -1,4 +1,4 @@
-"""Integrate a set of values using Simpson's rule."""
+"""Integrate a set of values using Simpson's rule, or the trapezoidal rule."""
 
 
 #--- Provide access.
@@ -13,13 +13,15 @@ def simpsons(values, times=None, interval=1.0):
 
     **Args:**
 
-    - *values*, array-like sequence of values to integrate (float).
+    - *values*, array-like sequence of values to integrate (float).  If 2-D,
+      each row holds one series, sampled along the last axis.
     - *times*, array-like sequence of times at which *values* were sampled (float).
     - *interval*, spacing of points in time (float).
 
     **Returns:**
 
-    - *timeIntegral*, estimated time-integral of *values*.
+    - *timeIntegral*, estimated time-integral of *values*.  For 2-D *values*,
+      an array with one integral per row.
 
     **Raises:**
 
@@ -41,7 +43,7 @@ def simpsons(values, times=None, interval=1.0):
     # Simpson's integrator return ``NAN`` (even using masked arrays).
     #
     # Check inputs.
-    valCt = len(values)
+    valCt = np.shape(values)[-1]
     assert( valCt >= 2 )
     if( times is None ):
         assert( interval > 0 )
@@ -50,10 +52,58 @@ def simpsons(values, times=None, interval=1.0):
     assert( not np.any(np.isnan(values)) )
     #
     if( times is None ):
-        timeIntegral = integrate.simps(values, dx=interval)
+        timeIntegral = integrate.simps(values, dx=interval, axis=-1)
     else:
-        timeIntegral = integrate.simps(values, times)
+        timeIntegral = integrate.simps(values, times, axis=-1)
     #
     return( timeIntegral )
     #
     # End :func:`simpsons`.
+
+
+def trapezoid(values, times=None, interval=1.0):
+    """
+    Find the time-integral of a set of values, using the composite trapezoidal rule.
+
+    **Args:**
+
+    - *values*, array-like sequence of values to integrate (float).  If 2-D,
+      each row holds one series, sampled along the last axis.
+    - *times*, array-like sequence of times at which *values* were sampled (float).
+    - *interval*, spacing of points in time (float).
+
+    **Returns:**
+
+    - *timeIntegral*, estimated time-integral of *values*.  For 2-D *values*,
+      an array with one integral per row.
+
+    **Raises:**
+
+    - For ``NAN`` entries in *values*.
+
+    **Notes:**
+
+    - Arguments as for :func:`simpsons`.
+    - The estimated solution is second-order in the interval.  However, unlike
+      Simpson's rule, it never overshoots the data, and it uses the same linear
+      interpolation that callers use to split an interval between periods.
+    """
+    #
+    # Check inputs.
+    values = np.asarray(values, dtype=float)
+    valCt = values.shape[-1]
+    assert( valCt >= 2 )
+    if( times is None ):
+        assert( interval > 0 )
+    else:
+        assert( len(times) == valCt )
+    assert( not np.any(np.isnan(values)) )
+    #
+    if( times is None ):
+        timeIntegral = interval * (values.sum(axis=-1) - 0.5*(values[...,0] + values[...,-1]))
+    else:
+        timeIntegral = 0.5 * np.dot(values[...,1:] + values[...,:-1], np.diff(np.asarray(times, dtype=float)))
+    #
+    return( timeIntegral )
+    #
+    # End :func:`trapezoid`.
@@ -5,9 +5,18 @@
 #
 import numpy as np
 import math as mt
+#
+from . import datetime_utils as dtutil
+
+
+#--- Constants.
+#
+# Ways to group readings for :func:`weatherSensitivityByGroup`.
+#   For ``'dayType'``, weekdays are 0 and weekends are 1.
+GROUP_KEYS = ('hour', 'dayType', 'month')
 
 
-def gridStats(values, user_axis):
+def gridStats(values, user_axis, percentiles=()):
     """
     Given a matrix, calculate the statistics for each row or column, ignoring
     ``NAN`` values.
@@ -18,18 +27,26 @@ def gridStats(values, user_axis):
     - *user_axis*, direction the statistics are calculated (string).
       ``user_axis='c'``: calculate for each column.
       ``user_axis='r'``: calculate for each row.
+    - *percentiles*, sequence of additional percentiles (0 to 100) to find.
 
     **Returns:**
 
     - *statDict*, a dictionary of statistics.  For a key such as 'mean', the
-      value is an array giving the mean for each row (or column).
+      value is an array giving the mean for each row (or column).  Key
+      'percentiles' gives a dictionary mapping each of *percentiles* to such
+      an array.
 
     **Notes:**
 
     - The 'peak95' is the 95th percentile of the data (not the maximum).
     - Similarly, the 'base5' is the 5th percentile of the data (not the minimum).
+    - The 'max' and 'min' are single values, over the whole matrix.
     - Interpolation may be used, especially for small data sets.  This means the
       values reported as peak and base may not actually exist in the data set.
+    - Per-row (or per-column) results are masked arrays, with entries masked
+      for rows (or columns) that have no values.
+    - All the percentiles come from one selection pass over the data, rather
+      than one sort per percentile.
     - "Array-like" means list, tuple, numpy array, etc.
     """
     #
@@ -38,22 +55,46 @@ def gridStats(values, user_axis):
     else:
         axisnum = 1
     #
-    # Mask off ``NANs``, to remove them from analysis.
-    dtGrid = np.ma.masked_array(values,np.isnan(values))
+    # Put the entries for each result in a row.
+    dtGrid = np.asarray(values, dtype=float)
+    assert( dtGrid.ndim == 2 )
+    if( axisnum == 0 ):
+        dtGrid = dtGrid.T
+    #
+    isNan = np.isnan(dtGrid)
+    haveNan = np.any(isNan)
+    goodCts = dtGrid.shape[1] - np.count_nonzero(isNan, axis=1)
     #
     statDict = dict()
-    statDict['mean'] = dtGrid.mean(axis=axisnum)
-    statDict['stdev'] = dtGrid.std(axis=axisnum)
-    #
-    # Fill in ``NAN`` entries with the mean, in order to keep :func:`numpy.percentile`
-    # from returning ``NAN``.
-    dtGrid = dtGrid.filled(dtGrid.mean())
-    statDict['max'] = np.max(dtGrid)
-    statDict['min'] = np.min(dtGrid)
-    statDict['peak95'] = np.percentile(dtGrid,95,axis=axisnum)
-    statDict['base5'] = np.percentile(dtGrid,5,axis=axisnum)
-    statDict['bpratio'] = np.ma.masked_invalid( np.divide(statDict['base5'],statDict['peak95']) )
-    statDict['range95_5'] = np.ma.masked_invalid( np.subtract(statDict['peak95'],statDict['base5']) )
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if( haveNan ):
+            sums = np.where(isNan, 0.0, dtGrid).sum(axis=1)
+            means = sums / goodCts
+            devs = np.where(isNan, 0.0, dtGrid - means[:,np.newaxis])
+            stdevs = np.sqrt((devs*devs).sum(axis=1) / goodCts)
+        else:
+            means = dtGrid.mean(axis=1)
+            stdevs = dtGrid.std(axis=1)
+    statDict['mean'] = np.ma.masked_invalid(means)
+    statDict['stdev'] = np.ma.masked_invalid(stdevs)
+    #
+    # Note these are over the whole grid.
+    if( np.all(isNan) ):
+        statDict['max'] = statDict['min'] = float('nan')
+    else:
+        statDict['max'] = np.nanmax(dtGrid)
+        statDict['min'] = np.nanmin(dtGrid)
+    #
+    # Find every percentile at once.
+    levels = [95, 5] + list(percentiles)
+    pcts = __rowPercentiles(dtGrid, levels, goodCts, haveNan)
+    statDict['peak95'] = np.ma.masked_invalid(pcts[0])
+    statDict['base5'] = np.ma.masked_invalid(pcts[1])
+    statDict['percentiles'] = dict((level, np.ma.masked_invalid(pct)) for level, pct in zip(levels[2:], pcts[2:]))
+    #
+    with np.errstate(invalid='ignore', divide='ignore'):
+        statDict['bpratio'] = np.ma.masked_invalid( np.divide(pcts[1],pcts[0]) )
+        statDict['range95_5'] = np.ma.masked_invalid( np.subtract(pcts[0],pcts[1]) )
     #
     return( statDict )
     #
@@ -80,10 +121,8 @@ def findSpearmanRank(xValues, yValues):
       :func:`numpy.isnan` returns ``True`` will be excluded from the analysis.
     - "Array-like" means list, tuple, numpy array, etc.
 
-    **Enhancements:**
-
-    - Allow the use of filters, e.g., to analyze only data recorded at certain
-      hours of the day, only from weekdays, etc.
+    - To analyze only data recorded at certain hours of the day, only from
+      weekdays, etc., see :func:`weatherSensitivityByGroup`.
     """
     #
     # Check inputs.
@@ -93,9 +132,9 @@ def findSpearmanRank(xValues, yValues):
     #
     # Require numpy arrays with floating-point numbers.
     if( type(xValues)!=np.ndarray or isinstance(xValues[0],int) ):
-        xValues = np.array(xValues, dtype=np.float)
+        xValues = np.array(xValues, dtype=float)
     if( type(yValues)!=np.ndarray or isinstance(yValues[0],int) ):
-        yValues = np.array(yValues, dtype=np.float)
+        yValues = np.array(yValues, dtype=float)
     #
     # Exclude all (x,y) pairs for which either *xValues* or *yValues* has a
     # ``NAN`` entry.
@@ -163,6 +202,114 @@ def findSpearmanRank(xValues, yValues):
     # End :func:`findSpearmanRank`.
 
 
+def weatherSensitivityByGroup(oats, loads, datetimes, groupBy=GROUP_KEYS):
+    """
+    Find the weather sensitivity of many meters, separately for each group of
+    readings, e.g., for each hour of the day, on weekdays and weekends, in each
+    month.
+
+    **Args:**
+
+    - *oats*, array-like sequence of outside air temperatures.
+    - *loads*, array-like sequence of demands, one per entry of *oats*.  Or,
+      a 2-D array with one row per entry of *oats*, and one column per meter.
+    - *datetimes*, times of the readings (see :func:`util.datetime_utils.toDatetime64`).
+    - *groupBy*, sequence of names from :data:`GROUP_KEYS`.  Readings that
+      agree on all of them form a group.
+
+    **Returns:**
+
+    - *sensDict*, a dictionary.  Key 'groups' gives a 2-D ``int`` array with one
+      row per group found in the data, and one column per entry of *groupBy*,
+      e.g., (hour, dayType, month).  Keys 'spearman' and 'pearson' give 2-D
+      arrays of the correlation coefficients, as from :func:`findSpearmanRank`
+      and :func:`pearson_coeff`, with one row per group and one column per
+      meter.  Key 'pairCt' gives the number of (oat, load) pairs behind each
+      coefficient.
+
+    **Notes:**
+
+    - Missing values should be coded as ``NAN``.  As for :func:`findSpearmanRank`,
+      a pair is excluded if either value is ``NAN``.
+    - A coefficient is ``NAN`` if its group has fewer than two pairs, or if
+      either side of its pairs does not vary.
+    - Ranks get found once for every group at once, with one sort per meter
+      (and just one sort for the temperatures, if all meters are missing the
+      same readings).  The coefficients then come from per-group sums, with
+      no loop over groups.
+    """
+    #
+    # Check inputs.
+    oats = np.asarray(oats, dtype=float)
+    loads = np.asarray(loads, dtype=float)
+    oneD = ( loads.ndim == 1 )
+    if( oneD ):
+        loads = loads[:,np.newaxis]
+    assert( oats.ndim == 1 )
+    assert( len(loads) == len(oats) )
+    times = dtutil.toDatetime64(datetimes)
+    assert( len(times) == len(oats) )
+    for groupKey in groupBy:
+        assert( groupKey in GROUP_KEYS )
+    #
+    # Label each reading with its group.
+    days = times.astype('datetime64[D]')
+    labels = list()
+    for groupKey in groupBy:
+        if( groupKey == 'hour' ):
+            labels.append( (times - days) // np.timedelta64(1, 'h') )
+        elif( groupKey == 'dayType' ):
+            # Note 1970-01-01 was a Thursday, so Saturday and Sunday give 2 and 3.
+            labels.append( ((days.astype(np.int64) + 3) % 7 >= 5).astype(np.int64) )
+        else:
+            labels.append( days.astype('datetime64[M]').astype(np.int64) % 12 + 1 )
+    if( len(labels) > 0 ):
+        labels = np.column_stack(labels)
+    else:
+        labels = np.zeros((len(times), 0), dtype=np.int64)
+    groups, groupIds = np.unique(labels, axis=0, return_inverse=True)
+    groupIds = groupIds.reshape(-1)
+    groupCt = len(groups)
+    #
+    # Mark the good pairs for each meter.
+    goodLocs = np.logical_and(np.isfinite(oats)[:,np.newaxis], np.isfinite(loads))
+    #
+    # Rank within groups.
+    #   Note ``NAN`` mapped to rank 0.
+    meterCt = loads.shape[1]
+    sameGoodLocs = np.all(goodLocs == goodLocs[:, :1])
+    loadRanks = np.empty(loads.shape)
+    oatRanks = np.empty(loads.shape)
+    for meterIdx in range(meterCt):
+        goodCol = goodLocs[:,meterIdx]
+        loadRanks[:,meterIdx] = __rankWithinGroups(np.where(goodCol, loads[:,meterIdx], np.nan), groupIds)
+        if( meterIdx == 0 or not sameGoodLocs ):
+            colOatRanks = __rankWithinGroups(np.where(goodCol, oats, np.nan), groupIds)
+        oatRanks[:,meterIdx] = colOatRanks
+    #
+    # Find the coefficients from per-group sums.
+    #   For Pearson, first remove the mean of each meter, to keep the sums of
+    # squares from losing precision.
+    goodOats = np.where(goodLocs, oats[:,np.newaxis], 0.0)
+    goodLoads = np.where(goodLocs, loads, 0.0)
+    pairCts = np.maximum(goodLocs.sum(axis=0), 1)
+    goodOats = np.where(goodLocs, goodOats - goodOats.sum(axis=0)/pairCts, 0.0)
+    goodLoads = np.where(goodLocs, goodLoads - goodLoads.sum(axis=0)/pairCts, 0.0)
+    #
+    sensDict = dict()
+    sensDict['groups'] = groups
+    sensDict['pairCt'] = __sumByGroup(goodLocs.astype(float), groupIds, groupCt).astype(np.int64)
+    sensDict['spearman'] = __groupCorrelations(oatRanks, loadRanks, goodLocs, groupIds, groupCt)
+    sensDict['pearson'] = __groupCorrelations(goodOats, goodLoads, goodLocs, groupIds, groupCt)
+    if( oneD ):
+        for key in ('pairCt', 'spearman', 'pearson'):
+            sensDict[key] = sensDict[key][:,0]
+    #
+    return( sensDict )
+    #
+    # End :func:`weatherSensitivityByGroup`.
+
+
 def pearson_coeff(xValues, yValues):
     """
     Given two arrays, find the Pearson correlation coefficient.
@@ -247,76 +394,182 @@ def __rankForSpearman(values):
     - Rank smallest to largest.
     - Equal values get mean rank.
     - ``NAN`` gets a rank of 0.
+    - Works on whole arrays, with one sort, and no loop over the entries.
     """
     #
     assert( type(values) == np.ndarray )
     assert( values.ndim == 1 )
     #
-    # Initialize.
+    # Initialize *ranks* to treat values as ``NAN`` by default.
     valCt = len(values)
+    ranks = np.zeros(valCt)
+    goodCt = valCt - np.count_nonzero(np.isnan(values))
+    if( goodCt == 0 ):
+        return( ranks )
     #
     # Find indices that would sort *values*.
     #   Example:
     # - values       = [1, 2, 5, 4, 3]
     # - srtdToActIdx = [0, 1, 4, 3, 2]
-    #   Note that :func:`numpy.argsort` sorts ``NAN`` as highest.
-    srtdToActIdx = np.argsort(values)
+    #   Note that :func:`numpy.argsort` sorts ``NAN`` as highest.  So the first
+    # *goodCt* indices cover all the non-``NAN`` entries.
+    srtdToActIdx = np.argsort(values)[:goodCt]
+    srtdVals = values[srtdToActIdx]
     #
-    # Initialize *ranks* to treat values as ``NAN`` by default.
-    ranks = np.zeros(valCt)
+    # Find the runs of equal entries, in sorted order.
+    #   Each run begins at an index in *runStartIdxs* and ends just before the
+    # corresponding index in *runBlockIdxs*.
+    runStartIdxs = np.flatnonzero(np.concatenate(([True], srtdVals[1:] != srtdVals[:-1])))
+    runBlockIdxs = np.append(runStartIdxs[1:], goodCt)
     #
-    # Step through *values* in sorted order, assigning ranks.
-    lastVal = values[srtdToActIdx[0]]
-    startRunIdx = 0
-    currIdx = 1
-    while( currIdx < valCt ):
-        #
-        currVal = values[srtdToActIdx[currIdx]]
-        if( np.isnan(currVal) ):
-            # No need to continue-- uninspected entries already have rank 0.
-            break
-        #
-        # Assign ranks if *currVal* breaks a run of equal entries.
-        if( currVal > lastVal ):
-            # Here, indices *startRunIdx* to *currIdx*-1, inclusive, all had
-            # the same value (*lastVal*).
-            #   Their "natural" ranks are *startRunIdx*+1 to *currIdx*,
-            # inclusive.  Assign all the indices the mean rank.
-            #   Examples:
-            # - startRunIdx=0, currIdx=1 ==> mean(1) ==> meanRank=1
-            # - startRunIdx=0, currIdx=2 ==> mean(1,2) ==> meanRank=1.5
-            # - startRunIdx=0, currIdx=5 ==> mean(1,2,3,4,5) ==> meanRank=3
-            # - startRunIdx=1, currIdx=2 ==> mean(2) ==> meanRank=2
-            # - startRunIdx=1, currIdx=4 ==> mean(2,3,4) ==> meanRank=3
-            # - startRunIdx=1, currIdx=5 ==> mean(2,3,4,5) ==> meanRank=3.5
-            # - startRunIdx=1, currIdx=6 ==> mean(2,3,4,5,6) ==> meanRank=4
-            meanRank = 0.5 * (startRunIdx + currIdx + 1)
-            while( startRunIdx < currIdx ):
-                # Note that ``srtdToActIdx[startRunIdx]`` gives an index for
-                # which *values* equals *lastVal*.
-                ranks[srtdToActIdx[startRunIdx]] = meanRank
-                startRunIdx += 1
-            # Mark start of a new run.
-            #   Note already have ``startRunIdx == currIdx``.
-            lastVal = currVal
-        #
-        # Prepare for next iteration.
-        currIdx += 1
-    #
-    # Here, still need to assign ranks for last entries inspected.
-    #   This code should exactly copy that in the loop above.  There are ways
-    # around this ugly duplication, but they are themselves ugly.
-    meanRank = 0.5 * (startRunIdx + currIdx + 1)
-    while( startRunIdx < currIdx ):
-        ranks[srtdToActIdx[startRunIdx]] = meanRank
-        startRunIdx += 1
-    #
-    # Here, *ranks* holds ranks, between 1 and *currIdx*, inclusive, for all
-    # the non-``NAN`` entries in *values*.
-    #   If *values* has no ``NAN`` entries, then *currIdx* == *valCt*.
-    # Otherwise, *currIdx* < *valCt*.
-    #   All ``NAN`` entries in *values* should have a rank of 0.
+    # Assign every entry in a run the mean rank of the run.
+    #   The "natural" ranks of a run are *startRunIdx*+1 to *blockRunIdx*,
+    # inclusive.  Their mean is halfway between the first and last.
+    #   Examples:
+    # - startRunIdx=0, blockRunIdx=1 ==> mean(1) ==> meanRank=1
+    # - startRunIdx=0, blockRunIdx=2 ==> mean(1,2) ==> meanRank=1.5
+    # - startRunIdx=1, blockRunIdx=4 ==> mean(2,3,4) ==> meanRank=3
+    meanRanks = 0.5 * (runStartIdxs + runBlockIdxs + 1)
+    ranks[srtdToActIdx] = np.repeat(meanRanks, runBlockIdxs - runStartIdxs)
     #
     return( ranks )
     #
     # End :func:`__rankForSpearman`.
+
+
+def __rankWithinGroups(values, groupIds):
+    """
+    Find the ranks of a vector *values* within each group, as defined for
+    Spearman rank correlation coefficient.
+
+    **Notes:**
+
+    - *groupIds* gives the group of each entry of *values*, as an ``int``.
+    - Ranks within each group are as for :func:`__rankForSpearman`: smallest to
+      largest, starting at 1, with equal values getting the mean rank, and
+      ``NAN`` getting a rank of 0.
+    """
+    #
+    ranks = np.zeros(len(values))
+    #
+    # Sort by group, and by value within each group, dropping ``NAN``.
+    srtdToActIdx = np.lexsort((values, groupIds))
+    srtdToActIdx = srtdToActIdx[~np.isnan(values[srtdToActIdx])]
+    goodCt = len(srtdToActIdx)
+    if( goodCt == 0 ):
+        return( ranks )
+    srtdVals = values[srtdToActIdx]
+    srtdGroups = groupIds[srtdToActIdx]
+    #
+    # Find where each group starts, and the runs of equal entries in each group.
+    newGroup = np.concatenate(([True], srtdGroups[1:] != srtdGroups[:-1]))
+    newRun = np.logical_or(newGroup, np.concatenate(([True], srtdVals[1:] != srtdVals[:-1])))
+    groupStartIdxs = np.maximum.accumulate(np.where(newGroup, np.arange(goodCt), 0))
+    runStartIdxs = np.flatnonzero(newRun)
+    runBlockIdxs = np.append(runStartIdxs[1:], goodCt)
+    #
+    # Assign every entry in a run the mean rank of the run, counting from the
+    # start of its group.
+    meanRanks = 0.5 * (runStartIdxs + runBlockIdxs + 1) - groupStartIdxs[runStartIdxs]
+    ranks[srtdToActIdx] = np.repeat(meanRanks, runBlockIdxs - runStartIdxs)
+    #
+    return( ranks )
+    #
+    # End :func:`__rankWithinGroups`.
+
+
+def __sumByGroup(values, groupIds, groupCt):
+    """
+    Sum each column of the 2-D array *values* over the rows in each group.
+    Return an array with one row per group, and one column per column of *values*.
+    """
+    #
+    rowCt, colCt = values.shape
+    binIds = (groupIds[:,np.newaxis] + groupCt*np.arange(colCt)).reshape(-1)
+    sums = np.bincount(binIds, weights=values.reshape(-1), minlength=groupCt*colCt)
+    #
+    return( sums.reshape(colCt, groupCt).T )
+    #
+    # End :func:`__sumByGroup`.
+
+
+def __groupCorrelations(xValues, yValues, goodLocs, groupIds, groupCt):
+    """
+    Find the correlation coefficient between corresponding columns of the 2-D
+    arrays *xValues* and *yValues*, within each group, over the rows marked
+    in *goodLocs*.  Entries outside *goodLocs* must be 0.
+    """
+    #
+    pairCts = __sumByGroup(goodLocs.astype(float), groupIds, groupCt)
+    sumX = __sumByGroup(xValues, groupIds, groupCt)
+    sumY = __sumByGroup(yValues, groupIds, groupCt)
+    sumXX = __sumByGroup(xValues*xValues, groupIds, groupCt)
+    sumYY = __sumByGroup(yValues*yValues, groupIds, groupCt)
+    sumXY = __sumByGroup(xValues*yValues, groupIds, groupCt)
+    #
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covXY = sumXY - sumX*sumY/pairCts
+        varX = sumXX - sumX*sumX/pairCts
+        varY = sumYY - sumY*sumY/pairCts
+        coeffs = covXY / np.sqrt(varX*varY)
+    #
+    # Groups with too few pairs, or no variation, have no coefficient.
+    coeffs[np.logical_or(pairCts < 2, np.logical_not(np.logical_and(varX > 0, varY > 0)))] = np.nan
+    #
+    return( coeffs )
+    #
+    # End :func:`__groupCorrelations`.
+
+
+def __rowPercentiles(grid, levels, goodCts, haveNan):
+    """
+    Find percentiles of each row of the 2-D array *grid*, ignoring ``NAN``.
+
+    **Args:**
+
+    - *grid*, 2-D ``numpy`` array.
+    - *levels*, sequence of percentiles to find (0 to 100).
+    - *goodCts*, number of non-``NAN`` entries in each row.
+    - *haveNan*, ``True`` if *grid* has any ``NAN`` entries.
+
+    **Returns:**
+
+    - *pcts*, list of arrays, one per entry of *levels*, giving that percentile
+      of each row.  ``NAN`` for rows with no good entries.
+
+    **Notes:**
+
+    - Interpolates linearly between ranked entries, as does :func:`numpy.percentile`.
+    - Without ``NAN``, every row has the same count, so a single
+      :func:`numpy.partition` call brings every needed rank into place.  With
+      ``NAN``, the counts differ by row, so sort each row once (``NAN`` sorts
+      last), and read all the percentiles from that.
+    """
+    #
+    rowCt, colCt = grid.shape
+    if( colCt == 0 ):
+        return( [np.full(rowCt, np.nan) for level in levels] )
+    #
+    # Find the fractional rank of each percentile, in each row.
+    positions = [(np.maximum(goodCts, 1) - 1) * (level/100.0) for level in levels]
+    loIdxs = [np.floor(pos).astype(np.int64) for pos in positions]
+    hiIdxs = [np.minimum(lo+1, np.maximum(goodCts-1, 0)) for lo in loIdxs]
+    #
+    if( haveNan ):
+        srtd = np.sort(grid, axis=1)
+    else:
+        kths = np.unique(np.concatenate([np.unique(idxs) for idxs in loIdxs+hiIdxs]))
+        srtd = np.partition(grid, kths, axis=1)
+    #
+    rowIdxs = np.arange(rowCt)
+    pcts = list()
+    for pos, lo, hi in zip(positions, loIdxs, hiIdxs):
+        loVals = srtd[rowIdxs, lo]
+        hiVals = srtd[rowIdxs, hi]
+        pct = loVals + (pos - lo) * (hiVals - loVals)
+        pct[goodCts == 0] = np.nan
+        pcts.append(pct)
+    #
+    return( pcts )
+    #
+    # End :func:`__rowPercentiles`.
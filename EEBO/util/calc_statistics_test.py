@@ -0,0 +1,127 @@
+"""
+Test the Spearman rank correlation in :mod:`util.calc_statistics`.
+
+Run from the ``EEBO`` directory, e.g.::
+
+    python -m pytest util/calc_statistics_test.py
+
+The vectorized ranker is checked against the loop it replaced, kept here as
+:func:`rankForSpearman_loop`.
+"""
+
+
+#--- Provide access.
+#
+import os
+import sys
+#
+import numpy as np
+import scipy.stats
+#
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from util import calc_statistics as a_stat
+
+
+#--- Constants.
+#
+rankForSpearman = getattr(a_stat, '__rankForSpearman')
+
+
+def rankForSpearman_loop(values):
+    """
+    Find the ranks of a vector *values*, stepping through the entries in
+    sorted order.  This is the original :func:`util.calc_statistics.__rankForSpearman`.
+
+    **Notes:**
+
+    - Rank smallest to largest.
+    - Equal values get mean rank.
+    - ``NAN`` gets a rank of 0, except that if every entry is ``NAN``, the
+      first one gets rank 1.
+    """
+    #
+    valCt = len(values)
+    srtdToActIdx = np.argsort(values)
+    ranks = np.zeros(valCt)
+    #
+    lastVal = values[srtdToActIdx[0]]
+    startRunIdx = 0
+    currIdx = 1
+    while( currIdx < valCt ):
+        currVal = values[srtdToActIdx[currIdx]]
+        if( np.isnan(currVal) ):
+            break
+        if( currVal > lastVal ):
+            meanRank = 0.5 * (startRunIdx + currIdx + 1)
+            while( startRunIdx < currIdx ):
+                ranks[srtdToActIdx[startRunIdx]] = meanRank
+                startRunIdx += 1
+            lastVal = currVal
+        currIdx += 1
+    #
+    meanRank = 0.5 * (startRunIdx + currIdx + 1)
+    while( startRunIdx < currIdx ):
+        ranks[srtdToActIdx[startRunIdx]] = meanRank
+        startRunIdx += 1
+    #
+    return( ranks )
+    #
+    # End :func:`rankForSpearman_loop`.
+
+
+def test_rankForSpearman_randomTiesAndNans():
+    rng = np.random.RandomState(0)
+    for trialIdx in range(500):
+        valCt = rng.randint(1, 200)
+        # Draw from only a few distinct values, to get long runs of ties.
+        values = rng.randint(0, rng.randint(1, 10), size=valCt).astype(float)
+        values[rng.rand(valCt) < rng.rand()] = np.nan
+        if( np.all(np.isnan(values)) ):
+            continue
+        assert( np.array_equal(rankForSpearman(values), rankForSpearman_loop(values)) )
+
+
+def test_rankForSpearman_distinct():
+    values = np.array([1, 2, 5, 4, 3], dtype=float)
+    assert( np.array_equal(rankForSpearman(values), [1, 2, 5, 4, 3]) )
+    assert( np.array_equal(rankForSpearman(values), rankForSpearman_loop(values)) )
+
+
+def test_rankForSpearman_singleValue():
+    for values in (np.array([7.0]), np.array([7.0, np.nan]), np.array([np.nan, 7.0])):
+        assert( np.array_equal(rankForSpearman(values), rankForSpearman_loop(values)) )
+    assert( np.array_equal(rankForSpearman(np.array([np.nan, 7.0])), [0, 1]) )
+
+
+def test_rankForSpearman_allTied():
+    values = np.full(6, 3.5)
+    assert( np.array_equal(rankForSpearman(values), np.full(6, 3.5)) )
+    assert( np.array_equal(rankForSpearman(values), rankForSpearman_loop(values)) )
+    #
+    values[[1, 4]] = np.nan
+    assert( np.array_equal(rankForSpearman(values), [2.5, 0, 2.5, 2.5, 0, 2.5]) )
+    assert( np.array_equal(rankForSpearman(values), rankForSpearman_loop(values)) )
+
+
+def test_rankForSpearman_allNan():
+    # Note the loop gave the first entry rank 1 here, although it is ``NAN``.
+    assert( np.array_equal(rankForSpearman(np.full(4, np.nan)), np.zeros(4)) )
+    assert( np.array_equal(rankForSpearman(np.array([np.nan])), [0]) )
+
+
+def test_findSpearmanRank():
+    rng = np.random.RandomState(1)
+    for trialIdx in range(100):
+        valCt = rng.randint(5, 300)
+        xValues = np.round(rng.randn(valCt), 1)
+        yValues = np.round(xValues + rng.randn(valCt), 1)
+        xValues[rng.rand(valCt) < 0.1] = np.nan
+        yValues[rng.rand(valCt) < 0.1] = np.nan
+        goodLocs = np.isfinite(xValues) & np.isfinite(yValues)
+        expected = scipy.stats.spearmanr(xValues[goodLocs], yValues[goodLocs])[0]
+        assert( np.isclose(a_stat.findSpearmanRank(xValues, yValues), expected) )
+
+
+def test_findSpearmanRank_lists():
+    assert( np.isclose(a_stat.findSpearmanRank([1, 2, 3, 4], [10, 20, 30, 40]), 1) )
+    assert( np.isclose(a_stat.findSpearmanRank([1, 2, 3, 4], [4, 3, 3, 1]), -0.9486832980505138) )
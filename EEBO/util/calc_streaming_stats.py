@@ -0,0 +1,386 @@
+"""
+Accumulate statistics over data too large to hold in memory.
+
+**Notes:**
+
+- Each accumulator takes data a chunk at a time, e.g., from
+  :func:`read_data.readDataChunks`, and keeps a fixed-size summary, rather
+  than the data themselves.
+- Accumulators are mergeable: accumulate separate parts of the data (e.g., in
+  separate worker processes), then :meth:`merge` the results.  Merging gives
+  the same result as accumulating all the data in one place (exactly for
+  :class:`RunningStats`, and to within the sketch error for
+  :class:`QuantileSketch`).
+- Accumulators hold only ``numpy`` arrays and plain values, so they can be
+  pickled to pass between processes.
+"""
+
+
+#--- Provide access.
+#
+import copy
+#
+import numpy as np
+#
+from . import calc_statistics as a_stat
+from . import datetime_utils as dtutil
+
+
+class RunningStats(object):
+    """
+    Running count, mean, variance, minimum, and maximum, ignoring ``NAN``.
+
+    **Args:**
+
+    - *shape*, shape of each observation.  For example, ``()`` to summarize
+      single values, or ``(colCt,)`` to summarize each of *colCt* columns.
+
+    **Notes:**
+
+    - Each chunk gets summarized by a two-pass method, and then combined with
+      the running summary using the parallel form of Welford's algorithm
+      (Chan et al.).  This avoids the loss of precision from accumulating
+      sums of squares.
+    """
+
+    def __init__(self, shape=()):
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+
+    def update(self, values):
+        """
+        Add observations *values*, an array-like with one row per observation.
+        """
+        #
+        values = np.asarray(values, dtype=float).reshape((-1,)+self.mean.shape)
+        isGood = ~np.isnan(values)
+        counts = np.count_nonzero(isGood, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(isGood, values, 0.0).sum(axis=0) / counts
+            devs = np.where(isGood, values - means, 0.0)
+        self.__combine(counts, np.where(counts > 0, means, 0.0), (devs*devs).sum(axis=0),
+            np.where(isGood, values, np.inf).min(axis=0, initial=np.inf),
+            np.where(isGood, values, -np.inf).max(axis=0, initial=-np.inf))
+        #
+        # End :meth:`update`.
+
+    def merge(self, other):
+        """
+        Add the observations summarized by *other*, another :class:`RunningStats`.
+        """
+        #
+        self.__combine(other.count, other.mean, other.m2, other.min, other.max)
+        #
+        # End :meth:`merge`.
+
+    def __combine(self, counts, means, m2s, mins, maxs):
+        totals = self.count + counts
+        with np.errstate(invalid='ignore', divide='ignore'):
+            deltas = means - self.mean
+            self.mean = np.where(totals > 0, self.mean + deltas*counts/totals, 0.0)
+            self.m2 = np.where(totals > 0, self.m2 + m2s + deltas*deltas*self.count*counts/totals, 0.0)
+        self.count = totals
+        self.min = np.minimum(self.min, mins)
+        self.max = np.maximum(self.max, maxs)
+
+    def variance(self, ddof=0):
+        """
+        Return the variance, with *ddof* delta degrees of freedom, or ``NAN``
+        where there are too few observations.
+        """
+        #
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return( np.where(self.count > ddof, self.m2 / (self.count - ddof), np.nan) )
+        #
+        # End :meth:`variance`.
+
+    def stdev(self, ddof=0):
+        return( np.sqrt(self.variance(ddof)) )
+
+
+class QuantileSketch(object):
+    """
+    Approximate quantiles of a stream of values, in bounded memory, using a
+    KLL sketch (Karnin, Lang, and Liberty).
+
+    **Args:**
+
+    - *capacity*, number of values kept at the top level.  Larger gives smaller
+      error.  The rank error is roughly 1.7/*capacity*, e.g., under 1% for the
+      default.
+    - *seed*, seed for the random choices made while compacting, so results
+      are repeatable.
+
+    **Notes:**
+
+    - The sketch keeps values in levels.  Each value at level ``h`` stands for
+      ``2**h`` of the original values.  When a level fills up, it gets sorted,
+      and every other value (starting at random) moves up a level.  Lower
+      levels get smaller capacities, so the total size grows only with the
+      logarithm of the number of values.
+    - ``NAN`` values are ignored.  The minimum and maximum are exact.
+    """
+
+    def __init__(self, capacity=200, seed=0):
+        assert( capacity >= 8 )
+        self.capacity = capacity
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.__levels = [np.empty(0)]
+        self.__rng = np.random.RandomState(seed)
+
+    def update(self, values):
+        """
+        Add *values*, an array-like of any shape.
+        """
+        #
+        values = np.asarray(values, dtype=float).reshape(-1)
+        values = values[~np.isnan(values)]
+        if( len(values) == 0 ):
+            return
+        self.count += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        #
+        self.__levels[0] = np.concatenate((self.__levels[0], values))
+        self.__compact()
+        #
+        # End :meth:`update`.
+
+    def merge(self, other):
+        """
+        Add the values summarized by *other*, another :class:`QuantileSketch`.
+        """
+        #
+        if( other.count == 0 ):
+            return
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        #
+        for level, items in enumerate(other.__levels):
+            if( level < len(self.__levels) ):
+                self.__levels[level] = np.concatenate((self.__levels[level], items))
+            else:
+                self.__levels.append(items.copy())
+        self.__compact()
+        #
+        # End :meth:`merge`.
+
+    def __levelCapacity(self, level):
+        # Capacities shrink by 2/3 per level below the top.
+        depth = len(self.__levels) - 1 - level
+        return( max(2, int(np.ceil(self.capacity * (2.0/3.0)**depth))) )
+
+    def __compact(self):
+        level = 0
+        while( level < len(self.__levels) ):
+            items = self.__levels[level]
+            if( len(items) > self.__levelCapacity(level) ):
+                if( level+1 == len(self.__levels) ):
+                    self.__levels.append(np.empty(0))
+                items = np.sort(items)
+                # With an odd count, one value stays at this level.
+                keepCt = len(items) % 2
+                promoted = items[keepCt:][self.__rng.randint(2)::2]
+                self.__levels[level] = items[:keepCt]
+                self.__levels[level+1] = np.concatenate((self.__levels[level+1], promoted))
+            level += 1
+
+    def percentile(self, levels):
+        """
+        Return the approximate percentile(s) of the values seen so far.
+
+        **Args:**
+
+        - *levels*, a percentile (0 to 100), or an array-like sequence of them.
+
+        **Returns:**
+
+        - *pcts*, the percentile(s), with the same shape as *levels*.  ``NAN``
+          if no values have been seen.
+        """
+        #
+        levels = np.asarray(levels, dtype=float)
+        if( self.count == 0 ):
+            return( np.full(levels.shape, np.nan)[()] )
+        #
+        items = np.concatenate(self.__levels)
+        weights = np.concatenate([np.full(len(lev), 2.0**idx) for idx, lev in enumerate(self.__levels)])
+        order = np.argsort(items)
+        items = items[order]
+        cumWeights = np.cumsum(weights[order])
+        #
+        targets = levels/100.0 * cumWeights[-1]
+        pcts = items[np.minimum(np.searchsorted(cumWeights, targets, side='left'), len(items)-1)]
+        pcts = np.where(levels <= 0, self.min, np.where(levels >= 100, self.max, pcts))
+        #
+        return( pcts[()] )
+        #
+        # End :meth:`percentile`.
+
+
+class DailySummaryAccumulator(object):
+    """
+    Accumulate the statistics behind the daily load summary, as found by
+    :func:`util.calc_statistics.gridStats` and
+    :func:`util.calc_statistics.variability` from a grid of loads by day.
+
+    **Args:**
+
+    - *intervalMinutes*, minutes between readings.  If ``None``, infer it
+      from the first chunk (see :func:`util.datetime_utils.inferTimeStep`).
+
+    **Notes:**
+
+    - Readings must arrive in time order within each accumulator.
+    - The per-day percentiles are exact: each day's readings are held only
+      until the day is complete, then reduced to its statistics.  The first
+      and latest day seen stay pending, since another chunk, or another
+      accumulator covering the neighboring data, may add to them.  Thus the
+      data may be split among accumulators anywhere, not just at midnight.
+    - Also keeps a :class:`QuantileSketch` of all the readings.
+    """
+
+    def __init__(self, intervalMinutes=None):
+        self.intervalMinutes = intervalMinutes
+        self.loadStats = RunningStats()
+        self.loadSketch = QuantileSketch()
+        # Columns are peak95, base5, range95_5, bpratio.
+        self.dayStats = RunningStats((4,))
+        self.slotStats = None
+        self.__pendingDays = dict()
+        self.__firstDay = None
+
+    def update(self, datetimes, loads):
+        """
+        Add a chunk of readings.
+
+        **Args:**
+
+        - *datetimes*, times of the readings (see :func:`util.datetime_utils.toDatetime64`).
+        - *loads*, array-like sequence of loads, one per entry of *datetimes*.
+        """
+        #
+        # Check inputs.
+        times = dtutil.toDatetime64(datetimes)
+        loads = np.asarray(loads, dtype=float)
+        assert( loads.ndim == 1 )
+        assert( len(loads) == len(times) )
+        if( len(times) == 0 ):
+            return
+        #
+        if( self.intervalMinutes is None ):
+            step = dtutil.inferTimeStep(times)
+            assert( step is not None )
+            self.intervalMinutes = step / np.timedelta64(1, 'm')
+        if( self.slotStats is None ):
+            self.slotStats = RunningStats((int(np.ceil(1440 / self.intervalMinutes)),))
+        #
+        self.loadStats.update(loads)
+        self.loadSketch.update(loads)
+        #
+        # Statistics by time of day, across days.
+        #   Spread the chunk into a grid of days by time-of-day slots.
+        days = times.astype('datetime64[D]')
+        slots = ((times - days) / np.timedelta64(1, 'm') // self.intervalMinutes).astype(np.int64)
+        chunkDays, dayIdxs = np.unique(days, return_inverse=True)
+        grid = np.full((len(chunkDays), len(self.slotStats.mean)), np.nan)
+        grid[dayIdxs.reshape(-1), slots] = loads
+        self.slotStats.update(grid)
+        #
+        # Hold each day's readings until the day is complete.
+        dayStartIdxs = np.concatenate(([0], np.flatnonzero(days[1:] != days[:-1]) + 1, [len(days)]))
+        for idx in range(len(dayStartIdxs)-1):
+            day = days[dayStartIdxs[idx]]
+            dayLoads = loads[dayStartIdxs[idx]:dayStartIdxs[idx+1]]
+            self.__pendingDays.setdefault(day, list()).append(dayLoads)
+        if( self.__firstDay is None ):
+            self.__firstDay = days[0]
+        lastDay = max(self.__pendingDays)
+        self.__completeDays(self.dayStats,
+            [day for day in self.__pendingDays if day != lastDay and day != self.__firstDay])
+        #
+        # End :meth:`update`.
+
+    def merge(self, other):
+        """
+        Add the readings accumulated by *other*, another :class:`DailySummaryAccumulator`.
+        """
+        #
+        if( other.slotStats is None ):
+            return
+        if( self.slotStats is None ):
+            self.intervalMinutes = other.intervalMinutes
+            self.slotStats = RunningStats(other.slotStats.mean.shape)
+        assert( self.intervalMinutes == other.intervalMinutes )
+        #
+        self.loadStats.merge(other.loadStats)
+        self.loadSketch.merge(other.loadSketch)
+        self.dayStats.merge(other.dayStats)
+        self.slotStats.merge(other.slotStats)
+        for day, dayLoads in other.__pendingDays.items():
+            self.__pendingDays.setdefault(day, list()).extend(dayLoads)
+        if( self.__firstDay is None or other.__firstDay < self.__firstDay ):
+            self.__firstDay = other.__firstDay
+        #
+        # End :meth:`merge`.
+
+    def __completeDays(self, dayStats, days):
+        # Reduce the pending *days* to their statistics, and add to *dayStats*.
+        if( len(days) == 0 ):
+            return
+        dayLoads = [np.concatenate(self.__pendingDays.pop(day)) for day in days]
+        grid = np.full((len(dayLoads), max(len(vals) for vals in dayLoads)), np.nan)
+        for idx, vals in enumerate(dayLoads):
+            grid[idx, :len(vals)] = vals
+        statDict = a_stat.gridStats(grid, 'r')
+        dayVals = np.column_stack([statDict[key].filled(np.nan)
+            for key in ('peak95', 'base5', 'range95_5', 'bpratio')])
+        dayStats.update(dayVals)
+
+    def summary(self):
+        """
+        Return the summary of all the readings accumulated so far.
+
+        **Returns:**
+
+        - *summaryDict*, a dictionary.  Keys 'max' and 'min' give the extreme
+          loads.  Keys 'peak95', 'base5', 'range95_5', and 'bpratio' give the
+          mean over days of those daily statistics, as from
+          :func:`util.calc_statistics.gridStats`.  Key 'variability' gives the
+          load variability, as from :func:`util.calc_statistics.variability`.
+          Keys 'overallPeak95' and 'overallBase5' give approximate percentiles
+          of all the loads.
+
+        **Notes:**
+
+        - Treats the pending days as complete, without changing the accumulator.
+        """
+        #
+        dayStats = copy.deepcopy(self.dayStats)
+        pendingDays = copy.deepcopy(self.__pendingDays)
+        self.__completeDays(dayStats, list(self.__pendingDays))
+        self.__pendingDays = pendingDays
+        #
+        summaryDict = dict()
+        summaryDict['max'] = float(self.loadStats.max)
+        summaryDict['min'] = float(self.loadStats.min)
+        for idx, key in enumerate(('peak95', 'base5', 'range95_5', 'bpratio')):
+            summaryDict[key] = float(dayStats.mean[idx]) if dayStats.count[idx] > 0 else float('nan')
+        #
+        # Variability, as the mean over time-of-day slots of the relative spread across days.
+        with np.errstate(invalid='ignore', divide='ignore'):
+            slotRatios = self.slotStats.stdev(ddof=1) / self.slotStats.mean
+        slotRatios = slotRatios[np.isfinite(slotRatios)]
+        summaryDict['variability'] = float(slotRatios.mean()) if len(slotRatios) > 0 else float('nan')
+        #
+        summaryDict['overallPeak95'], summaryDict['overallBase5'] = self.loadSketch.percentile([95, 5])
+        #
+        return( summaryDict )
+        #
+        # End :meth:`summary`.
@@ -7,16 +7,24 @@ Utilities for cleaning data, e.g., to remove ``NAN`` entries.
   ``selector`` accepts or rejects elements of an array.  Thus, applying a
   ``selector`` to an array results in an array with the same number, or fewer,
   of elements as the original.
-- In the current implementation, a ``selector`` is a list of booleans, with
-  ``True`` marking accepted elements, and ``False`` marking rejected elements.
-  However, user are not expected to know this, and probably are better off
-  treating ``selector`` objects as opaque.
+- In the current implementation, a ``selector`` is a ``numpy`` array of
+  booleans, with ``True`` marking accepted elements, and ``False`` marking
+  rejected elements.  Thus building, combining, and applying ``selector``
+  objects are array operations, with no pass over the elements in Python.
+  Use :func:`packSelector` to store a long-lived ``selector`` as a bitset, in
+  one-eighth the memory.  However, user are not expected to know this, and
+  probably are better off treating ``selector`` objects as opaque.
 """
 
 
 #--- Provide access.
 #
+import itertools
+#
 import numpy as np
+#
+from . import datetime_utils as dtutil
+from . import time_axis
 
 
 def makeSelector_finite(values):
@@ -36,7 +44,7 @@ def makeSelector_finite(values):
     #
     # Mark for acceptance all elements of *values* that are finite (not ``NAN``
     # and not ``Inf``).
-    return( map(np.isfinite, values) )
+    return( np.isfinite(np.asarray(values, dtype=float)) )
     #
     # End :func:`makeSelector_finite`.
 
@@ -57,7 +65,10 @@ def makeSelector_notNone(values):
     """
     #
     # Mark for acceptance all elements of *values* that are not ``None``.
-    return( map(lambda xx: xx is not None, values) )
+    #   Note only an array of objects can hold ``None``.
+    if( isinstance(values, np.ndarray) and values.dtype != object ):
+        return( np.ones(len(values), dtype=bool) )
+    return( np.fromiter((xx is not None for xx in values), dtype=bool, count=len(values)) )
     #
     # End :func:`makeSelector_notNone`.
 
@@ -67,7 +78,7 @@ def getSelectorRejectCt(selector):
     Return the number of entries a ``selector`` object will reject.
     """
     #
-    return( selector.count(False) )
+    return( len(selector) - np.count_nonzero(__asMask(selector)) )
     #
     # End :func:`getSelectorRejectCt`.
 
@@ -85,24 +96,58 @@ def applySelector(selector, values):
 
     **Returns:**
 
-    - *selectedVals*, a list of accepted elements from *values*.
+    - *selectedVals*, the accepted elements from *values*.  If *values* is a
+      ``numpy`` array, a ``numpy`` array.  If *values* is a
+      :class:`util.time_axis.TimeAxis`, another :class:`util.time_axis.TimeAxis`.
+      Otherwise, a list.
 
     **Notes:**
 
     - *values* must have at least as many entries as *selector* (though it may
       have more).
+    - To mark the rejected elements without copying *values*, use
+      :func:`applySelector_masked`.
     """
     #
     # Check inputs.
-    selectCt = len(selector)
+    mask = __asMask(selector)
+    selectCt = len(mask)
     assert( len(values) >= selectCt )
     #
     # Accept all elements of *values* where *selector* is ``True``.
-    return( [values[idx] for idx in range(selectCt) if selector[idx]] )
+    if( isinstance(values, np.ndarray) ):
+        return( values[:selectCt][mask] )
+    if( isinstance(values, time_axis.TimeAxis) ):
+        return( values[:selectCt].compress(mask) )
+    return( list(itertools.compress(values, mask)) )
     #
     # End :func:`applySelector`.
 
 
+def applySelector_masked(selector, values):
+    """
+    Return *values* as a :class:`numpy.ma.MaskedArray`, masking the elements
+    that *selector* rejects.
+
+    **Args:**
+
+    - *selector*, a ``selector`` object.
+    - *values*, array-like sequence with the same number of entries as *selector*.
+
+    **Notes:**
+
+    - If *values* is a ``numpy`` array, the result is a view of it.  Nothing
+      is copied, and changes to accepted elements show up in *values*.
+    """
+    #
+    mask = __asMask(selector)
+    assert( len(values) == len(mask) )
+    #
+    return( np.ma.masked_array(values, mask=~mask, copy=False) )
+    #
+    # End :func:`applySelector_masked`.
+
+
 def combineSelector_narrowing(*selectors):
     """
     Return a ``selector`` object that accepts only elements that all inputs accept.
@@ -132,22 +177,44 @@ def combineSelector_narrowing(*selectors):
     for selIdx in range(1, selectorCt):
         assert( len(selectors[selIdx]) == selectCt )
     #
-    # Create a new selector (to avoid mutating the first input).
-    narrowSelector = list(selectors[0])
+    # Accept only elements where every selector agrees.
+    #   Note this creates a new selector (to avoid mutating the first input).
+    return( np.logical_and.reduce([__asMask(selector) for selector in selectors]) )
     #
-    for selIdx in range(1, selectorCt):
-        # Accept only elements where both selectors agree.
-        #   Strategy: zip *narrowSelector* with next selector, to give a list of
-        # tuples of the corresonding elements.  Map a function over that list.
-        # The function takes a tuple and returns ``True`` if both elements in
-        # the tuple are ``True``.
-        narrowSelector = map(lambda boolTuple: boolTuple[0] and boolTuple[1], zip(narrowSelector, selectors[selIdx]))
-        #
-        # TODO: There must be a "functional" way to run over all the inputs at once.
+    # End :func:`combineSelector_narrowing`.
+
+
+def packSelector(selector):
+    """
+    Return a copy of a ``selector`` object, packed to use one bit per element.
+
+    **Notes:**
+
+    - A packed ``selector`` works anywhere an unpacked one does.  It gets
+      unpacked each time it is used, so pack only ``selector`` objects that
+      are kept around, e.g., with cached data.
+    """
     #
-    return( narrowSelector )
+    return( PackedSelector(__asMask(selector)) )
     #
-    # End :func:`combineSelector_narrowing`.
+    # End :func:`packSelector`.
+
+
+class PackedSelector(object):
+    """
+    A ``selector`` stored as a bitset.  See :func:`packSelector`.
+    """
+
+    def __init__(self, mask):
+        self.count = len(mask)
+        self.bits = np.packbits(mask)
+
+    def __len__(self):
+        return( self.count )
+
+    def __array__(self, dtype=None, copy=None):
+        mask = np.unpackbits(self.bits, count=self.count).view(bool)
+        return( mask if dtype is None else mask.astype(dtype) )
 
 
 def interpolateBadEntries_linear(values, runCtMax=1, times=None):
@@ -161,7 +228,8 @@ def interpolateBadEntries_linear(values, runCtMax=1, times=None):
     - *runCtMax*, maximum number of bad entries in a row to replace.  If more
       than *runCtMax* entries in a row are bad, leave them alone.
     - *times*, optional array-like sequence of times to use as basis for
-      linearization (float).
+      linearization (float, or ``datetime`` objects or ``datetime64`` values,
+      or a :class:`util.time_axis.TimeAxis`).
 
     **Returns:**
 
@@ -181,6 +249,8 @@ def interpolateBadEntries_linear(values, runCtMax=1, times=None):
       *values* are evenly spaced in some sense.
     - If *times* are given, the linearization assumes the entries in *values*
       are samples at the given times.
+    - Finds the runs of bad entries, and replaces them, with array operations
+      over all of *values*, rather than entry by entry.
     """
     #
     # Check inputs.
@@ -193,131 +263,68 @@ def interpolateBadEntries_linear(values, runCtMax=1, times=None):
     #   Also, convert ints to floats if necessary.
     cleanedVals = np.array(values, dtype=float)
     #
-    # Run through *cleanedVals* looking for bad entries.
-    checkIdx = 0
-    while( True ):
-        #
-        # Here, assume *checkIdx* has index of the next entry in *cleanedVals*
-        # to inspect.
-        while( checkIdx<valCt and np.isfinite(cleanedVals[checkIdx]) ):
-            checkIdx += 1
-        if( checkIdx >= valCt ):
-            break
-        #
-        # Here, *checkIdx* marks a bad entry.
-        firstBadIdxInRun = checkIdx
-        while( checkIdx<valCt and not np.isfinite(cleanedVals[checkIdx]) ):
-            checkIdx += 1
-        #
-        # Here, *checkIdx* marks a good entry, or reached end of array.  Have
-        # a run of consecutive bad indices into *cleanedVals*.  The run begins
-        # at *firstBadIdxInRun*, and ends at index ``checkIdx - 1``, inclusive.
-        runCt = checkIdx - firstBadIdxInRun
-        if( runCt <= runCtMax ):
-            #
-            # Here, replace bad entries in *cleanedVals*.
-            if( firstBadIdxInRun==0 and checkIdx<valCt ):
-                fillVal = cleanedVals[checkIdx]
-                __replaceConst(cleanedVals, firstBadIdxInRun, checkIdx, fillVal)
-            elif( firstBadIdxInRun>0 and checkIdx>=valCt ):
-                fillVal = cleanedVals[firstBadIdxInRun-1]
-                __replaceConst(cleanedVals, firstBadIdxInRun, checkIdx, fillVal)
-            elif( firstBadIdxInRun>0 and checkIdx<valCt ):
-                goodIdxLeft = firstBadIdxInRun - 1
-                if( times is None ):
-                    __replaceLin_equispaced(cleanedVals, goodIdxLeft, checkIdx)
-                else:
-                    __replaceLin_times(cleanedVals, goodIdxLeft, checkIdx, times)
-            #
-            # Here, done replacing this run of bad entries.
-            #   Note there's a chance that no replacement was made, if entire
-            # array is bad.
-        #
-        # Here, *checkIdx* marks a good entry in *cleanedVals*, that terminates
-        # a run of bad entries in *values*.  That run may or may not have been
-        # cleaned up in *cleanedVals*.
-        #
-        # Prepare to continue search.
-        checkIdx += 1
+    # Find the runs of bad entries.
+    #   Each run begins at an index in *runStartIdxs*, and ends just before
+    # the corresponding index in *runBlockIdxs*.
+    isBad = ~np.isfinite(cleanedVals)
+    if( not np.any(isBad) ):
+        return( cleanedVals )
+    edges = np.diff(np.concatenate(([0], isBad.view(np.int8), [0])))
+    runStartIdxs = np.flatnonzero(edges == 1)
+    runBlockIdxs = np.flatnonzero(edges == -1)
+    #
+    # Keep runs short enough to replace.
+    #   Note if the entire array is bad, there is nothing to replace from.
+    fillRuns = ( runBlockIdxs - runStartIdxs <= runCtMax )
+    fillRuns &= np.logical_or(runStartIdxs > 0, runBlockIdxs < valCt)
+    if( not np.any(fillRuns) ):
+        return( cleanedVals )
+    #
+    # Mark every entry in a run to replace.
+    runEdges = np.zeros(valCt+1, dtype=np.int64)
+    np.add.at(runEdges, runStartIdxs[fillRuns], 1)
+    np.add.at(runEdges, runBlockIdxs[fillRuns], -1)
+    fillLocs = ( np.cumsum(runEdges[:-1]) > 0 )
     #
-    # Here, filled in bad indices by linear interpolation where possible.
+    # Replace all the marked entries at once.
+    #   For each marked entry, the nearest good entries on either side are
+    # the ends of its run.  So interpolating among the good entries gives the
+    # line across each run.  Beyond the first or last good entry, interpolation
+    # holds the outermost good value.
+    positions = __positions(times, valCt)
+    goodLocs = ~isBad
+    cleanedVals[fillLocs] = np.interp(positions[fillLocs], positions[goodLocs], cleanedVals[goodLocs])
     #
     return( cleanedVals )
     #
     # End :func:`interpolateBadEntries_linear`.
 
 
-def __replaceConst(values, startIdx, blockIdx, newVal):
+def __positions(times, valCt):
     """
-    Replace entries in *values*, from indices *startIdx* (inclusive) through
-    *blockIdx* (exclusive), with a constant *newVal*.  Mutate *values*.
+    Return the positions, along a line, of *valCt* samples taken at *times*,
+    as a ``numpy`` array of ``float``.
     """
     #
-    # Check inputs.
-    valCt = len(values)
-    assert( type(values) == np.ndarray )
-    assert( values.ndim == 1 )
-    assert( startIdx >= 0 )
-    assert( blockIdx <= valCt )
-    assert( startIdx < blockIdx )
-    #
-    values[startIdx:blockIdx] = newVal
+    if( times is None ):
+        return( np.arange(valCt, dtype=float) )
     #
-    # End :func:`__replaceConst`.
-
-
-def __replaceLin_equispaced(values, goodIdxLeft, goodIdxRight):
-    """
-    Replace entries in *values*, from indices ``goodIdxLeft+1`` through
-    ``goodIdxRight-1`` inclusive, with points on a line between the
-    points ``(goodIndexLeft, values[goodIndexLeft])`` and
-    ``(goodIndexRight, values[goodIndexRight])``.  Assume the indices are
-    evenly spaced.
-    """
-    #
-    # Check inputs.
-    valCt = len(values)
-    assert( type(values) == np.ndarray )
-    assert( values.dtype == float )  # np.issubdtype(values.dtype, float)?
-    assert( values.ndim == 1 )
-    assert( goodIdxLeft >= 0 )
-    assert( goodIdxRight < valCt )
-    assert( goodIdxLeft+1 < goodIdxRight )
+    positions = np.asarray(times)
+    if( positions.dtype.kind in 'OM' ):
+        # Here, have ``datetime`` or ``datetime64`` values.  Use seconds.
+        positions = dtutil.toDatetime64(positions)
+        positions = (positions - positions[0]) / np.timedelta64(1, 's')
     #
-    replaceCt = goodIdxRight - goodIdxLeft + 1  # Includes good indices.
-    values[goodIdxLeft:goodIdxRight+1] =  \
-        np.linspace(values[goodIdxLeft], values[goodIdxRight], replaceCt)
+    return( positions.astype(float) )
     #
-    # End :func:`__replaceLin_equispaced`.
+    # End :func:`__positions`.
 
 
-def __replaceLin_times(values, goodIdxLeft, goodIdxRight, times):
+def __asMask(selector):
     """
-    Replace entries in *values*, from indices ``goodIdxLeft+1`` through
-    ``goodIdxRight-1`` inclusive, with points on a line between the
-    points ``(times[goodIndexLeft], values[goodIndexLeft])`` and
-    ``(times[goodIndexRight], values[goodIndexRight])``.  Assume the indices
-    are spaced according to the values in *times*.
+    Return *selector* as a ``numpy`` array of booleans.
     """
     #
-    # Check inputs.
-    valCt = len(values)
-    assert( type(values) == np.ndarray )
-    assert( values.dtype == float )  # np.issubdtype(values.dtype, float)?
-    assert( values.ndim == 1 )
-    assert( goodIdxLeft >= 0 )
-    assert( goodIdxRight < valCt )
-    assert( goodIdxLeft+1 < goodIdxRight )
-    assert( len(times) == valCt )
-    # Not checked: entries in *times* are monotone increasing.
-    #
-    startVal = values[goodIdxLeft]
-    startTime = times[goodIdxLeft]
-    #
-    slope = (float(values[goodIdxRight]) - startVal) / (times[goodIdxRight] - startTime)
-    #
-    for idx in xrange(goodIdxLeft+1, goodIdxRight):
-        newVal = startVal + slope*(times[idx] - startTime)
-        values[idx] = newVal
+    return( np.asarray(selector, dtype=bool) )
     #
-    # End :func:`__replaceLin_times`.
+    # End :func:`__asMask`.
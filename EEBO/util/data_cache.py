@@ -0,0 +1,192 @@
+"""
+Cache parsed meter files on disk, so each file is parsed from text only once.
+
+**Notes:**
+
+- Each cached file is stored as an uncompressed ``.npz`` archive holding the
+  timestamps (as ``datetime64[ns]`` integers), the column names, and the
+  readings (as a 2-D ``float`` array).  Loading it needs no text parsing.
+- A small JSON file next to the archive records the size, modification time,
+  and content hash of the source file, and the timestamp format asked for
+  when parsing it.  A cache entry is used only if the source still matches,
+  and the same format is asked for.  If only the modification time changed (e.g., the file
+  was copied or touched), the content hash decides.
+- By default, the cache lives in a directory :data:`CACHE_DIR_NAME` next to
+  the source file.
+"""
+
+
+#--- Provide access.
+#
+import hashlib
+import json
+import os
+#
+import numpy as np
+
+
+#--- Constants.
+#
+CACHE_DIR_NAME = '.eebo_cache'
+CACHE_VERSION = 2
+__HASH_BLOCK_BYTES = 1 << 20
+
+
+def hashFileContents(filePath):
+    """
+    Return the SHA-1 hex digest of the contents of *filePath*.
+    """
+    #
+    hasher = hashlib.sha1()
+    with open(filePath, 'rb') as inFile:
+        while( True ):
+            block = inFile.read(__HASH_BLOCK_BYTES)
+            if( not block ):
+                break
+            hasher.update(block)
+    #
+    return( hasher.hexdigest() )
+    #
+    # End :func:`hashFileContents`.
+
+
+def loadCached(dataPath, cacheDir=None, datetimeFormat=None):
+    """
+    Return the cached contents of *dataPath*, or ``None`` if not cached.
+
+    **Args:**
+
+    - *dataPath*, path to the source data file.
+    - *cacheDir*, directory holding the cache.  Defaults to a directory
+      :data:`CACHE_DIR_NAME` next to *dataPath*.
+    - *datetimeFormat*, format of the timestamps asked for, or ``None`` if
+      the format is to be detected.  Must match the format given when the
+      entry was stored.
+
+    **Returns:**
+
+    - *cached*, ``None`` if no valid entry exists.  Otherwise a tuple
+      (*datetimes*, *columns*, *values*), with *datetimes* a ``numpy`` array
+      of ``datetime64[ns]``, *columns* a list of column names, and *values*
+      a 2-D ``numpy`` array of ``float``, one column per name.
+    """
+    #
+    archivePath, metaPath = __cachePaths(dataPath, cacheDir)
+    try:
+        with open(metaPath, 'r') as metaFile:
+            meta = json.load(metaFile)
+        srcStat = os.stat(dataPath)
+    except (OSError, ValueError):
+        return( None )
+    #
+    # Check the entry still describes *dataPath*.
+    if( meta.get('version') != CACHE_VERSION or
+        meta.get('path') != os.path.abspath(dataPath) or
+        meta.get('size') != srcStat.st_size or
+        meta.get('datetime_format') != datetimeFormat ):
+        return( None )
+    if( meta.get('mtime_ns') != srcStat.st_mtime_ns ):
+        if( meta.get('sha1') != hashFileContents(dataPath) ):
+            return( None )
+        # Here, contents unchanged.  Record new time, to skip the hash next time.
+        meta['mtime_ns'] = srcStat.st_mtime_ns
+        try:
+            __writeMeta(metaPath, meta)
+        except OSError:
+            pass
+    #
+    try:
+        with np.load(archivePath, allow_pickle=False) as archive:
+            datetimes = archive['datetimes'].view('datetime64[ns]')
+            columns = [str(name) for name in archive['columns']]
+            values = archive['values']
+    except (OSError, KeyError, ValueError):
+        return( None )
+    #
+    return( (datetimes, columns, values) )
+    #
+    # End :func:`loadCached`.
+
+
+def storeCached(dataPath, datetimes, columns, values, cacheDir=None, datetimeFormat=None):
+    """
+    Save the parsed contents of *dataPath* to the cache.
+
+    **Args:**
+
+    - *dataPath*, path to the source data file.
+    - *datetimes*, *columns*, *values*, as returned by :func:`loadCached`.
+    - *cacheDir*, *datetimeFormat*, as for :func:`loadCached`.
+
+    **Returns:**
+
+    - *success*, ``True`` if the entry was written.
+
+    **Notes:**
+
+    - Failing to write the cache (e.g., a read-only directory) is not an
+      error; the caller just parses the file again next time.
+    """
+    #
+    archivePath, metaPath = __cachePaths(dataPath, cacheDir)
+    try:
+        srcStat = os.stat(dataPath)
+        meta = {
+            'version': CACHE_VERSION,
+            'path': os.path.abspath(dataPath),
+            'size': srcStat.st_size,
+            'mtime_ns': srcStat.st_mtime_ns,
+            'sha1': hashFileContents(dataPath),
+            'datetime_format': datetimeFormat,
+            }
+        #
+        cacheDir = os.path.dirname(archivePath)
+        if( not os.path.isdir(cacheDir) ):
+            os.makedirs(cacheDir)
+        #
+        # Write to a temporary file, then rename, so readers never see a
+        # partial archive.
+        tempPath = archivePath + '.tmp'
+        with open(tempPath, 'wb') as outFile:
+            np.savez(outFile,
+                datetimes=np.asarray(datetimes, dtype='datetime64[ns]').view(np.int64),
+                columns=np.array(columns, dtype=str),
+                values=np.asarray(values, dtype=float))
+        os.replace(tempPath, archivePath)
+        __writeMeta(metaPath, meta)
+    except OSError:
+        return( False )
+    #
+    return( True )
+    #
+    # End :func:`storeCached`.
+
+
+def __cachePaths(dataPath, cacheDir):
+    """
+    Return the paths of the archive and metadata files caching *dataPath*.
+    """
+    #
+    absPath = os.path.abspath(dataPath)
+    if( cacheDir is None ):
+        cacheDir = os.path.join(os.path.dirname(absPath), CACHE_DIR_NAME)
+    #
+    stem = os.path.basename(absPath) + '.' + hashlib.sha1(absPath.encode('utf-8')).hexdigest()[:12]
+    stem = os.path.join(cacheDir, stem)
+    #
+    return( (stem+'.npz', stem+'.json') )
+    #
+    # End :func:`__cachePaths`.
+
+
+def __writeMeta(metaPath, meta):
+    """
+    Write the cache entry description *meta* to *metaPath*.
+    """
+    #
+    tempPath = metaPath + '.tmp'
+    with open(tempPath, 'w') as metaFile:
+        json.dump(meta, metaFile)
+    os.replace(tempPath, metaPath)
+    #
+    # End :func:`__writeMeta`.
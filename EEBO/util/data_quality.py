@@ -0,0 +1,262 @@
+"""
+Flag implausible meter readings: stuck meters, spikes, and out-of-range values.
+
+**Notes:**
+
+- A :class:`QualityChecker` runs every check over a chunk of readings at a
+  time, and carries just enough state from one chunk to the next (the last
+  readings and the current flatline run lengths) that the results do not
+  depend on how the data are split into chunks.  Thus memory use is bounded by
+  the chunk size, and :func:`iterCheckedChunks` can check files larger than
+  memory.
+- The checks are causal: each reading is judged from itself and the readings
+  before it.  So a stuck meter is flagged from the *flatlineCtMin*-th
+  identical reading on, not from the start of the run.
+- The mask returned for each chunk accepts a reading only if it passes every
+  check.  Each column of the mask works as a ``selector`` with
+  :mod:`util.clean_data`, and rejects at least what
+  :func:`util.clean_data.makeSelector_finite` rejects.
+"""
+
+
+#--- Provide access.
+#
+import warnings
+#
+import numpy as np
+import pandas as pd
+
+
+#--- Constants.
+#
+# Scale factor that makes the median absolute deviation estimate the standard
+# deviation, for normally-distributed data.
+MAD_TO_STDEV = 1.4826
+#
+# Keys of the per-column summary, in the order checked.
+SUMMARY_KEYS = ('readingCt', 'nonFiniteCt', 'belowMinCt', 'aboveMaxCt',
+    'flatlineCt', 'spikeCt', 'rejectCt')
+
+
+class QualityChecker(object):
+    """
+    Check readings chunk by chunk, keeping a running summary.
+
+    **Args:**
+
+    - *columns*, list of column (meter) names.
+    - *valueMin*, smallest plausible reading.  Default 0, i.e., reject negative
+      readings.  ``None`` to skip the check.
+    - *valueMax*, largest plausible reading, or ``None`` to skip the check.
+    - *flatlineCtMin*, number of identical readings in a row that marks a stuck
+      meter.  ``None`` to skip the check.
+    - *flatlineTol*, largest change between readings still counted as identical.
+    - *spikeWindowCt*, number of preceding readings to compare each reading
+      against.
+    - *spikeZMax*, largest plausible robust z-score, i.e., distance from the
+      median of the preceding readings, in units of their scaled median
+      absolute deviation.  ``None`` to skip the check.
+
+    **Notes:**
+
+    - A reading is a spike if its robust z-score exceeds *spikeZMax*.  If the
+      preceding readings have no spread (median absolute deviation of 0), or
+      fewer than half of them are finite, no reading is called a spike.
+    """
+
+    def __init__(self, columns, valueMin=0.0, valueMax=None,
+        flatlineCtMin=12, flatlineTol=0.0,
+        spikeWindowCt=24, spikeZMax=8.0):
+        #
+        # Check inputs.
+        assert( flatlineCtMin is None or flatlineCtMin > 1 )
+        assert( spikeWindowCt > 1 )
+        #
+        self.columns = list(columns)
+        self.valueMin = valueMin
+        self.valueMax = valueMax
+        self.flatlineCtMin = flatlineCtMin
+        self.flatlineTol = flatlineTol
+        self.spikeWindowCt = spikeWindowCt
+        self.spikeZMax = spikeZMax
+        #
+        colCt = len(self.columns)
+        self.__prevVals = np.full((spikeWindowCt, colCt), np.nan)
+        self.__sameCts = np.zeros(colCt, dtype=np.int64)
+        self.__counts = dict((key, np.zeros(colCt, dtype=np.int64)) for key in SUMMARY_KEYS)
+
+    def check(self, values):
+        """
+        Check the next chunk of readings.
+
+        **Args:**
+
+        - *values*, 2-D array-like of readings, with one row per time and one
+          column per entry of *columns*.  Or, if checking a single column,
+          a 1-D array-like.
+
+        **Returns:**
+
+        - *goodMask*, ``numpy`` array of booleans, the same shape as *values*,
+          with ``True`` marking readings that pass every check.
+        """
+        #
+        # Check inputs.
+        values = np.asarray(values, dtype=float)
+        oneD = ( values.ndim == 1 )
+        if( oneD ):
+            values = values[:,np.newaxis]
+        assert( values.shape[1] == len(self.columns) )
+        #
+        isFinite = np.isfinite(values)
+        badMask = ~isFinite
+        self.__count('nonFiniteCt', badMask)
+        #
+        # Range limits.
+        #   Note comparisons with ``NAN`` are ``False``.
+        if( self.valueMin is not None ):
+            isBelow = ( values < self.valueMin )
+            self.__count('belowMinCt', isBelow)
+            badMask |= isBelow
+        if( self.valueMax is not None ):
+            isAbove = ( values > self.valueMax )
+            self.__count('aboveMaxCt', isAbove)
+            badMask |= isAbove
+        #
+        if( self.flatlineCtMin is not None ):
+            isFlat = self.__checkFlatline(values)
+            self.__count('flatlineCt', isFlat)
+            badMask |= isFlat
+        #
+        if( self.spikeZMax is not None ):
+            isSpike = self.__checkSpike(values)
+            self.__count('spikeCt', isSpike)
+            badMask |= isSpike
+        #
+        # Save the last readings, for the next chunk.
+        self.__prevVals = np.concatenate((self.__prevVals, values))[-self.spikeWindowCt:]
+        #
+        self.__counts['readingCt'] += len(values)
+        self.__count('rejectCt', badMask)
+        #
+        goodMask = ~badMask
+        return( goodMask[:,0] if oneD else goodMask )
+        #
+        # End :meth:`check`.
+
+    def summary(self):
+        """
+        Return the counts for all the readings checked so far.
+
+        **Returns:**
+
+        - *summary*, dictionary mapping each column name to a dictionary of
+          counts, keyed by the names in :data:`SUMMARY_KEYS`.  A reading that
+          fails more than one check adds to each of their counts, but only
+          once to ``'rejectCt'``.
+        """
+        #
+        summary = dict()
+        for colIdx, colName in enumerate(self.columns):
+            summary[colName] = dict((key, int(self.__counts[key][colIdx])) for key in SUMMARY_KEYS)
+        #
+        return( summary )
+        #
+        # End :meth:`summary`.
+
+    def __count(self, key, mask):
+        self.__counts[key] += np.count_nonzero(mask, axis=0)
+
+    def __checkFlatline(self, values):
+        #
+        # Mark readings the same as the reading before.
+        #   Note ``NAN`` never matches, so it ends a run.
+        prevVals = np.concatenate((self.__prevVals[-1:], values))
+        isSame = ( np.abs(np.diff(prevVals, axis=0)) <= self.flatlineTol )
+        #
+        # Count the readings in a row, up to and including each reading, that
+        # are the same as the reading before.  Runs without a break in this
+        # chunk continue the count from the last chunk.
+        rowIdxs = np.arange(len(values))[:,np.newaxis]
+        lastBreakIdxs = np.maximum.accumulate(np.where(isSame, -1, rowIdxs), axis=0)
+        sameCts = np.where(lastBreakIdxs < 0, rowIdxs + 1 + self.__sameCts, rowIdxs - lastBreakIdxs)
+        if( len(values) > 0 ):
+            self.__sameCts = sameCts[-1]
+        #
+        # A run of *flatlineCtMin* identical readings has *flatlineCtMin*-1 repeats.
+        return( sameCts >= self.flatlineCtMin - 1 )
+
+    def __checkSpike(self, values):
+        #
+        # Gather the *spikeWindowCt* readings before each reading.
+        #   Shape is (rows, columns, window).  The windows are strided views,
+        # so making them copies nothing.  Note the medians below do copy them,
+        # to work on, so the chunk takes *spikeWindowCt* times the memory of
+        # *values* while checking.
+        prevVals = np.concatenate((self.__prevVals, values))[:-1]
+        rowStride, colStride = prevVals.strides
+        windows = np.lib.stride_tricks.as_strided(prevVals,
+            shape=(len(values), prevVals.shape[1], self.spikeWindowCt),
+            strides=(rowStride, colStride, rowStride), writeable=False)
+        #
+        # Robust center and spread of each window.
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if( np.all(np.isfinite(windows)) ):
+                medians = np.median(windows, axis=-1)
+                mads = np.median(np.abs(windows - medians[...,np.newaxis]), axis=-1)
+            else:
+                with warnings.catch_warnings():
+                    # All-``NAN`` windows are expected.
+                    warnings.simplefilter('ignore', RuntimeWarning)
+                    medians = np.nanmedian(windows, axis=-1)
+                    mads = np.nanmedian(np.abs(windows - medians[...,np.newaxis]), axis=-1)
+                enoughGood = ( 2*np.count_nonzero(np.isfinite(windows), axis=-1) >= self.spikeWindowCt )
+                mads = np.where(enoughGood, mads, np.nan)
+            #
+            zScores = np.abs(values - medians) / (MAD_TO_STDEV * mads)
+            return( np.logical_and(mads > 0, zScores > self.spikeZMax) )
+
+
+def iterCheckedChunks(dataPath, checker=None, chunkRowCt=100000, **checkerArgs):
+    """
+    Check a meter data file, a chunk of rows at a time.
+
+    **Args:**
+
+    - *dataPath*, path to a CSV file, laid out as for :func:`read_data.readData`.
+    - *checker*, a :class:`QualityChecker` for the value columns.  If ``None``,
+      make one, passing it *checkerArgs*.
+    - *chunkRowCt*, number of rows to read at a time.
+
+    **Returns:**
+
+    - A generator of (*chunk*, *goodMask*), with *chunk* the ``DataFrame`` of
+      the next rows of the file (timestamps not parsed), and *goodMask* as
+      returned by :meth:`QualityChecker.check` for its value columns.  After
+      the generator is done, ``checker.summary()`` covers the whole file.
+    """
+    #
+    if( checker is None ):
+        columns = pd.read_csv(dataPath, nrows=0).columns
+        checker = QualityChecker(columns[1:], **checkerArgs)
+    #
+    for chunk in pd.read_csv(dataPath, chunksize=chunkRowCt):
+        yield( (chunk, checker.check(chunk.iloc[:,1:].values)) )
+    #
+    # End :func:`iterCheckedChunks`.
+
+
+def summarizeFile(dataPath, chunkRowCt=100000, **checkerArgs):
+    """
+    Return the :meth:`QualityChecker.summary` for a meter data file, reading
+    it a chunk of rows at a time.  Arguments as for :func:`iterCheckedChunks`.
+    """
+    #
+    columns = pd.read_csv(dataPath, nrows=0).columns
+    checker = QualityChecker(columns[1:], **checkerArgs)
+    for chunk, goodMask in iterCheckedChunks(dataPath, checker, chunkRowCt):
+        pass
+    #
+    return( checker.summary() )
+    #
+    # End :func:`summarizeFile`.
@@ -4,6 +4,33 @@
 #--- Provide access.
 #
 import datetime as dto
+import numpy as np
+import pandas as pd
+
+
+#--- Constants.
+#
+# Timestamp formats commonly found in meter exports, in the order tried by
+# :func:`detectDatetimeFormat`.  Month-first formats come before day-first
+# formats, so an ambiguous file is read month-first.
+METER_DATETIME_FORMATS = [
+    '%m/%d/%Y %H:%M',
+    '%m/%d/%Y %H:%M:%S',
+    '%m/%d/%Y %I:%M %p',
+    '%m/%d/%Y %I:%M:%S %p',
+    '%m/%d/%y %H:%M',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%dT%H:%M',
+    '%Y/%m/%d %H:%M:%S',
+    '%Y/%m/%d %H:%M',
+    '%d/%m/%Y %H:%M',
+    '%d/%m/%Y %H:%M:%S',
+    '%d.%m.%Y %H:%M',
+    '%m/%d/%Y',
+    '%Y-%m-%d',
+    ]
 
 
 def findLatestEntryBefore(datetimes, tCut, startIdx=None, blockIdx=None):
@@ -33,12 +60,8 @@ def findLatestEntryBefore(datetimes, tCut, startIdx=None, blockIdx=None):
       find a meaningful result.  In this case, return the closest permitted
       index.
 
-    **Enhancements:**
-
-    - If *datetimes* are evenly spaced, can find desired index directly.  And even
-      if only nearly-evenly spaced, may still be able to find it faster than via
-      bisection.  Consider rewrite to first assume even spacing, and to use
-      bisection only if that assumption fails.
+    - To search for many cut times at once, use :func:`findLatestEntriesBefore`.
+      It converts *datetimes* once, and exploits even spacing.
     """
     #
     # Check inputs.
@@ -111,7 +134,7 @@ def findLatestEntryBefore(datetimes, tCut, startIdx=None, blockIdx=None):
             break
         #
         # Prepare for next iteration.
-        testIdx = (beforeIdx + afterOrOnIdx) / 2
+        testIdx = (beforeIdx + afterOrOnIdx) // 2
     #
     # Here, *beforeIdx* and *afterOrOnIdx* bound *tCut*, provided it fell
     # within the original bounds.
@@ -121,6 +144,85 @@ def findLatestEntryBefore(datetimes, tCut, startIdx=None, blockIdx=None):
     # End :func:`findLatestEntryBefore`.
 
 
+def findLatestEntriesBefore(datetimes, tCuts, startIdx=None, blockIdx=None):
+    """
+    Find, for each of *tCuts*, the latest entry in *datetimes* that falls
+    before it.
+
+    **Args:**
+
+    - *datetimes*, array-like sequence of times (:class:`date` or
+      :class:`datetime` objects, or ``datetime64`` values).
+    - *tCuts*, a time, or an array-like sequence of times, to bound from below.
+    - *startIdx*, *blockIdx*, as for :func:`findLatestEntryBefore`.
+
+    **Returns:**
+
+    - *beforeIdxs*, ``numpy`` array of ``int``, with one entry per entry of
+      *tCuts*, each as returned by :func:`findLatestEntryBefore`.  If *tCuts*
+      is a single time, a single ``int``.
+
+    **Notes:**
+
+    - *datetimes* must be monotone increasing.  *tCuts* may come in any order.
+    - Meter data usually are evenly spaced.  So first guess each index
+      arithmetically, from the average spacing of *datetimes*, and check each
+      guess against its neighbors.  Only cut times whose guesses fail (e.g.,
+      because of gaps in the data) go to a binary search.
+    - Converting *datetimes* to ``datetime64`` takes one pass over the data.
+      So make a single call for all the cut times of interest, rather than
+      one call per cut time.
+    """
+    #
+    # Check inputs.
+    times = toDatetime64(datetimes)
+    dtCt = len(times)
+    assert( dtCt > 0 )
+    if( startIdx is None ):
+        startIdx = 0
+    assert( startIdx >= 0 )
+    if( blockIdx is None ):
+        blockIdx = dtCt
+    assert( blockIdx <= dtCt )
+    assert( startIdx < blockIdx )
+    #
+    scalarIn = ( np.ndim(tCuts) == 0 )
+    if( scalarIn ):
+        tCuts = [tCuts]
+    cuts = toDatetime64(tCuts).view(np.int64)
+    window = times[startIdx:blockIdx].view(np.int64)
+    lastIdx = len(window) - 1
+    #
+    # Guess, assuming even spacing.
+    #   Guess the largest index whose time falls before each cut, then
+    # check it.  The first index is also correct for cut times that fall on or
+    # before the first entry.
+    span = window[-1] - window[0]
+    if( lastIdx > 0 and span > 0 ):
+        step = span / float(lastIdx)
+        guessIdxs = np.ceil((cuts - window[0]) / step) - 1
+        guessIdxs = np.clip(guessIdxs, 0, lastIdx).astype(np.int64)
+        nextIdxs = np.minimum(guessIdxs+1, lastIdx)
+        goodGuess = np.logical_and(
+            np.logical_or(window[guessIdxs] < cuts, guessIdxs == 0),
+            np.logical_or(window[nextIdxs] >= cuts, guessIdxs == lastIdx))
+    else:
+        guessIdxs = np.zeros(len(cuts), dtype=np.int64)
+        goodGuess = np.zeros(len(cuts), dtype=bool)
+    #
+    # Search for the rest.
+    if( not np.all(goodGuess) ):
+        badGuess = ~goodGuess
+        searchIdxs = np.searchsorted(window, cuts[badGuess], side='left') - 1
+        guessIdxs[badGuess] = np.maximum(searchIdxs, 0)
+    #
+    beforeIdxs = guessIdxs + startIdx
+    #
+    return( int(beforeIdxs[0]) if scalarIn else beforeIdxs )
+    #
+    # End :func:`findLatestEntriesBefore`.
+
+
 def goBackOneYear(currDate):
     """
     Find the date-time that is the equivalent of *currDate*, but a year before.
@@ -237,3 +339,197 @@ def goBackMonths(currDate, monthCt):
     return( sameDayEarlierMonth )
     #
     # End :func:`goBackMonths`.
+
+
+def toDatetime64(datetimes):
+    """
+    Return *datetimes* as a ``numpy`` array of ``datetime64[ns]``.
+
+    **Args:**
+
+    - *datetimes*, array-like sequence of :class:`date` or :class:`datetime`
+      objects, or of ``datetime64`` values.  Or, a :class:`util.time_axis.TimeAxis`.
+
+    **Notes:**
+
+    - If *datetimes* already is a ``datetime64[ns]`` array, return it as is,
+      without copying.
+    - A :class:`util.time_axis.TimeAxis` (or any object with an
+      ``asDatetime64`` method) provides its own ``datetime64`` view.
+    - For a sequence of :class:`date` or :class:`datetime` objects, find each
+      entry's offset from the first by :class:`timedelta` arithmetic.  This is
+      several times faster than letting ``numpy`` or ``pandas`` convert the
+      objects, since those check every entry for time zones and mixed types.
+    """
+    #
+    if( isinstance(datetimes, np.ndarray) and datetimes.dtype == np.dtype('datetime64[ns]') ):
+        return( datetimes )
+    if( hasattr(datetimes, 'asDatetime64') ):
+        return( datetimes.asDatetime64() )
+    if( isinstance(datetimes, (pd.Index, pd.Series)) ):
+        return( np.asarray(datetimes.values, dtype='datetime64[ns]') )
+    #
+    if( len(datetimes) > 0 and isinstance(datetimes[0], dto.date) ):
+        firstDt = datetimes[0]
+        oneUsec = dto.timedelta(microseconds=1)
+        try:
+            offsets = np.fromiter(((dt - firstDt) // oneUsec for dt in datetimes), np.int64, len(datetimes))
+        except TypeError:
+            # Here, a missing or mismatched entry.  Let ``numpy`` sort it out.
+            return( np.asarray(datetimes, dtype='datetime64[ns]') )
+        return( (np.datetime64(firstDt, 'us') + offsets.astype('timedelta64[us]')).astype('datetime64[ns]') )
+    #
+    return( np.asarray(datetimes, dtype='datetime64[ns]') )
+    #
+    # End :func:`toDatetime64`.
+
+
+def inferTimeStep(datetimes):
+    """
+    Find the regular time step of a series of readings.
+
+    **Args:**
+
+    - *datetimes*, array-like sequence of times (see :func:`toDatetime64`).
+
+    **Returns:**
+
+    - *step*, the most common positive difference between consecutive
+      entries of *datetimes*, as a ``timedelta64[ns]``.  ``None`` if there is
+      no positive difference.
+
+    **Notes:**
+
+    - Using the most common difference, rather than the mean or the smallest,
+      makes the result robust to gaps, duplicates, and a few jittered readings.
+    - *datetimes* need not be sorted.
+    """
+    #
+    deltas = np.diff(np.sort(toDatetime64(datetimes)))
+    deltas = deltas[deltas > np.timedelta64(0, 'ns')]
+    if( len(deltas) == 0 ):
+        return( None )
+    #
+    uniqueDeltas, deltaCts = np.unique(deltas, return_counts=True)
+    #
+    return( uniqueDeltas[np.argmax(deltaCts)] )
+    #
+    # End :func:`inferTimeStep`.
+
+
+def detectDatetimeFormat(strings, sampleCt=200):
+    """
+    Find the format of the timestamps in *strings*.
+
+    **Args:**
+
+    - *strings*, array-like sequence of timestamp strings.
+    - *sampleCt*, number of entries, spread evenly over *strings*, to test.
+
+    **Returns:**
+
+    - *fmt*, the first format in :data:`METER_DATETIME_FORMATS` that parses
+      every sampled entry, or ``None`` if no format does.
+
+    **Notes:**
+
+    - Missing entries (``None`` or ``NAN``) are skipped.
+    - Sampling over the whole sequence, rather than just the first few entries,
+      lets day-first files reject the month-first formats once a day past the
+      12th shows up.
+    """
+    #
+    # Pick the samples.
+    strings = pd.Series(strings)
+    strings = strings[strings.notnull()]
+    strCt = len(strings)
+    if( strCt == 0 ):
+        return( None )
+    sampleIdxs = np.unique(np.linspace(0, strCt-1, min(sampleCt, strCt)).astype(int))
+    samples = [str(xx).strip() for xx in strings.iloc[sampleIdxs]]
+    #
+    for fmt in METER_DATETIME_FORMATS:
+        try:
+            for sample in samples:
+                dto.datetime.strptime(sample, fmt)
+        except ValueError:
+            continue
+        return( fmt )
+    #
+    return( None )
+    #
+    # End :func:`detectDatetimeFormat`.
+
+
+def parseDatetimes(strings, fmt=None):
+    """
+    Convert a sequence of timestamp strings to ``datetime64`` values.
+
+    **Args:**
+
+    - *strings*, array-like sequence of timestamp strings.
+    - *fmt*, :func:`datetime.strptime`-style format of the entries.  If
+      ``None``, detect it with :func:`detectDatetimeFormat`.
+
+    **Returns:**
+
+    - *datetimes*, ``numpy`` array of ``datetime64[ns]``, with ``NaT`` for
+      missing entries.
+
+    **Notes:**
+
+    - Parsing is done in vectorized calls, never one entry at a time in Python.
+    - Where *fmt* has a date part and a time part separated by a space or a
+      ``T``, the two parts are parsed separately, and each distinct date (and
+      each distinct time of day) is parsed only once.  Meter data repeat every
+      date string once per interval, so this is the common fast path.  It
+      does split the entries at the separator one at a time, in Python list
+      comprehensions.  That is cheap next to parsing, and faster than
+      splitting with the ``pandas`` string methods.
+    - Raises ``ValueError`` if no format can be found, or if an entry does not
+      match *fmt*.
+    """
+    #
+    strings = pd.Series(strings, copy=False)
+    if( fmt is None ):
+        fmt = detectDatetimeFormat(strings)
+        if( fmt is None ):
+            raise ValueError('Unrecognized timestamp format, e.g., {0!r}'.format(strings.iloc[0]))
+    #
+    # Set aside missing entries.
+    missing = strings.isnull().values
+    haveMissing = np.any(missing)
+    if( haveMissing ):
+        strings = strings[~missing]
+    #
+    # Split *fmt* into its date and time parts, if possible.
+    for sepChar in (' ', 'T'):
+        dateFmt, sep, timeFmt = fmt.partition(sepChar)
+        if( sep and '%' in timeFmt ):
+            break
+    else:
+        # Here, no time part.  Parse the entries directly.
+        sepChar = None
+    #
+    if( sepChar is None ):
+        parsed = pd.to_datetime(strings, format=fmt).values
+    else:
+        # Parse each distinct date, and each distinct time of day, once.
+        #   Note splitting the strings is much cheaper than parsing them.
+        parts = [xx.strip().partition(sepChar) for xx in strings.astype(str).values]
+        dateCodes, dateUniques = pd.factorize(np.array([xx[0] for xx in parts], dtype=object))
+        timeCodes, timeUniques = pd.factorize(np.array([xx[2] for xx in parts], dtype=object))
+        dateVals = pd.to_datetime(dateUniques, format=dateFmt).values
+        timeVals = (pd.to_datetime(timeUniques, format=timeFmt) - pd.Timestamp('1900-01-01')).values
+        parsed = dateVals[dateCodes] + timeVals[timeCodes]
+    #
+    if( haveMissing ):
+        datetimes = np.empty(len(missing), dtype='datetime64[ns]')
+        datetimes[missing] = np.datetime64('NaT')
+        datetimes[~missing] = parsed
+    else:
+        datetimes = parsed
+    #
+    return( datetimes )
+    #
+    # End :func:`parseDatetimes`.
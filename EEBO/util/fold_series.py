@@ -0,0 +1,212 @@
+"""
+Fold a time series into a grid, e.g., of days by time of day.
+
+**Notes:**
+
+- Functions like :func:`gen_plot.genDailySummary` and :func:`gen_plot.genHeatMap`
+  take loads as a 2-D grid, with one row per day.  :func:`foldSeries` builds
+  such grids, for days, weeks, or months, from a series of readings.
+- Where the readings are regular and fill whole rows, the value grid is just
+  a reshaped view of the readings, so nothing gets copied.  Otherwise, the
+  readings get scattered into a grid of ``NAN``, in one vectorized step.  Then
+  the only padding is where a reading is missing: at gaps, at the start of
+  daylight saving time, and before the first and after the last reading.
+- The matching grid of times is a :class:`TimeGrid`, which stores one time per
+  row, and works out the rest only when asked.
+"""
+
+
+#--- Provide access.
+#
+import numpy as np
+#
+from . import datetime_utils as dtutil
+
+
+#--- Constants.
+#
+FOLD_PERIODS = ('day', 'week', 'month')
+
+
+class TimeGrid(object):
+    """
+    Times of the cells of a folded grid, found on demand.
+
+    **Args:**
+
+    - *rowStarts*, array-like sequence of times (``datetime64``) of the first
+      cell in each row.
+    - *step*, time between cells in a row (``timedelta`` or ``timedelta64``).
+    - *colCt*, number of cells in a row.
+
+    **Notes:**
+
+    - Acts like a 2-D ``numpy`` array of ``datetime64[ns]``, for ``shape``,
+      ``numpy.asarray``, and indexing.  Indexing by row and column works out
+      just the times asked for.
+    - Cells past the end of a short row (e.g., day 31 of April) get the times
+      they would have had, had the row continued.
+    """
+
+    def __init__(self, rowStarts, step, colCt):
+        self.rowStarts = np.asarray(rowStarts, dtype='datetime64[ns]')
+        self.step = np.timedelta64(step).astype('timedelta64[ns]')
+        self.colCt = int(colCt)
+
+    @property
+    def shape(self):
+        return( (len(self.rowStarts), self.colCt) )
+
+    @property
+    def ndim(self):
+        return( 2 )
+
+    @property
+    def dtype(self):
+        return( self.rowStarts.dtype )
+
+    def __len__(self):
+        return( len(self.rowStarts) )
+
+    def __repr__(self):
+        return( 'TimeGrid(rowCt={0}, step={1}, colCt={2})'.format(
+            len(self.rowStarts), self.step, self.colCt) )
+
+    def __array__(self, dtype=None, copy=None):
+        times = self.rowStarts[:,np.newaxis] + np.arange(self.colCt) * self.step
+        return( times if dtype is None else times.astype(dtype) )
+
+    def __getitem__(self, idx):
+        #
+        # Row and column indexes, each an integer or slice, give just those times.
+        if( isinstance(idx, tuple) and len(idx) == 2 and
+            all(isinstance(xx, (int, np.integer, slice)) for xx in idx) ):
+            rowIdx, colIdx = idx
+            colOffsets = np.arange(self.colCt)[colIdx] * self.step
+            return( np.add.outer(self.rowStarts[rowIdx], colOffsets)[()] )
+        #
+        return( np.asarray(self)[idx] )
+
+
+def foldSeries(datetimes, values, period='day', step=None):
+    """
+    Fold readings into a grid, with one row per *period*.
+
+    **Args:**
+
+    - *datetimes*, array-like sequence of monotone-increasing reading times
+      (see :func:`util.datetime_utils.toDatetime64`).
+    - *values*, array-like sequence of readings, one per entry of *datetimes*.
+      Or, a 2-D array with one row per entry of *datetimes*, and one column
+      per meter.
+    - *period*, length of each row of the grid: ``'day'``, ``'week'`` (starting
+      Monday), or ``'month'``.
+    - *step*, time between readings (``timedelta`` or ``timedelta64``).  If
+      ``None``, infer it with :func:`util.datetime_utils.inferTimeStep`.
+
+    **Returns:**
+
+    - (*timeGrid*, *valueGrid*).
+    - *timeGrid*, :class:`TimeGrid` of the time of each cell.
+    - *valueGrid*, ``numpy`` array of readings, with one row per *period*, from
+      the one holding the first reading through the one holding the last, and
+      one column per *step* in the longest possible *period* (e.g., 96 columns
+      for 15-minute readings by day, or 31 for daily readings by month).  For
+      2-D *values*, a third axis gives the meter.  Cells with no reading hold
+      ``NAN``.
+
+    **Notes:**
+
+    - The cells keep the phase of the readings.  For example, with 15-minute
+      readings taken at 7, 22, 37, and 52 minutes past the hour, each day's
+      first cell falls at 00:07.  The phase is that of the first reading.
+      A reading off that phase goes in the cell before it.
+    - If *valueGrid* is a view of *values*, changing one changes the other.
+    - Where more than one reading falls in a cell (e.g., the repeated hour at
+      the end of daylight saving time), the later reading wins.  To combine
+      them instead, first use :func:`util.regularize_times.regularizeSeries`.
+    """
+    #
+    # Check inputs.
+    assert( period in FOLD_PERIODS )
+    times = dtutil.toDatetime64(datetimes)
+    values = np.asarray(values, dtype=float)
+    assert( len(values) == len(times) )
+    assert( values.ndim in (1, 2) )
+    assert( len(times) > 0 )
+    #
+    if( step is None ):
+        step = dtutil.inferTimeStep(times)
+        if( step is None ):
+            step = np.timedelta64(1, 'D')
+    step = np.timedelta64(step).astype('timedelta64[ns]')
+    assert( step > np.timedelta64(0, 'ns') )
+    #
+    # Find the row of each reading, and the start of its row.
+    #   Shift by the phase, so each reading lands in the row holding its cell.
+    phase = (times[0] - __periodStarts(times[:1], period)[0]) % step
+    times = times - phase
+    rowStarts = __periodStarts(times, period)
+    firstRowStart = rowStarts[0]
+    if( period == 'month' ):
+        rowIdxs = (rowStarts.astype('datetime64[M]') - firstRowStart.astype('datetime64[M]')).astype(np.int64)
+        periodLen = np.timedelta64(31, 'D')
+    else:
+        periodLen = np.timedelta64(1 if period == 'day' else 7, 'D')
+        rowIdxs = (rowStarts - firstRowStart) // periodLen
+    colCt = int(-(-periodLen // step))
+    rowCt = int(rowIdxs[-1]) + 1
+    #
+    # Use a view where regular readings fill whole rows.
+    if( period != 'month' and periodLen % step == np.timedelta64(0, 'ns') and
+        times[0] == firstRowStart and len(times) == rowCt*colCt and
+        __isRegular(datetimes, times, step) ):
+        valueGrid = values.reshape((rowCt, colCt)+values.shape[1:])
+    else:
+        colIdxs = (times - rowStarts) // step
+        valueGrid = np.full((rowCt, colCt)+values.shape[1:], np.nan)
+        valueGrid[rowIdxs, colIdxs] = values
+    #
+    if( period == 'month' ):
+        gridStarts = firstRowStart.astype('datetime64[M]') + np.arange(rowCt)
+    else:
+        gridStarts = firstRowStart + np.arange(rowCt) * periodLen
+    timeGrid = TimeGrid(gridStarts.astype('datetime64[ns]') + phase, step, colCt)
+    #
+    return( (timeGrid, valueGrid) )
+    #
+    # End :func:`foldSeries`.
+
+
+def __periodStarts(times, period):
+    """
+    Return the start of the *period* holding each of *times*.
+    """
+    #
+    days = times.astype('datetime64[D]')
+    if( period == 'day' ):
+        starts = days
+    elif( period == 'week' ):
+        # Note 1970-01-01, day 0, was a Thursday, i.e., weekday 3 counting from Monday.
+        starts = days - (days.view(np.int64) + 3) % 7
+    else:
+        starts = times.astype('datetime64[M]').astype('datetime64[D]')
+    #
+    return( starts.astype('datetime64[ns]') )
+    #
+    # End :func:`__periodStarts`.
+
+
+def __isRegular(datetimes, times, step):
+    """
+    Return ``True`` if *times* (*datetimes* as ``datetime64``) fall exactly
+    every *step*.
+    """
+    #
+    if( hasattr(datetimes, 'isRegular') and hasattr(datetimes, 'step') ):
+        # Here, have a :class:`util.time_axis.TimeAxis`.
+        return( datetimes.isRegular and datetimes.step == step )
+    #
+    return( bool(np.all(np.diff(times) == step)) )
+    #
+    # End :func:`__isRegular`.
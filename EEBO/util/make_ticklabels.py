@@ -1,9 +1,17 @@
-"""Make tick labels with the beginning and end dates."""
+"""
+Make tick labels with the beginning and end dates.
+
+**Notes:**
+
+- Entries may be ``datetime`` objects, or ``datetime64`` values, e.g., from
+  a ``numpy`` array or a :class:`util.time_axis.TimeAxis`.
+"""
 
 
 #--- Provide access.
 #
 import datetime as dto
+import numpy as np
 
 
 def ticklabel_ymd(datetimeList):
@@ -25,7 +33,7 @@ def ticklabel_ymd(datetimeList):
     tickLabels = list()
     #
     for items in datetimeList:
-        tickLabels.append(dto.datetime.strftime(items,'%Y-%m-%d'))
+        tickLabels.append(dto.datetime.strftime(__asDatetime(items),'%Y-%m-%d'))
     return ( tickLabels )
     #
     # End :func:`ymd`.
@@ -50,7 +58,7 @@ def ticklabel_ym(datetimeList):
     tickLabels = list()
     #
     for items in datetimeList:
-        tickLabels.append(dto.datetime.strftime(items,'%Y-%m'))
+        tickLabels.append(dto.datetime.strftime(__asDatetime(items),'%Y-%m'))
     return ( tickLabels )
     #
     # End :func:`ym`.   
@@ -75,7 +83,7 @@ def ticklabel_my_slash(datetimeList):
     tickLabels = list()
     #
     for items in datetimeList:
-        tickLabels.append(dto.datetime.strftime(items,'%m/%Y'))
+        tickLabels.append(dto.datetime.strftime(__asDatetime(items),'%m/%Y'))
     return ( tickLabels )
     #
     # End :func:`ym`.   
@@ -109,4 +117,16 @@ def ticklabel_start_end_ym(startDateList, endDateList):
         tickLabels.append(start_ym[items]+'-'+end_ym[items])
     return ( tickLabels )
     #
-    # End :func:`ym`.
\ No newline at end of file
+    # End :func:`ym`.
+
+
+def __asDatetime(item):
+    """
+    Return *item*, a ``datetime`` or ``datetime64``, as a ``datetime``.
+    """
+    #
+    if( isinstance(item, np.datetime64) ):
+        return( item.astype('datetime64[us]').item() )
+    return( item )
+    #
+    # End :func:`__asDatetime`.
\ No newline at end of file
@@ -0,0 +1,293 @@
+"""
+Cache the outputs of the :mod:`gen_plot` functions on disk, keyed by their inputs.
+
+**Notes:**
+
+- Each entry is keyed by a hash of the function name and every input that
+  affects the output: the data arrays, the building metadata, the units, and
+  any plotting parameters.  Paths to write outputs to do not count, so the
+  same figure saved under another name, e.g., in tonight's report directory,
+  still hits the cache.
+- An entry holds the function's success flag, the bytes of the figure file it
+  wrote (if any), and the entries it added to *replacements* (if any).  On a
+  hit, :func:`runCached` writes those back out rather than calling the
+  function.  So a building whose data did not change costs a hash of its
+  inputs, rather than a render.
+- The cache is bounded in size.  When it grows past its limit, the entries
+  used least recently get deleted.
+- Changing the code of a :mod:`gen_plot` function does not change the keys.
+  Clear the cache (i.e., delete its directory) after such changes, or bump
+  :data:`CACHE_VERSION`.
+"""
+
+
+#--- Provide access.
+#
+import datetime as dto
+import hashlib
+import inspect
+import json
+import os
+#
+import numpy as np
+#
+from . import datetime_utils as dtutil
+
+
+#--- Constants.
+#
+CACHE_VERSION = 1
+#
+# Names of arguments of :mod:`gen_plot` functions that say where to put
+# outputs, rather than what the outputs are.
+OUTPUT_ARG_NAMES = ('figWritePath', 'xmlWritePath', 'replacements')
+
+
+def hashInputs(*values):
+    """
+    Return a hex digest identifying the contents of *values*.
+
+    **Notes:**
+
+    - Arrays are hashed by their type, shape, and raw bytes.  Lists of
+      ``datetime`` objects, and objects such as :class:`util.time_axis.TimeAxis`
+      that can give their times as ``datetime64``, hash the same as the
+      matching ``datetime64`` array.
+    - Dictionaries hash the same whatever the order of their keys.
+    - Other objects are hashed by their ``repr``.
+    """
+    #
+    hasher = hashlib.sha1()
+    hasher.update(str(CACHE_VERSION).encode('utf-8'))
+    for value in values:
+        __updateHash(hasher, value)
+    #
+    return( hasher.hexdigest() )
+    #
+    # End :func:`hashInputs`.
+
+
+class OutputCache(object):
+    """
+    A directory of cached outputs, limited in total size.
+
+    **Args:**
+
+    - *cacheDir*, directory to hold the cache.  Made if it does not exist.
+    - *maxBytes*, largest total size of the files in the cache.
+
+    **Notes:**
+
+    - Each entry is a ``.json`` file, holding the flag and replacements, and
+      for figures a ``.bin`` file, holding the figure bytes.  Files get
+      written to a temporary name and then renamed, so processes sharing the
+      cache never see a partial entry.
+    - Recency of use is tracked by the modification time of the ``.json``
+      file, which gets updated on each hit.
+    """
+
+    def __init__(self, cacheDir, maxBytes=1 << 30):
+        assert( maxBytes > 0 )
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        if( not os.path.isdir(cacheDir) ):
+            os.makedirs(cacheDir)
+
+    def get(self, key):
+        """
+        Return the entry for *key*, or ``None`` if not cached.
+
+        **Returns:**
+
+        - *entry*, ``None``, or a tuple (*success*, *figBytes*, *replacements*),
+          with *figBytes* ``None`` if no figure was cached.
+        """
+        #
+        metaPath, figPath = self.__entryPaths(key)
+        try:
+            with open(metaPath, 'r') as metaFile:
+                meta = json.load(metaFile)
+            figBytes = None
+            if( meta['hasFigure'] ):
+                with open(figPath, 'rb') as figFile:
+                    figBytes = figFile.read()
+            os.utime(metaPath, None)
+        except (OSError, ValueError, KeyError):
+            return( None )
+        #
+        return( (meta['success'], figBytes, meta['replacements']) )
+        #
+        # End :meth:`get`.
+
+    def put(self, key, success, figBytes=None, replacements=None):
+        """
+        Store an entry for *key*, then evict old entries to get under :attr:`maxBytes`.
+
+        **Returns:**
+
+        - *stored*, ``True`` if the entry was written.  Failing to write (e.g., a
+          full disk) is not an error; the output just gets generated again
+          next time.
+        """
+        #
+        metaPath, figPath = self.__entryPaths(key)
+        meta = {
+            'success': success,
+            'hasFigure': figBytes is not None,
+            'replacements': dict() if replacements is None else replacements,
+            }
+        try:
+            if( figBytes is not None ):
+                self.__writeAtomic(figPath, figBytes)
+            self.__writeAtomic(metaPath, json.dumps(meta).encode('utf-8'))
+        except (OSError, TypeError, ValueError):
+            return( False )
+        #
+        self.evict()
+        #
+        return( True )
+        #
+        # End :meth:`put`.
+
+    def evict(self):
+        """
+        Delete the entries used least recently, until the cache fits in :attr:`maxBytes`.
+        """
+        #
+        # Gather size and last use of each entry.
+        entries = dict()
+        for dirEntry in os.scandir(self.cacheDir):
+            key, ext = os.path.splitext(dirEntry.name)
+            if( ext not in ('.json', '.bin') ):
+                continue
+            try:
+                fileStat = dirEntry.stat()
+            except OSError:
+                continue
+            lastUse, size = entries.get(key, (0, 0))
+            if( ext == '.json' ):
+                lastUse = fileStat.st_mtime_ns
+            entries[key] = (lastUse, size + fileStat.st_size)
+        #
+        totalBytes = sum(size for _, size in entries.values())
+        for key in sorted(entries, key=lambda key: entries[key][0]):
+            if( totalBytes <= self.maxBytes ):
+                break
+            for path in self.__entryPaths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            totalBytes -= entries[key][1]
+        #
+        # End :meth:`evict`.
+
+    def __writeAtomic(self, path, contents):
+        # Write bytes *contents* to *path*, by way of a temporary file.
+        tempPath = '{0}.{1}.tmp'.format(path, os.getpid())
+        with open(tempPath, 'wb') as outFile:
+            outFile.write(contents)
+        os.replace(tempPath, path)
+
+    def __entryPaths(self, key):
+        stem = os.path.join(self.cacheDir, key)
+        return( (stem+'.json', stem+'.bin') )
+
+
+def runCached(cache, fcn, *args, **kwargs):
+    """
+    Call ``fcn(*args, **kwargs)``, a :mod:`gen_plot` function, unless its
+    outputs for these inputs are in *cache*.
+
+    **Args:**
+
+    - *cache*, an :class:`OutputCache`, or ``None`` to just call *fcn*.
+    - *fcn*, the function to call.
+    - *args*, *kwargs*, arguments for *fcn*.  Those named in
+      :data:`OUTPUT_ARG_NAMES` say where to put outputs, and do not count
+      toward the key, except for the file extension of *figWritePath*.
+
+    **Returns:**
+
+    - *success*, as returned by *fcn*, or as cached.
+
+    **Notes:**
+
+    - On a hit, writes the cached figure to *figWritePath*, and adds the
+      cached entries to *replacements*.
+    - An ``Exception`` raised by *fcn* passes through, and nothing is cached.
+    """
+    #
+    if( cache is None ):
+        return( fcn(*args, **kwargs) )
+    #
+    boundArgs = inspect.signature(fcn).bind(*args, **kwargs)
+    boundArgs.apply_defaults()
+    callArgs = boundArgs.arguments
+    figWritePath = callArgs.get('figWritePath')
+    replacements = callArgs.get('replacements')
+    #
+    keyArgs = sorted((name, val) for name, val in callArgs.items() if name not in OUTPUT_ARG_NAMES)
+    figExt = None if figWritePath is None else os.path.splitext(figWritePath)[1].lower()
+    key = hashInputs(fcn.__module__, fcn.__name__, keyArgs, figExt)
+    #
+    entry = cache.get(key)
+    if( entry is not None ):
+        success, figBytes, cachedReplacements = entry
+        if( figBytes is not None ):
+            with open(figWritePath, 'wb') as figFile:
+                figFile.write(figBytes)
+        if( replacements is not None ):
+            replacements.update(cachedReplacements)
+        return( success )
+    #
+    # Collect just the replacements *fcn* adds.
+    newReplacements = None
+    if( replacements is not None ):
+        newReplacements = dict()
+        callArgs['replacements'] = newReplacements
+    success = fcn(*boundArgs.args, **boundArgs.kwargs)
+    if( replacements is not None ):
+        replacements.update(newReplacements)
+    #
+    figBytes = None
+    if( success is True and figWritePath is not None and os.path.isfile(figWritePath) ):
+        with open(figWritePath, 'rb') as figFile:
+            figBytes = figFile.read()
+    cache.put(key, success, figBytes, newReplacements)
+    #
+    return( success )
+    #
+    # End :func:`runCached`.
+
+
+def __updateHash(hasher, value):
+    """
+    Add *value* to *hasher*, tagged by type, so that, e.g., ``1`` and ``'1'``
+    hash differently.
+    """
+    #
+    if( isinstance(value, (list, tuple)) and len(value) > 0 and isinstance(value[0], dto.date) ):
+        value = dtutil.toDatetime64(value)
+    elif( hasattr(value, 'asDatetime64') ):
+        value = value.asDatetime64()
+    elif( hasattr(value, '__array__') and not isinstance(value, np.ndarray) ):
+        value = np.asarray(value)
+    #
+    if( isinstance(value, np.ndarray) and value.dtype.kind != 'O' ):
+        hasher.update('array:{0}:{1}:'.format(value.dtype.str, value.shape).encode('utf-8'))
+        hasher.update(np.ascontiguousarray(value).view(np.uint8).reshape(-1).data)
+    elif( isinstance(value, (list, tuple, np.ndarray)) ):
+        hasher.update('seq:{0}:'.format(len(value)).encode('utf-8'))
+        for item in value:
+            __updateHash(hasher, item)
+    elif( isinstance(value, dict) ):
+        hasher.update('dict:{0}:'.format(len(value)).encode('utf-8'))
+        for key in sorted(value, key=repr):
+            __updateHash(hasher, key)
+            __updateHash(hasher, value[key])
+    else:
+        hasher.update('{0}:{1!r};'.format(type(value).__name__, value).encode('utf-8'))
+    #
+    # End :func:`__updateHash`.
+
@@ -0,0 +1,202 @@
+"""
+Put raw meter readings onto a regular time grid.
+
+**Notes:**
+
+- Meter exports often have missing intervals, rows out of order, and, with
+  timestamps in local time, a repeated hour when daylight saving time ends
+  and a skipped hour when it begins.  :func:`regularizeSeries` handles all of
+  these in one vectorized pass, and returns readings on a regular grid, with
+  a :class:`util.time_axis.TimeAxis` that has no breaks.  Code downstream can
+  then assume fixed-stride data.
+- A repeated hour shows up as readings landing on grid slots that already
+  have readings, and gets resolved by the *duplicates* policy.  A skipped
+  hour shows up as a gap, and gets resolved by the *gaps* policy.
+"""
+
+
+#--- Provide access.
+#
+import numpy as np
+#
+from . import clean_data as clean
+from . import datetime_utils as dtutil
+from . import time_axis
+
+
+#--- Constants.
+#
+DUPLICATE_POLICIES = ('first', 'last', 'mean', 'sum')
+GAP_POLICIES = ('nan', 'interpolate')
+
+
+def regularizeSeries(datetimes, values, step=None, duplicates='mean', gaps='nan', gapRunCtMax=4):
+    """
+    Snap readings onto their regular time grid.
+
+    **Args:**
+
+    - *datetimes*, array-like sequence of reading times, in any order (see
+      :func:`util.datetime_utils.toDatetime64`).
+    - *values*, array-like sequence of readings (float), one per entry of
+      *datetimes*.  Or, a 2-D array with one row per entry of *datetimes*, and
+      one column per meter.
+    - *step*, time between grid slots (``timedelta`` or ``timedelta64``).  If
+      ``None``, infer it with :func:`util.datetime_utils.inferTimeStep`.
+    - *duplicates*, how to combine readings that land on the same slot:
+      ``'first'`` or ``'last'`` (in the order given), ``'mean'``, or ``'sum'``
+      (e.g., for interval energy rather than power).
+    - *gaps*, how to fill slots with no reading: ``'nan'`` to leave them
+      ``NAN``, or ``'interpolate'`` to fill runs of up to *gapRunCtMax* empty
+      slots linearly (see :func:`util.clean_data.interpolateBadEntries_linear`).
+    - *gapRunCtMax*, longest run of empty slots to fill, if interpolating.
+
+    **Returns:**
+
+    - (*timeAxis*, *gridValues*, *report*).
+    - *timeAxis*, :class:`util.time_axis.TimeAxis` of the grid, from the slot
+      of the earliest reading through the slot of the latest.
+    - *gridValues*, ``numpy`` array of readings on the grid, with one row per
+      slot (and, for 2-D *values*, one column per meter).
+    - *report*, dictionary of counts describing the raw data:
+      ``'step'``, the grid step (``timedelta64``);
+      ``'outOfOrderCt'``, readings earlier than the reading before them;
+      ``'offGridCt'``, readings moved to the nearest slot;
+      ``'duplicateCt'``, readings combined into a slot already holding one;
+      ``'missingCt'``, slots with no reading;
+      ``'gapCt'``, runs of slots with no reading;
+      ``'filledCt'``, slots with no reading that got filled.
+
+    **Notes:**
+
+    - The grid keeps the phase of the readings.  For example, 15-minute
+      readings taken at 7, 22, 37, and 52 minutes past the hour stay there,
+      rather than moving to the quarter hour.
+    - ``NAN`` readings count as readings, not gaps.  Duplicate policies
+      ``'mean'`` and ``'sum'`` ignore them, unless a slot has only ``NAN``.
+    - Readings with a missing time (``NaT``) are dropped.
+    """
+    #
+    # Check inputs.
+    assert( duplicates in DUPLICATE_POLICIES )
+    assert( gaps in GAP_POLICIES )
+    times = dtutil.toDatetime64(datetimes)
+    values = np.asarray(values, dtype=float)
+    assert( len(values) == len(times) )
+    assert( values.ndim in (1, 2) )
+    #
+    # Drop readings with no time.
+    goodLocs = ~np.isnat(times)
+    if( not np.all(goodLocs) ):
+        times = times[goodLocs]
+        values = values[goodLocs]
+    assert( len(times) > 0 )
+    #
+    # Find the grid.
+    if( step is None ):
+        step = dtutil.inferTimeStep(times)
+        if( step is None ):
+            step = np.timedelta64(1, 'm')
+    step = np.timedelta64(step).astype('timedelta64[ns]')
+    assert( step > np.timedelta64(0, 'ns') )
+    nsTimes = times.view(np.int64)
+    nsStep = step.astype(np.int64)
+    #
+    # Take the grid phase as the most common offset of readings from the grid.
+    phases, phaseCts = np.unique(nsTimes % nsStep, return_counts=True)
+    phase = phases[np.argmax(phaseCts)]
+    #
+    # Snap each reading to the nearest slot.
+    #   Shift by half a step so that floor division rounds to nearest.
+    slots = (nsTimes - phase + nsStep//2) // nsStep
+    offGridCt = np.count_nonzero((nsTimes - phase) % nsStep)
+    #
+    # Sort by slot.
+    #   Stable sort, so duplicates keep the order given, for ``'first'`` and ``'last'``.
+    outOfOrderCt = np.count_nonzero(np.diff(nsTimes) < 0)
+    if( outOfOrderCt > 0 ):
+        order = np.argsort(slots, kind='mergesort')
+        slots = slots[order]
+        values = values[order]
+    #
+    # Combine readings that share a slot.
+    startIdxs = np.concatenate(([0], np.flatnonzero(np.diff(slots)) + 1))
+    duplicateCt = len(slots) - len(startIdxs)
+    if( duplicateCt > 0 ):
+        values = __combineDuplicates(values, startIdxs, duplicates)
+        slots = slots[startIdxs]
+    #
+    # Spread the readings over every slot.
+    firstSlot = slots[0]
+    slotCt = int(slots[-1] - firstSlot + 1)
+    gridValues = np.full((slotCt,)+values.shape[1:], np.nan)
+    gridValues[slots-firstSlot] = values
+    #
+    isMissing = np.ones(slotCt, dtype=bool)
+    isMissing[slots-firstSlot] = False
+    missingCt = np.count_nonzero(isMissing)
+    gapCt = np.count_nonzero(np.diff(np.concatenate(([0], isMissing.view(np.int8)))) == 1)
+    #
+    # Fill gaps if requested.
+    filledCt = 0
+    if( gaps == 'interpolate' and missingCt > 0 ):
+        gridValues = __fillGaps(gridValues, isMissing, gapRunCtMax)
+        filledCt = missingCt - np.count_nonzero(np.all(np.isnan(gridValues[isMissing].reshape(missingCt, -1)), axis=1))
+    #
+    timeAxis = time_axis.TimeAxis(np.datetime64(int(firstSlot*nsStep + phase), 'ns'), step, slotCt)
+    report = {
+        'step': step,
+        'outOfOrderCt': int(outOfOrderCt),
+        'offGridCt': int(offGridCt),
+        'duplicateCt': int(duplicateCt),
+        'missingCt': int(missingCt),
+        'gapCt': int(gapCt),
+        'filledCt': int(filledCt),
+        }
+    #
+    return( (timeAxis, gridValues, report) )
+    #
+    # End :func:`regularizeSeries`.
+
+
+def __combineDuplicates(values, startIdxs, policy):
+    """
+    Combine the rows of *values* that start at each of *startIdxs*, and run up
+    to the next, according to *policy*.
+    """
+    #
+    if( policy == 'first' ):
+        return( values[startIdxs] )
+    if( policy == 'last' ):
+        return( values[np.append(startIdxs[1:], len(values)) - 1] )
+    #
+    isGood = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(isGood, values, 0.0), startIdxs, axis=0)
+    goodCts = np.add.reduceat(isGood.astype(np.int64), startIdxs, axis=0)
+    if( policy == 'mean' ):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            combined = sums / goodCts
+    else:
+        combined = sums
+    combined[goodCts == 0] = np.nan
+    #
+    return( combined )
+    #
+    # End :func:`__combineDuplicates`.
+
+
+def __fillGaps(gridValues, isMissing, gapRunCtMax):
+    """
+    Fill runs of up to *gapRunCtMax* missing slots, column by column, leaving
+    ``NAN`` readings alone.
+    """
+    #
+    filled = gridValues.reshape(len(gridValues), -1).copy()
+    keepNan = np.logical_and(np.isnan(filled), ~isMissing[:,np.newaxis])
+    for colIdx in range(filled.shape[1]):
+        filled[:,colIdx] = clean.interpolateBadEntries_linear(filled[:,colIdx], gapRunCtMax)
+    filled[keepNan] = np.nan
+    #
+    return( filled.reshape(gridValues.shape) )
+    #
+    # End :func:`__fillGaps`.
@@ -0,0 +1,184 @@
+"""
+Represent the times of regularly-spaced meter readings compactly.
+
+**Notes:**
+
+- A :class:`TimeAxis` stores the time of the first reading, the step between
+  readings, and the number of readings, rather than one ``datetime`` object per
+  reading.  Gaps, and any other breaks in the regular spacing, split the axis
+  into segments, and each segment stores just its first index and first time.
+  Thus a 10-year series of 1-minute readings with a few hundred gaps takes a
+  few kilobytes, rather than hundreds of megabytes as a list of ``datetime``
+  objects.
+- Functions in this project that take *datetimes* also accept a
+  :class:`TimeAxis` (see :func:`util.datetime_utils.toDatetime64`).  Indexing
+  a :class:`TimeAxis` gives ``datetime`` objects, as from a list, and
+  ``numpy.asarray`` gives a ``datetime64[ns]`` array.
+"""
+
+
+#--- Provide access.
+#
+import numpy as np
+#
+from . import datetime_utils as dtutil
+
+
+class TimeAxis(object):
+    """
+    Times of a series of readings, taken at a regular step, with breaks.
+
+    **Args:**
+
+    - *start*, time of the first reading (``datetime`` or ``datetime64``).
+      Ignored if *count* is zero.
+    - *step*, time between readings (``timedelta`` or ``timedelta64``).
+    - *count*, number of readings.  May be zero, e.g., for the readings
+      selected from a meter with no good data.
+    - *breaks*, sequence of (*index*, *time*) pairs, in order of *index*.  The
+      reading at *index* falls at *time*, and readings after it follow at
+      *step*, up to the next break.
+
+    **Notes:**
+
+    - Times must be monotone increasing.  Not checked.
+    - Use :meth:`fromDatetimes` to build a :class:`TimeAxis` from existing times.
+    """
+
+    def __init__(self, start, step, count, breaks=()):
+        #
+        # Check inputs.
+        assert( count >= 0 )
+        self.step = np.timedelta64(step).astype('timedelta64[ns]')
+        assert( self.step > np.timedelta64(0, 'ns') )
+        self.count = int(count)
+        #
+        segIdxs = [0]
+        segTimes = [np.datetime64(start, 'ns')]
+        for idx, time in breaks:
+            assert( segIdxs[-1] < idx < count )
+            segIdxs.append(idx)
+            segTimes.append(np.datetime64(time, 'ns'))
+        self.__segIdxs = np.array(segIdxs, dtype=np.int64)
+        self.__segTimes = np.array(segTimes, dtype='datetime64[ns]')
+
+    @classmethod
+    def fromDatetimes(cls, datetimes, step=None):
+        """
+        Make a :class:`TimeAxis` holding the same times as *datetimes*.
+
+        **Args:**
+
+        - *datetimes*, array-like sequence of monotone-increasing times
+          (``datetime`` objects, or ``datetime64`` values).  If empty, give
+          an empty :class:`TimeAxis`.
+        - *step*, the regular time between readings.  If ``None``, use the
+          most common difference between consecutive entries (see
+          :func:`util.datetime_utils.inferTimeStep`).
+        """
+        #
+        times = dtutil.toDatetime64(datetimes)
+        deltas = np.diff(times)
+        assert( np.all(deltas > np.timedelta64(0, 'ns')) )
+        #
+        if( step is None ):
+            step = dtutil.inferTimeStep(times)
+            if( step is None ):
+                step = np.timedelta64(1, 'm')
+        step = np.timedelta64(step).astype('timedelta64[ns]')
+        #
+        if( len(times) == 0 ):
+            return( cls(np.datetime64('NaT', 'ns'), step, 0) )
+        #
+        breakIdxs = np.flatnonzero(deltas != step) + 1
+        breaks = zip(breakIdxs, times[breakIdxs])
+        #
+        return( cls(times[0], step, len(times), breaks) )
+        #
+        # End :meth:`fromDatetimes`.
+
+    @property
+    def breaks(self):
+        """
+        List of (*index*, *time*) pairs marking the breaks in the regular spacing.
+        """
+        return( list(zip(self.__segIdxs[1:].tolist(), self.__segTimes[1:])) )
+
+    @property
+    def isRegular(self):
+        return( len(self.__segIdxs) == 1 )
+
+    @property
+    def nbytes(self):
+        return( self.__segIdxs.nbytes + self.__segTimes.nbytes + self.step.nbytes )
+
+    def __len__(self):
+        return( self.count )
+
+    def __repr__(self):
+        return( 'TimeAxis({0}, {1}, {2}, breakCt={3})'.format(
+            self.__segTimes[0], self.step, self.count, len(self.__segIdxs)-1) )
+
+    def asDatetime64(self):
+        """
+        Return the times as a ``numpy`` array of ``datetime64[ns]``.
+        """
+        #
+        segLens = np.diff(np.append(self.__segIdxs, self.count))
+        offsets = np.arange(self.count) - np.repeat(self.__segIdxs, segLens)
+        #
+        return( np.repeat(self.__segTimes, segLens) + offsets * self.step )
+        #
+        # End :meth:`asDatetime64`.
+
+    def __array__(self, dtype=None, copy=None):
+        times = self.asDatetime64()
+        return( times if dtype is None else times.astype(dtype) )
+
+    def __iter__(self):
+        return( iter(self.asDatetime64().astype('datetime64[us]').astype(object)) )
+
+    def __getitem__(self, idx):
+        #
+        # Single index gives a ``datetime``, as from a list.
+        if( isinstance(idx, (int, np.integer)) ):
+            if( idx < 0 ):
+                idx += self.count
+            if( idx < 0 or idx >= self.count ):
+                raise IndexError('TimeAxis index out of range')
+            segIdx = np.searchsorted(self.__segIdxs, idx, side='right') - 1
+            time = self.__segTimes[segIdx] + (idx - self.__segIdxs[segIdx]) * self.step
+            return( time.astype('datetime64[us]').item() )
+        #
+        # Contiguous slice gives another :class:`TimeAxis`, empty if the
+        # slice is, as for a list.
+        if( isinstance(idx, slice) and idx.step in (None, 1) ):
+            startIdx, stopIdx, _ = idx.indices(self.count)
+            return( self.__subAxis(startIdx, max(startIdx, stopIdx)) )
+        #
+        return( self.asDatetime64()[idx] )
+
+    def __subAxis(self, startIdx, stopIdx):
+        # The :class:`TimeAxis` for readings *startIdx* up to *stopIdx*.
+        if( startIdx == stopIdx ):
+            return( TimeAxis(np.datetime64('NaT', 'ns'), self.step, 0) )
+        firstSeg = np.searchsorted(self.__segIdxs, startIdx, side='right') - 1
+        blockSeg = np.searchsorted(self.__segIdxs, stopIdx, side='left')
+        start = self.__segTimes[firstSeg] + (startIdx - self.__segIdxs[firstSeg]) * self.step
+        breaks = zip(self.__segIdxs[firstSeg+1:blockSeg] - startIdx,
+            self.__segTimes[firstSeg+1:blockSeg])
+        return( TimeAxis(start, self.step, stopIdx-startIdx, breaks) )
+
+    def compress(self, condition):
+        """
+        Return a :class:`TimeAxis` with just the readings where *condition*
+        (array-like sequence of booleans) is ``True``.  Dropped readings become
+        gaps, i.e., breaks in the regular spacing.  If *condition* selects no
+        readings, the result is empty.
+        """
+        #
+        times = self.asDatetime64()[np.asarray(condition, dtype=bool)]
+        #
+        return( TimeAxis.fromDatetimes(times, self.step) )
+        #
+        # End :meth:`compress`.